@@ -0,0 +1,147 @@
+"""
+Database plumbing: the SQLite production mode and the primary/replica router.
+
+SQLite production mode. Every new SQLite connection gets the pragmas from the
+SQLITE_TUNING setting: write-ahead logging so readers do not block the writer,
+synchronous=NORMAL (safe with WAL, one fsync per checkpoint instead of per commit),
+a busy timeout so concurrent writers wait for the lock instead of failing with
+"database is locked", and memory-mapped reads.
+
+Connection reuse is configured on DATABASES itself (CONN_MAX_AGE), together with
+transaction_mode=IMMEDIATE, which takes the write lock when a transaction starts:
+a deferred transaction that reads and then writes cannot wait for the lock, it
+fails at once whatever the busy timeout.
+"""
+import inspect
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REPLICA_ALIAS = 'replica'
+
+# Set while a view marked with @read_replica runs
+_read_replica = ContextVar('read_replica', default=False)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'BUSY_TIMEOUT': 5000,  # milliseconds
+    'MMAP_SIZE': 256 * 1024 * 1024,  # bytes
+    'CACHE_SIZE': -20000,  # negative: KiB, i.e. about 20 MB per connection
+    'TEMP_STORE': 'MEMORY',
+}
+
+
+def option(name):
+    return getattr(settings, 'SQLITE_TUNING', {}).get(name, DEFAULTS[name])
+
+
+def tuning_pragmas():
+    return [
+        f"PRAGMA journal_mode = {option('JOURNAL_MODE')}",
+        f"PRAGMA synchronous = {option('SYNCHRONOUS')}",
+        f"PRAGMA busy_timeout = {int(option('BUSY_TIMEOUT'))}",
+        f"PRAGMA mmap_size = {int(option('MMAP_SIZE'))}",
+        f"PRAGMA cache_size = {int(option('CACHE_SIZE'))}",
+        f"PRAGMA temp_store = {option('TEMP_STORE')}",
+    ]
+
+
+def pragma_values(connection):
+    """
+    The current value of every tuned pragma on `connection`, for checks and benchmark reports.
+    """
+    values = {}
+    with connection.cursor() as cursor:
+        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store'):
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            # mmap_size returns no row for in-memory databases
+            values[name] = row[0] if row else None
+    return values
+
+
+@receiver(connection_created)
+def _tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not option('ENABLED'):
+        return
+    with connection.cursor() as cursor:
+        for pragma in tuning_pragmas():
+            cursor.execute(pragma)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.settings
+
+
+def reading_from_replica():
+    return _read_replica.get() and replica_configured()
+
+
+def read_database():
+    """
+    The alias reads go to right now; for querysets evaluated after the view returns,
+    such as streamed exports, which must be bound with .using().
+    """
+    return REPLICA_ALIAS if reading_from_replica() else DEFAULT_DB_ALIAS
+
+
+def replica_may_lag(last_write):
+    """
+    Whether a replica read may not include a write made at `last_write` (a timestamp)
+    yet. Responses read in that window should not be cached.
+    """
+    return reading_from_replica() and time.time() - last_write < getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
+
+
+def read_replica(view_method):
+    """
+    Run a read-only view method (sync or async) against the replica, when one is
+    configured. Authentication and permissions run before the method, on the primary,
+    so a token created a moment ago is always found.
+    """
+    if inspect.iscoroutinefunction(view_method):
+        @wraps(view_method)
+        async def async_wrapper(*args, **kwargs):
+            token = _read_replica.set(True)
+            try:
+                return await view_method(*args, **kwargs)
+            finally:
+                _read_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view_method)
+    def wrapper(*args, **kwargs):
+        token = _read_replica.set(True)
+        try:
+            return view_method(*args, **kwargs)
+        finally:
+            _read_replica.reset(token)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes, and reads outside @read_replica views, go to the primary ("default").
+    The replica gets its schema and rows by replication, so it is never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        # None falls back to the instance hint or "default"
+        return REPLICA_ALIAS if reading_from_replica() else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
@@ -0,0 +1,265 @@
+"""
+Per-request query count, DB time, render time and response size.
+
+InstrumentationMiddleware records every request into a bounded ring buffer,
+adds a `Server-Timing` header and enforces the per-route query budgets of
+settings.INSTRUMENTATION. The staff-only StatsView summarizes the buffer.
+"""
+import logging
+import math
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from users.api.authentication import token_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BUFFER_SIZE': 2000,
+    'SERVER_TIMING': True,
+    # route (or "METHOD route") -> maximum number of queries per request
+    'QUERY_BUDGETS': {},
+    # 'log' a warning or 'raise' QueryBudgetExceeded (useful in tests)
+    'BUDGET_ACTION': 'log',
+}
+
+
+def option(name):
+    return getattr(settings, 'INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestProbe:
+    """
+    Collects the queries of one request. Lives in a context variable so queries
+    run from sync_to_async threads are attributed to the right request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+
+
+_probe = ContextVar('instrumentation_probe', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    probe = _probe.get()
+    if probe is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        probe.queries += 1
+        probe.db_time += time.perf_counter() - start
+
+
+def _install(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+@receiver(connection_created)
+def _connection_created(sender, connection, **kwargs):
+    _install(connection)
+
+
+class RingBuffer:
+    """
+    The last `size` request records, oldest dropped first.
+    """
+
+    def __init__(self, size):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+buffer = RingBuffer(option('BUFFER_SIZE'))
+
+
+def route_name(request):
+    """
+    The URL pattern that served the request, e.g. api/v1/waste-management/ewaste/<pk>/delete-data/.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', match.route)
+    return route.replace('^', '').replace('$', '')
+
+
+def query_budget(method, route):
+    budgets = option('QUERY_BUDGETS')
+    return budgets.get(f'{method} {route}', budgets.get(route))
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = option('ENABLED')
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        probe, token, start = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _probe.reset(token)
+        return self.finish(request, response, probe, start)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        probe, token, start = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _probe.reset(token)
+        return self.finish(request, response, probe, start)
+
+    def start(self, request):
+        probe = RequestProbe()
+        request._instrumentation_probe = probe
+        return probe, _probe.set(probe), time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (serialized to bytes) right after this hook
+        probe = getattr(request, '_instrumentation_probe', None)
+        if probe is not None:
+            probe.render_started = time.perf_counter()
+        return response
+
+    def finish(self, request, response, probe, start):
+        end = time.perf_counter()
+        if probe.render_started is not None:
+            probe.render_time = end - probe.render_started
+        route = route_name(request)
+        record = {
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': probe.queries,
+            'db_ms': probe.db_time * 1000,
+            'render_ms': probe.render_time * 1000,
+            'total_ms': (end - start) * 1000,
+            # Streaming bodies are produced after the middleware returns
+            'size': None if response.streaming else len(response.content),
+            'time': time.time(),
+        }
+        buffer.append(record)
+
+        if option('SERVER_TIMING'):
+            response['Server-Timing'] = (
+                f'db;dur={record["db_ms"]:.1f};desc="{probe.queries} queries", '
+                f'render;dur={record["render_ms"]:.1f}, total;dur={record["total_ms"]:.1f}'
+            )
+
+        budget = query_budget(request.method, route)
+        if budget is not None and probe.queries > budget:
+            message = f'{request.method} {route} ran {probe.queries} queries, budget is {budget}'
+            if option('BUDGET_ACTION') == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def summarize(records):
+    """
+    Aggregate ring buffer records per (method, route).
+    """
+    groups = defaultdict(list)
+    for record in records:
+        groups[(record['method'], record['route'])].append(record)
+
+    routes = []
+    for (method, route), items in sorted(groups.items(), key=lambda item: (item[0][1], item[0][0])):
+        totals = [item['total_ms'] for item in items]
+        queries = [item['queries'] for item in items]
+        sizes = [item['size'] for item in items if item['size'] is not None]
+        budget = query_budget(method, route)
+        routes.append({
+            'method': method,
+            'route': route,
+            'requests': len(items),
+            'queries_avg': round(statistics.fmean(queries), 2),
+            'queries_max': max(queries),
+            'query_budget': budget,
+            'over_budget': sum(1 for count in queries if budget is not None and count > budget),
+            'db_ms_avg': round(statistics.fmean(item['db_ms'] for item in items), 3),
+            'render_ms_avg': round(statistics.fmean(item['render_ms'] for item in items), 3),
+            'total_ms_avg': round(statistics.fmean(totals), 3),
+            'total_ms_p50': round(_percentile(totals, 50), 3),
+            'total_ms_p95': round(_percentile(totals, 95), 3),
+            'total_ms_max': round(max(totals), 3),
+            'size_avg': round(statistics.fmean(sizes)) if sizes else None,
+            'errors': sum(1 for item in items if item['status'] >= 500),
+        })
+    return routes
+
+
+class StatsView(APIView):
+    """
+    Staff only: per-route request statistics from the ring buffer and the token cache counters.
+    DELETE empties the buffer.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        records = buffer.snapshot()
+        return Response({
+            'buffered_requests': len(records),
+            'buffer_size': option('BUFFER_SIZE'),
+            'routes': summarize(records),
+            'token_cache': token_cache.stats(),
+        })
+
+    def delete(self, request, *args, **kwargs):
+        buffer.clear()
+        return Response(status=204)
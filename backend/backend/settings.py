@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "backend.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -81,11 +83,65 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# The database is configured from the environment: DB_ENGINE is "sqlite"
+# (default) or "postgresql"; DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT
+# locate it. Setting DB_REPLICA_NAME and/or DB_REPLICA_HOST adds a "replica"
+# alias that the read-only analytics and listing views read from
+# (backend.database.PrimaryReplicaRouter).
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "shuddhi_netra"),
+            "USER": os.environ.get("DB_USER", ""),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", ""),
+            "PORT": os.environ.get("DB_PORT", ""),
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+        }
     }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            # Keep connections (and their pragmas) open between requests
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Take the write lock at BEGIN, so waiting writers honour the busy timeout
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+    }
+
+if os.environ.get("DB_REPLICA_NAME") or os.environ.get("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ.get("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "HOST": os.environ.get("DB_REPLICA_HOST", DATABASES["default"].get("HOST", "")),
+        # Tests read and write one database
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["backend.database.PrimaryReplicaRouter"]
+# Seconds a write may take to reach the replica; analytics read from the replica
+# within that time after a write are not cached
+DATABASE_REPLICA_MAX_LAG = 5
+
+# SQLite production mode (backend.database): pragmas applied to every new
+# SQLite connection. Set ENABLED to False to get SQLite's defaults back.
+SQLITE_TUNING = {
+    "ENABLED": True,
+    "JOURNAL_MODE": "WAL",
+    "SYNCHRONOUS": "NORMAL",
+    "BUSY_TIMEOUT": 5000,  # milliseconds
+    "MMAP_SIZE": 256 * 1024 * 1024,  # bytes
+    "CACHE_SIZE": -20000,  # KiB when negative
+    "TEMP_STORE": "MEMORY",
 }
 
 
@@ -109,12 +165,65 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.api.authentication.CachedTokenAuthentication',
         # 'rest_framework.authentication.BasicAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
     ]
 }
 
+# Per-request query/latency instrumentation (backend.instrumentation).
+# QUERY_BUDGETS maps a route, optionally prefixed with the method, to the most
+# queries a request may run; over-budget requests are logged, or raise with
+# BUDGET_ACTION = "raise". Budgets assume cold token and scope caches.
+INSTRUMENTATION = {
+    "ENABLED": True,
+    "BUFFER_SIZE": 2000,
+    "SERVER_TIMING": True,
+    "QUERY_BUDGETS": {
+        "GET api/v1/waste-management/ewaste/analytics/": 6,
+        "GET api/v1/waste-management/paperwaste/analytics/": 6,
+        "GET api/v1/waste-management/selledpaperwaste/analytics/": 6,
+        "GET api/v1/waste-management/dashboard/": 5,
+        "GET api/v1/post/postoffice/": 5,
+    },
+    "BUDGET_ACTION": "log",
+}
+
+# Cache used for analytics responses. Local memory is per process; point
+# "default" at django.core.cache.backends.filebased.FileBasedCache to share
+# the cache (and its invalidation) between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shuddhi-netra',
+    }
+}
+ANALYTICS_CACHE_TIMEOUT = 600  # seconds
+
+# Archival of old waste records (waste_management.archive, the archive_waste_records
+# command): whole financial years before the last KEEP_YEARS are moved to the
+# archive tables, which analytics read only for ranges starting before them.
+WASTE_ARCHIVE = {
+    "KEEP_YEARS": 2,  # the current financial year included
+    "YEAR_START_MONTH": 4,  # April
+    "BATCH_SIZE": 5000,  # rows per transaction
+    "BOUNDARY_CACHE_SECONDS": 60,  # servers see a new archive boundary within this
+}
+
+# Offline sync endpoint (waste_management.sync)
+SYNC = {
+    "PAGE_SIZE": 500,  # changed rows per model and call
+    "MAX_PAGE_SIZE": 5000,
+    "SETTLE_SECONDS": 2,  # the next token stays this far behind the clock
+    "TOMBSTONE_DAYS": 90,  # tombstones kept; older tokens must sync from scratch
+}
+
+# In-memory token -> user cache used by CachedTokenAuthentication
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 1024,
+    'TTL': 300,  # seconds
+}
+
 AUTH_USER_MODEL="users.User"
 ACCOUNT_UNIQUE_EMAIL=True
 CORS_ALLOW_ALL_ORIGINS = True
@@ -136,6 +245,25 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded attachments and reports
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Resumable uploads: largest accepted file and largest single chunk, in bytes
+UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+# Unfinished or unattached uploads older than this are removed by `manage.py cleanup_uploads`
+UPLOAD_ABANDON_HOURS = 24
+
+# Thumbnails and compressed copies built by `manage.py process_derivatives`.
+# Image derivatives need Pillow (requirements.txt); other files get a gzip copy.
+DERIVATIVES = {
+    "THUMBNAIL_SIZE": (320, 320),
+    "COMPRESSED_MAX_SIZE": (1600, 1600),
+    "JPEG_QUALITY": 70,
+    "MAX_ATTEMPTS": 3,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
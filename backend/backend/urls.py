@@ -17,10 +17,12 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path,include
+from backend.instrumentation import StatsView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/v1/',include("users.api.urls")),
     path('api/v1/post/',include("post_office.urls")),
-    path('api/v1/waste-management/',include('waste_management.urls'))
+    path('api/v1/waste-management/',include('waste_management.urls')),
+    path('api/v1/stats/', StatsView.as_view(), name='request-stats'),
 ]
@@ -0,0 +1,25 @@
+from backend.database import read_replica
+from users.api.async_views import AsyncAPIView
+from users.api.pagination import KeysetPagination, requested_fields
+from users.api.permissions import IsDivisionalOffice
+from waste_management.response_cache import json_response, cache_response
+from .hierarchy import offices_under
+from .serializers import PostOfficeSerializer
+
+
+class AsyncPostOfficeListView(AsyncAPIView):
+    """
+    ASGI version of the post office listing (PostOfficeViewSet.get).
+    """
+    permission_classes = [IsDivisionalOffice]
+    basename = None
+    keyset_ordering = ('pincode',)
+
+    @read_replica
+    @cache_response('postoffice-list')
+    async def get(self, request, *args, **kwargs):
+        offices = offices_under(request._office_scope.office_pincode)
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(offices, request, view=self)
+        serializer = PostOfficeSerializer(page, many=True, fields=requested_fields(request))
+        return json_response({"data": serializer.data, "next_cursor": paginator.next_cursor, "message": "Post offices under the division."})
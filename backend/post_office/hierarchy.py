@@ -0,0 +1,135 @@
+from itertools import islice
+
+from django.db import connections, router, transaction
+
+from post_office.models import PostOffice, PostOfficeClosure
+
+BATCH_SIZE = 1000
+
+
+def offices_under(pincode, include_self=False):
+    """
+    All post offices below `pincode` at any depth, as one indexed join on the closure table.
+    """
+    return PostOffice.objects.filter(
+        ancestor_links__ancestor_id=str(pincode),
+        ancestor_links__depth__gte=0 if include_self else 1,
+    )
+
+
+def is_under(pincode, ancestor_pincode, include_self=False):
+    return PostOfficeClosure.objects.filter(
+        ancestor_id=str(ancestor_pincode),
+        descendant_id=str(pincode),
+        depth__gte=0 if include_self else 1,
+    ).exists()
+
+
+def add_node(office):
+    """
+    Link a newly created office under its parent (division_pincode).
+    """
+    links = [PostOfficeClosure(ancestor=office, descendant=office, depth=0)]
+    if office.division_pincode_id:
+        links += [
+            PostOfficeClosure(ancestor_id=ancestor_id, descendant=office, depth=depth + 1)
+            for ancestor_id, depth in PostOfficeClosure.objects
+            .filter(descendant_id=office.division_pincode_id)
+            .values_list('ancestor_id', 'depth')
+        ]
+    PostOfficeClosure.objects.bulk_create(links)
+
+
+def _detach_subtree(office):
+    # Drop the links from the subtree of `office` to everything above it
+    subtree = PostOfficeClosure.objects.filter(ancestor=office).values('descendant_id')
+    ancestors = PostOfficeClosure.objects.filter(descendant=office, depth__gt=0).values('ancestor_id')
+    PostOfficeClosure.objects.filter(descendant_id__in=subtree, ancestor_id__in=ancestors).delete()
+
+
+@transaction.atomic
+def move_node(office):
+    """
+    Re-link `office` and its subtree after its division_pincode changed.
+    """
+    _detach_subtree(office)
+    if not office.division_pincode_id:
+        return
+    if is_under(office.division_pincode_id, office.pincode, include_self=True):
+        raise ValueError("A post office cannot be moved under itself or its own descendants.")
+    ancestors = list(
+        PostOfficeClosure.objects.filter(descendant_id=office.division_pincode_id).values_list('ancestor_id', 'depth')
+    )
+    subtree = list(PostOfficeClosure.objects.filter(ancestor=office).values_list('descendant_id', 'depth'))
+    PostOfficeClosure.objects.bulk_create(
+        [
+            PostOfficeClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + down + 1)
+            for ancestor_id, up in ancestors
+            for descendant_id, down in subtree
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+@transaction.atomic
+def remove_node(office):
+    """
+    Delete `office`. Its children become roots, as with the SET_NULL foreign key.
+    """
+    _detach_subtree(office)
+    office.delete()
+
+
+def closure_links(parents, pincodes=None):
+    """
+    Yield the (ancestor, descendant, depth) links of a {pincode: parent pincode or None}
+    map, for the descendants `pincodes` (default: every office).
+    """
+    for pincode in parents if pincodes is None else pincodes:
+        depth, node, seen = 0, pincode, set()
+        while node in parents and node not in seen:
+            seen.add(node)
+            yield node, pincode, depth
+            node = parents.get(node)
+            depth += 1
+
+
+def build_closure_rows(parents, closure_model=PostOfficeClosure, pincodes=None):
+    """
+    Compute closure rows in memory from a {pincode: parent pincode or None} map,
+    for the descendants `pincodes` (default: every office).
+    """
+    return [
+        closure_model(ancestor_id=ancestor, descendant_id=descendant, depth=depth)
+        for ancestor, descendant, depth in closure_links(parents, pincodes)
+    ]
+
+
+def insert_closure_links(links, closure_model=PostOfficeClosure):
+    """
+    Insert (ancestor, descendant, depth) links with executemany, in batches. Building
+    a model instance per link costs more than the insert once there are millions.
+    Returns the number of rows written.
+    """
+    meta = closure_model._meta
+    connection = connections[router.db_for_write(closure_model)]
+    columns = ', '.join(connection.ops.quote_name(meta.get_field(name).column) for name in ('ancestor', 'descendant', 'depth'))
+    sql = f'INSERT INTO {connection.ops.quote_name(meta.db_table)} ({columns}) VALUES (%s, %s, %s)'
+    written = 0
+    links = iter(links)
+    with connection.cursor() as cursor:
+        while batch := list(islice(links, BATCH_SIZE * 10)):
+            cursor.executemany(sql, batch)
+            written += len(batch)
+    return written
+
+
+@transaction.atomic
+def rebuild_closure(office_model=PostOffice, closure_model=PostOfficeClosure):
+    """
+    Recompute the whole closure table from PostOffice.division_pincode.
+    Returns the number of rows written.
+    """
+    parents = dict(office_model.objects.values_list('pincode', 'division_pincode'))
+    closure_model.objects.all().delete()
+    return insert_closure_links(closure_links(parents), closure_model)
@@ -0,0 +1,209 @@
+"""
+Bulk import of post offices from CSV or JSON rows with the PostOffice fields
+(pincode, name, contactNo, address, division_pincode).
+
+Every row is checked in memory against one read of the existing tree: required
+fields and lengths, six digit pincodes, pincodes repeated in the file, parents
+that exist neither in the tree nor in the file, and parent links that would make
+a cycle. Rows that fail, and rows below them, are rejected and reported; the
+others are upserted with bulk_create(update_conflicts=True) in batches and the
+closure table is brought up to date in the same transaction: new offices are
+linked and moved subtrees re-linked, or the whole table is rebuilt on request.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from post_office.hierarchy import BATCH_SIZE, add_node, closure_links, insert_closure_links, move_node, rebuild_closure
+from post_office.models import PostOffice
+from users.scope import invalidate_all_scopes
+from waste_management.response_cache import invalidate_all
+
+FIELDS = ('pincode', 'name', 'contactNo', 'address', 'division_pincode')
+UPDATE_FIELDS = ['name', 'contactNo', 'address', 'division_pincode', 'updated_at']
+PINCODE_LENGTH = 6
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def read_rows(text, format):
+    """
+    The rows of a CSV (with a header line) or JSON array document, as dicts.
+    """
+    if format == 'csv':
+        return list(csv.DictReader(io.StringIO(text)))
+    if format == 'json':
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise ImportFormatError(f'JSON parse error - {e}')
+        if not isinstance(rows, list):
+            raise ImportFormatError('Expected a JSON array of post offices')
+        return rows
+    raise ImportFormatError(f'Unknown format {format!r}; expected csv or json')
+
+
+def _text(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def _row_errors(row):
+    if not isinstance(row, dict):
+        return {'non_field_errors': ['Expected an object']}
+    errors = {}
+    for field in FIELDS:
+        value = _text(row, field)
+        if not value:
+            if field != 'division_pincode':
+                errors[field] = ['This field is required.']
+            continue
+        max_length = PostOffice._meta.get_field(field).max_length
+        if max_length and len(value) > max_length:
+            errors[field] = [f'Ensure this field has no more than {max_length} characters.']
+    for field in ('pincode', 'division_pincode'):
+        value = _text(row, field)
+        if value and field not in errors and not (value.isdigit() and len(value) == PINCODE_LENGTH):
+            errors[field] = [f'Expected a {PINCODE_LENGTH} digit pincode.']
+    return errors
+
+
+def validate_rows(rows, parents, root=None, allowed=None):
+    """
+    Check `rows` against the existing tree, given as {pincode: parent pincode or None}.
+
+    With `root`, rows without a division_pincode go under it and every office must
+    end up below it; `allowed` are the existing pincodes rows may update (None: all).
+    Returns ({pincode: (row number, field values)}, [rejected rows]).
+    """
+    accepted, rejected = {}, []
+
+    def reject(number, row, errors):
+        pincode = _text(row, 'pincode') if isinstance(row, dict) else ''
+        rejected.append({'row': number, 'pincode': pincode or None, 'errors': errors})
+
+    for number, row in enumerate(rows):
+        errors = _row_errors(row)
+        pincode = _text(row, 'pincode') if not errors else None
+        if pincode in accepted:
+            errors = {'pincode': [f'Repeats row {accepted[pincode][0]}.']}
+        elif pincode is not None and pincode == root:
+            errors = {'pincode': ['The division office itself cannot be imported.']}
+        elif pincode is not None and allowed is not None and pincode in parents and pincode not in allowed:
+            errors = {'pincode': ['This post office belongs to another division.']}
+        if errors:
+            reject(number, row, errors)
+            continue
+        values = {field: _text(row, field) for field in FIELDS}
+        values['division_pincode'] = values['division_pincode'] or root
+        accepted[pincode] = (number, values)
+
+    # The tree after the import; an office whose parent is missing, or which is
+    # not under `root`, takes the rows below it in the file along with it
+    tree = {**parents, **{pincode: values['division_pincode'] for pincode, (_, values) in accepted.items()}}
+    reasons, valid = {}, set()
+    for pincode in accepted:
+        path, node = [], pincode
+        while node is not None and node not in reasons and node not in valid and node != root:
+            if node in path:
+                reasons.update({n: 'Parent links form a cycle.' for n in path[path.index(node):]})
+                break
+            if node not in tree:
+                reasons[path[-1]] = f'Unknown division_pincode {node}.'
+                break
+            path.append(node)
+            node = tree[node]
+        else:
+            if node is None and root is not None:
+                reasons.update({n: 'Not under your division.' for n in path})
+        for n in reversed(path):
+            if n in reasons:
+                continue
+            parent = tree[n]
+            if parent in reasons:
+                reasons[n] = f'division_pincode {parent} was rejected.'
+        valid.update(n for n in path if n not in reasons)
+    for pincode, reason in reasons.items():
+        if pincode in accepted:
+            number, values = accepted.pop(pincode)
+            reject(number, values, {'division_pincode': [reason]})
+    rejected.sort(key=lambda rejection: rejection['row'])
+    return accepted, rejected
+
+
+def _depth(tree, pincode):
+    depth = 0
+    while tree.get(pincode) is not None:
+        pincode = tree[pincode]
+        depth += 1
+    return depth
+
+
+def link_offices(tree, offices, created, moved):
+    """
+    Bring the closure table in line with `tree`, the {pincode: parent} map after the
+    import, for the `created` and `moved` (existing, new parent) offices. Only their
+    subtrees are touched.
+    """
+    created = set(created)
+    moved = {office.pincode for office in moved}
+
+    def below_moved(pincode):
+        node = tree.get(pincode)
+        while node is not None:
+            if node in moved:
+                return True
+            node = tree.get(node)
+        return False
+
+    # New offices outside the moved subtrees are linked in bulk; the others, and the
+    # moves, one by one from the top, so every parent is in place before its children
+    late = {pincode for pincode in created if below_moved(pincode)}
+    insert_closure_links(closure_links(tree, created - late))
+    for office in sorted((office for office in offices if office.pincode in late | moved), key=lambda office: _depth(tree, office.pincode)):
+        if office.pincode in moved:
+            move_node(office)
+        else:
+            add_node(office)
+
+
+def import_offices(rows, root=None, allowed=None, batch_size=BATCH_SIZE, rebuild=False):
+    """
+    Validate and upsert `rows` (see validate_rows for `root` and `allowed`) in one
+    transaction. Returns {'created', 'updated', 'rejected'}.
+
+    With `rebuild`, moving offices recomputes the whole closure table, which is
+    quicker than re-linking when a large import moves many subtrees.
+    """
+    with transaction.atomic():
+        parents = dict(PostOffice.objects.values_list('pincode', 'division_pincode'))
+        accepted, rejected = validate_rows(rows, parents, root, allowed)
+        offices = [
+            PostOffice(
+                pincode=pincode, name=values['name'], contactNo=values['contactNo'], address=values['address'],
+                division_pincode_id=values['division_pincode'],
+            )
+            for pincode, (_, values) in accepted.items()
+        ]
+        PostOffice.objects.bulk_create(
+            offices, batch_size=batch_size, update_conflicts=True, unique_fields=['pincode'], update_fields=UPDATE_FIELDS,
+        )
+
+        created = [office.pincode for office in offices if office.pincode not in parents]
+        moved = [office for office in offices if office.pincode in parents and parents[office.pincode] != office.division_pincode_id]
+        if moved and rebuild:
+            rebuild_closure()
+        elif created or moved:
+            tree = {**parents, **{office.pincode: office.division_pincode_id for office in offices}}
+            link_offices(tree, offices, created, moved)
+
+        if offices:
+            # bulk_create sends no post_save, which would clear the scopes
+            invalidate_all_scopes()
+            transaction.on_commit(invalidate_all_scopes)
+            invalidate_all()
+    return {'created': len(created), 'updated': len(offices) - len(created), 'rejected': rejected}
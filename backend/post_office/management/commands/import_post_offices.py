@@ -0,0 +1,42 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from post_office.hierarchy import BATCH_SIZE
+from post_office.imports import ImportFormatError, import_offices, read_rows
+from post_office.models import PostOffice
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update post offices from a CSV (with a header line) or JSON array file with the columns pincode, "
+        "name, contactNo, address and division_pincode, and link them into the hierarchy. Invalid rows are skipped "
+        "and listed under \"rejected\" in the JSON report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The CSV or JSON file.")
+        parser.add_argument("--format", choices=["csv", "json"], help="Default: from the file extension.")
+        parser.add_argument(
+            "--parent", help="Pincode of an existing office that rows without a division_pincode go under, and that "
+            "every imported office must end up below."
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per INSERT.")
+
+    def handle(self, *args, **options):
+        format = options["format"] or os.path.splitext(options["path"])[1].lstrip(".").lower()
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        if options["parent"] and not PostOffice.objects.filter(pincode=options["parent"]).exists():
+            raise CommandError(f"Unknown post office {options['parent']!r}")
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as source:
+                rows = read_rows(source.read(), format)
+        except OSError as e:
+            raise CommandError(str(e))
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+
+        result = import_offices(rows, root=options["parent"], batch_size=options["batch_size"], rebuild=True)
+        self.stdout.write(json.dumps({"rows": len(rows), **result}, indent=2))
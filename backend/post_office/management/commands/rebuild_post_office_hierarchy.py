@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from post_office.hierarchy import rebuild_closure
+
+
+class Command(BaseCommand):
+    help = "Rebuild the post office closure table from PostOffice.division_pincode."
+
+    def handle(self, *args, **options):
+        written = rebuild_closure()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt post office hierarchy: {written} rows written."))
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_closure(apps, schema_editor):
+    # A frozen copy of post_office.hierarchy.rebuild_closure, so replaying this
+    # migration does not depend on the current code
+    PostOffice = apps.get_model("post_office", "PostOffice")
+    PostOfficeClosure = apps.get_model("post_office", "PostOfficeClosure")
+    alias = schema_editor.connection.alias
+
+    parents = dict(PostOffice.objects.using(alias).values_list("pincode", "division_pincode"))
+    rows = []
+    for pincode in parents:
+        depth, node, seen = 0, pincode, set()
+        while node in parents and node not in seen:
+            seen.add(node)
+            rows.append(PostOfficeClosure(ancestor_id=node, descendant_id=pincode, depth=depth))
+            node = parents[node]
+            depth += 1
+    PostOfficeClosure.objects.using(alias).bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostOfficeClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="post_office.postoffice",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="post_office.postoffice",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["descendant", "depth"],
+                        name="post_office_closure_desc_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ancestor", "descendant"),
+                        name="unique_post_office_closure",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_closure, migrations.RunPython.noop),
+    ]
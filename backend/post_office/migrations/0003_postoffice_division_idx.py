@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0002_postofficeclosure"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="postoffice",
+            index=models.Index(
+                fields=["division_pincode", "pincode"], name="postoffice_division_idx"
+            ),
+        ),
+    ]
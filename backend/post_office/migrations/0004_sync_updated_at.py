@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0003_postoffice_division_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="postoffice",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
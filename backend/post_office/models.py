@@ -6,6 +6,34 @@ class PostOffice(models.Model):
     contactNo = models.CharField(max_length=15)
     address = models.TextField()
     division_pincode = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
+    # Read by the offline sync endpoint (see waste_management.sync)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['division_pincode', 'pincode'], name='postoffice_division_idx'),
+        ]
 
     def __str__(self):
         return self.pincode
+
+
+class PostOfficeClosure(models.Model):
+    """
+    Closure table over the PostOffice tree: one row per (ancestor, descendant) pair,
+    including depth 0 self links, so any subtree is a single indexed lookup.
+    """
+    ancestor = models.ForeignKey(PostOffice, related_name='descendant_links', on_delete=models.CASCADE)
+    descendant = models.ForeignKey(PostOffice, related_name='ancestor_links', on_delete=models.CASCADE)
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_post_office_closure'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='post_office_closure_desc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
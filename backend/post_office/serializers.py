@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from .models import PostOffice
+from users.api.serializers import DynamicFieldsModelSerializer
 
-class PostOfficeSerializer(serializers.ModelSerializer):
+class PostOfficeSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model=PostOffice
         fields="__all__"
@@ -1,3 +1,214 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from post_office.hierarchy import add_node, build_closure_rows, is_under, move_node, offices_under, rebuild_closure, remove_node
+from post_office.models import PostOffice, PostOfficeClosure
+from users.models import User
+from users.scope import invalidate_all_scopes, resolve_scope
+from waste_management.tests import AsyncParityTestCase, QueryBudgetTestCase, QueryPlanTestCase, RouteCase, deleted, echoes, has_keys, seed_hierarchy
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class PostOfficeQueryPlanTests(QueryPlanTestCase):
+
+    def test_direct_children_use_division_index(self):
+        queryset = PostOffice.objects.filter(division_pincode='411000').order_by('pincode')
+        self.assertNoFullScan(queryset)
+        self.assertUsesIndex(queryset, 'postoffice_division_idx')
+
+    def test_subtree_lookup_uses_closure_index(self):
+        queryset = offices_under('411000').order_by('pincode')[:101]
+        self.assertNoFullScan(queryset)
+
+
+def new_office(t, role):
+    office = PostOffice.objects.create(pincode=t.unique('1019'), name='Office', contactNo='0', address='-', division_pincode_id='101000')
+    add_node(office)
+    return f'/api/v1/post/postoffice/{office.pincode}/'
+
+
+def import_rows(t, role):
+    t.counter += 1
+    return [
+        {'pincode': f'17{t.counter:02d}{i:02d}', 'name': 'Office', 'contactNo': '0', 'address': '-', 'division_pincode': '101000'}
+        for i in range(3)
+    ]
+
+
+POST_OFFICE_ROUTES = [
+    RouteCase('GET', 'api/v1/post/postoffice/', 4, roles=('divisional',), expect=has_keys('data')),
+    RouteCase('POST', 'api/v1/post/postoffice/', 11, data=lambda t, role: {
+        'pincode': t.unique('1018'), 'name': 'Office', 'contactNo': '0', 'address': '-',
+    }, roles=('divisional',), status=201, expect=echoes),
+    RouteCase('GET', 'api/v1/post/async/postoffice/', 4, roles=('divisional',), expect=has_keys('data')),
+    RouteCase('PUT', 'api/v1/post/postoffice/<pk>/', 8, path=new_office, data=lambda t, role: {'name': 'Renamed'}, roles=('divisional',), expect=echoes),
+    RouteCase('PATCH', 'api/v1/post/postoffice/<pk>/', 8, path=new_office, data=lambda t, role: {'name': 'Renamed'}, roles=('divisional',), expect=echoes),
+    RouteCase('DELETE', 'api/v1/post/postoffice/<pk>/', 25, path=new_office, roles=('divisional',), status=204, expect=deleted(PostOffice)),
+    RouteCase('POST', 'api/v1/post/postoffice/import/', 8, data=import_rows, roles=('divisional',), status=201,
+              expect=lambda t, role, response, data: t.assertEqual((response.data['created'], response.data['rejected']), (3, []))),
+]
+
+
+class PostOfficeQueryBudgetTests(QueryBudgetTestCase):
+    routes = POST_OFFICE_ROUTES
+
+
+class PostOfficeAsyncParityTests(AsyncParityTestCase):
+    pairs = [
+        ('/api/v1/post/postoffice/', '/api/v1/post/async/postoffice/', [
+            {}, {'page_size': 2}, {'page_size': 2, 'fields': 'pincode,name'}, {'cursor': 'not a cursor'},
+        ]),
+    ]
+
+
+class HierarchyTests(TestCase):
+    """
+    The incremental closure updates leave the same table as a full rebuild.
+    """
+
+    def setUp(self):
+        invalidate_all_scopes()
+        self.seed = seed_hierarchy(divisions=2, sub_divisions=2, offices=2)
+
+    def assertMatchesRebuild(self):
+        links = set(PostOfficeClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        rebuild_closure()
+        self.assertEqual(links, set(PostOfficeClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')))
+
+    def move(self, pincode, parent):
+        office = PostOffice.objects.get(pincode=pincode)
+        office.division_pincode_id = parent
+        office.save()
+        move_node(office)
+
+    def test_add_node(self):
+        for pincode, parent in (('101003', '101000'), ('101900', '101003'), ('300000', None)):
+            add_node(PostOffice.objects.create(pincode=pincode, name='Office', contactNo='0', address='-', division_pincode_id=parent))
+        self.assertTrue(is_under('101900', '100000'))
+        self.assertMatchesRebuild()
+
+    def test_move_node(self):
+        self.move('101000', '200000')  # a sub-division with its offices
+        self.assertLessEqual({'101000', '101001', '101002'}, set(offices_under('200000').values_list('pincode', flat=True)))
+        self.assertMatchesRebuild()
+        self.move('202000', None)
+        self.assertFalse(is_under('202001', '200000'))
+        self.assertMatchesRebuild()
+
+    def test_move_under_own_descendant_is_rejected(self):
+        office = PostOffice.objects.get(pincode='101000')
+        office.division_pincode_id = '101001'
+        with self.assertRaises(ValueError):
+            move_node(office)
+        self.assertMatchesRebuild()
+
+    def test_remove_node(self):
+        remove_node(PostOffice.objects.get(pincode='101000'))
+        self.assertIsNone(PostOffice.objects.get(pincode='101001').division_pincode_id)
+        self.assertFalse(is_under('101001', '100000'))
+        self.assertMatchesRebuild()
+
+    def test_scopes_follow_the_closure(self):
+        sub_division, division = self.seed.users['sub_divisional'], User.objects.get(username='division2')
+        self.assertEqual(resolve_scope(sub_division).pincodes, {'101000', '101001', '101002'})
+        self.move('101002', '201000')
+        self.assertEqual(resolve_scope(sub_division).pincodes, {'101000', '101001'})
+        self.assertIn('101002', resolve_scope(division).pincodes)
+        self.assertNotIn('101002', resolve_scope(self.seed.users['divisional']).pincodes)
+
+
+class PostOfficeImportTests(TestCase):
+    url = '/api/v1/post/postoffice/import/'
+
+    def setUp(self):
+        invalidate_all_scopes()
+        self.seed = seed_hierarchy(divisions=2, sub_divisions=1, offices=2)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['divisional'])[0].key)
+
+    def office(self, pincode, parent='', name='Office'):
+        return {'pincode': pincode, 'name': name, 'contactNo': '0', 'address': '-', 'division_pincode': parent}
+
+    def assertClosureConsistent(self):
+        parents = dict(PostOffice.objects.values_list('pincode', 'division_pincode'))
+        expected = {(row.ancestor_id, row.descendant_id, row.depth) for row in build_closure_rows(parents)}
+        self.assertEqual(set(PostOfficeClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')), expected)
+
+    def test_valid_rows_are_imported_and_invalid_ones_reported(self):
+        rows = [
+            self.office('103001', parent='103000'),  # parent further down the file
+            self.office('103000'),  # directly under the division
+            self.office('101001', parent='101000', name='Renamed'),
+            self.office('103000'),
+            self.office('12345'),
+            self.office('103002', parent='109999'),
+            self.office('103003', parent='103002'),
+            self.office('201001', parent='101000'),  # another division's office
+            self.office('103004', parent='201000'),
+            {'pincode': '103005'},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 1))
+        self.assertEqual([rejection['row'] for rejection in response.data['rejected']], [3, 4, 5, 6, 7, 8, 9])
+        self.assertIn('name', response.data['rejected'][-1]['errors'])
+
+        self.assertEqual(PostOffice.objects.get(pincode='101001').name, 'Renamed')
+        self.assertEqual(set(offices_under('100000').values_list('pincode', flat=True)), {'101000', '101001', '101002', '103000', '103001'})
+        self.assertClosureConsistent()
+        listing = self.client.get('/api/v1/post/postoffice/').json()
+        self.assertIn('103001', [office['pincode'] for office in listing['data']])
+
+    def test_csv_body(self):
+        body = 'pincode,name,contactNo,address,division_pincode\n103000,Office,0,-,\n103001,Office,0,-,103000\n'
+        response = self.client.post(self.url, body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['created'], 2)
+        self.assertClosureConsistent()
+
+    def test_moves_relink_only_the_moved_subtrees(self):
+        rows = [
+            self.office('101003', parent='101001'),  # new, below a moved office
+            self.office('101000', parent='103000'),  # moves under a new office
+            self.office('103000'),
+            self.office('101002', parent='101004'),  # moves under a new office below a moved one
+            self.office('101004', parent='101000'),
+        ]
+        with mock.patch('post_office.imports.rebuild_closure') as rebuild:
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['rejected']), (3, 2, []))
+        rebuild.assert_not_called()
+        self.assertEqual(
+            set(offices_under('103000').values_list('pincode', flat=True)), {'101000', '101001', '101002', '101003', '101004'},
+        )
+        self.assertClosureConsistent()
+
+    def test_command_moves_offices_and_rejects_cycles(self):
+        rows = [
+            self.office('101000', parent='200000'),  # moves a whole sub-division
+            self.office('300000'),
+            self.office('300001', parent='300000'),
+            self.office('201000', parent='201001'),  # its own child
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'offices.json')
+            with open(path, 'w') as target:
+                json.dump(rows, target)
+            out = StringIO()
+            call_command('import_post_offices', path, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['created'], report['updated']), (2, 1))
+        self.assertEqual([rejection['pincode'] for rejection in report['rejected']], ['201000'])
+        self.assertIn('101001', offices_under('200000').values_list('pincode', flat=True))
+        self.assertClosureConsistent()
 
-# Create your tests here.
@@ -1,7 +1,11 @@
 from rest_framework.routers import DefaultRouter
-from post_office.views import PostOfficeViewSet
+from post_office.views import PostOfficeImportView, PostOfficeViewSet
+from post_office.async_views import AsyncPostOfficeListView
 from django.urls import path
 
 urlpatterns = [
     path('postoffice/', PostOfficeViewSet.as_view(), name='postoffice-list-create'),
+    path('async/postoffice/', AsyncPostOfficeListView.as_view(), name='postoffice-async-list'),
+    path('postoffice/import/', PostOfficeImportView.as_view(), name='postoffice-import'),
+    path('postoffice/<str:pk>/', PostOfficeViewSet.as_view(), name='postoffice-detail'),
 ]
\ No newline at end of file
@@ -1,13 +1,21 @@
-from rest_framework import viewsets, permissions
+from rest_framework import permissions
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.parsers import JSONParser
+from django.db import transaction
 from .models import PostOffice
+from .hierarchy import add_node, move_node, offices_under, remove_node
+from .imports import import_offices
 from .serializers import PostOfficeSerializer
-from users.models import DivisionalOffice
 from users.api.permissions import IsDivisionalOffice
-import logging
+from users.scope import get_scope
+from waste_management.response_cache import cache_response, invalidate_pincodes
+from waste_management.sync import record_office_deletion
+from waste_management.parsers import CSVParser
+from backend.database import read_replica
+from users.api.pagination import KeysetPagination, requested_fields
 
 class PostOfficeViewSet(APIView):
     """
@@ -17,6 +25,17 @@ class PostOfficeViewSet(APIView):
     permission_classes = [permissions.IsAuthenticated, IsDivisionalOffice]
     queryset = PostOffice.objects.all()
     serializer_class = PostOfficeSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('pincode',)
+
+    def get_object(self):
+        return self.queryset.get(pk=self.kwargs.get('pk'))
+
+    def put(self, request, *args, **kwargs):
+        return self.update_post_office(request, *args, **kwargs)
+
+    def patch(self, request, *args, **kwargs):
+        return self.update_post_office(request, *args, **kwargs)
 
     @action(detail=True, methods=['put', 'patch'], permission_classes=[permissions.IsAuthenticated & IsDivisionalOffice])
     def update_post_office(self, request, *args, **kwargs):
@@ -28,11 +47,11 @@ class PostOfficeViewSet(APIView):
             # Get the PostOffice instance using the pincode (primary key)
             post_office = self.get_object()
             
-            # Get the current user's division pincode from the DivisionalOffice model
-            current_user_division = DivisionalOffice.objects.get(user=request.user).pincode
+            # Get the current user's division pincode from the scope
+            current_user_division = get_scope(request).office_pincode
 
-            # Check if the division pincode of the post office matches the user's division pincode
-            if post_office.division_pincode != current_user_division:
+            # Check if the post office is under the user's division
+            if post_office.pincode not in get_scope(request).pincodes:
                 return Response({"error": "You are not authorized to update this post office."}, status=status.HTTP_403_FORBIDDEN)
 
             # If the post office belongs to the user's division, update it
@@ -44,13 +63,17 @@ class PostOfficeViewSet(APIView):
             serializer = PostOfficeSerializer(post_office, data=request.data, partial=True)  # partial=True allows partial updates
             
             if serializer.is_valid():  # Check if the data is valid
-                serializer.save()  # Save the updated PostOffice to the database
+                previous_parent = post_office.division_pincode_id
+                with transaction.atomic():
+                    invalidate_pincodes([post_office.pincode])  # Offices above the old position
+                    post_office = serializer.save()  # Save the updated PostOffice to the database
+                    # Re-link the subtree if the office moved to another parent
+                    if post_office.division_pincode_id != previous_parent:
+                        move_node(post_office)
+                        invalidate_pincodes([post_office.pincode])  # Offices above the new position
                 return Response(serializer.data, status=status.HTTP_200_OK)  # Return the updated PostOffice data with a 200 OK status
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)  # Return errors if the data is invalid
-        except DivisionalOffice.DoesNotExist:
-            return Response({"error": "User is not associated with a divisional office."}, status=status.HTTP_403_FORBIDDEN)
-
         except PostOffice.DoesNotExist:
             return Response({"error": "PostOffice not found."}, status=status.HTTP_404_NOT_FOUND)
         
@@ -65,20 +88,17 @@ class PostOfficeViewSet(APIView):
             # Get the PostOffice instance using the pincode (primary key)
             post_office = self.get_object()
             
-            # Get the current user's division pincode from the DivisionalOffice model
-            current_user_division = DivisionalOffice.objects.get(user=request.user).pincode
-
-            # Check if the division pincode of the post office matches the user's division pincode
-            if post_office.division_pincode != current_user_division:
+            # Check if the post office is under the user's division
+            if post_office.pincode not in get_scope(request).pincodes:
                 return Response({"error": "You are not authorized to delete this post office."}, status=status.HTTP_403_FORBIDDEN)
 
-            # If the post office belongs to the user's division, delete it
-            post_office.delete()
+            # If the post office belongs to the user's division, delete it and unlink it from the hierarchy
+            with transaction.atomic():
+                invalidate_pincodes([post_office.pincode])
+                record_office_deletion(post_office)
+                remove_node(post_office)
             return Response({"message": "PostOffice deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
         
-        except DivisionalOffice.DoesNotExist:
-            return Response({"error": "User is not associated with a divisional office."}, status=status.HTTP_403_FORBIDDEN)
-        
         except PostOffice.DoesNotExist:
             return Response({"error": "PostOffice not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -88,40 +108,68 @@ class PostOfficeViewSet(APIView):
         """
         Handle POST request: Create a new PostOffice with the division_pincode set to the user's associated pincode.
         """
-        try:
-            # Get the current user's associated division pincode from DivisionalOffice
-            current_user_division = DivisionalOffice.objects.get(user=request.user).pincode
+        # Get the current user's associated division pincode from the scope
+        current_user_division = get_scope(request).office_pincode
 
-            # Add the division_pincode to the request data
-            request.data['division_pincode'] = current_user_division
+        # Add the division_pincode to the request data
+        request.data['division_pincode'] = current_user_division
 
-            # Serialize the data
-            serializer = PostOfficeSerializer(data=request.data)
-            if serializer.is_valid():  # Check if the data is valid
-                serializer.save()  # Save the new PostOffice to the database
-                return Response(serializer.data, status=status.HTTP_201_CREATED)  # Return the created PostOffice data with a 201 CREATED status
-            else:
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)  # Return errors if the data is invalid
-        except DivisionalOffice.DoesNotExist:
-            return Response({"error": "User is not associated with a divisional office."}, status=status.HTTP_403_FORBIDDEN)
+        # Serialize the data
+        serializer = PostOfficeSerializer(data=request.data)
+        if serializer.is_valid():  # Check if the data is valid
+            with transaction.atomic():
+                post_office = serializer.save()  # Save the new PostOffice and link it into the hierarchy
+                add_node(post_office)
+                invalidate_pincodes([post_office.pincode])
+            return Response(serializer.data, status=status.HTTP_201_CREATED)  # Return the created PostOffice data with a 201 CREATED status
+        else:
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)  # Return errors if the data is invalid
         
 
 
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated& IsDivisionalOffice])
-    def get(self, request):
+    @read_replica
+    @cache_response('postoffice-list')
+    def get(self, request, *args, **kwargs):
         """
         Custom action to filter PostOffices by division.
         """
        
-        try:
-            # Get the current user's division
-            current_user_division = DivisionalOffice.objects.get(user=request.user).pincode
-            # print("cuurent", current_user_division)
-            offices = self.queryset.filter(division_pincode=current_user_division)
-            serializer = PostOfficeSerializer(offices, many=True)
-            if len(serializer.data):
-                return Response({"message": "User is not associated with a divisional office."}, status=403)
-            return Response({"data":serializer.data,"message": "User is not associated with a divisional office."})
-        except DivisionalOffice.DoesNotExist:
-            return Response({"error": "User is not associated with a divisional office."}, status=403)
+        # Get the current user's division
+        current_user_division = get_scope(request).office_pincode
+        offices = offices_under(current_user_division)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(offices, request, view=self)
+        serializer = PostOfficeSerializer(page, many=True, fields=requested_fields(request))
+        return Response({"data":serializer.data,"next_cursor":paginator.next_cursor,"message": "Post offices under the division."})
+
+
+class PostOfficeImportView(APIView):
+    """
+    Bulk import of post offices into the user's division: a JSON array or a CSV
+    body with the PostOffice fields. Rows without a division_pincode go directly
+    under the division. Existing pincodes of the division are updated. Invalid rows
+    are reported in `rejected` and the others imported.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, IsDivisionalOffice]
+    parser_classes = [JSONParser, CSVParser]
+    max_rows = 10000
+
+    def post(self, request, *args, **kwargs):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({"error": "Expected a JSON array or CSV rows."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_rows:
+            return Response({"error": f"At most {self.max_rows} rows per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        scope = get_scope(request)
+        result = import_offices(rows, root=scope.office_pincode, allowed=scope.pincodes)
+        if result['created']:
+            status_code = status.HTTP_201_CREATED
+        elif result['updated']:
+            status_code = status.HTTP_200_OK
+        else:
+            status_code = status.HTTP_400_BAD_REQUEST
+        return Response({**result, "message": "Post offices imported."}, status=status_code)
@@ -0,0 +1,52 @@
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from users.api.authentication import CachedTokenAuthentication
+from users.api.permissions import HasOfficeScope
+from users.scope import aget_scope
+
+
+class AsyncAPIView(View):
+    """
+    Async base for read-only JSON endpoints served under ASGI.
+
+    Authenticates with the token cache, resolves the office scope once and checks
+    DRF permission classes, without holding a thread while the ORM queries run.
+    Handlers receive a DRF Request, so `query_params` and the sync helpers keep working.
+    """
+    permission_classes = [HasOfficeScope]
+    http_method_names = ['get', 'head', 'options']
+
+    def error(self, message, status, **headers):
+        response = JsonResponse({'detail': message}, status=status)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request)
+        authenticator = CachedTokenAuthentication()
+        try:
+            user_auth = await authenticator.aauthenticate(request)
+        except exceptions.AuthenticationFailed as e:
+            return self.error(str(e.detail), 401, **{'WWW-Authenticate': authenticator.authenticate_header(request)})
+        if user_auth is None:
+            return self.error(
+                'Authentication credentials were not provided.', 401,
+                **{'WWW-Authenticate': authenticator.authenticate_header(request)},
+            )
+        request.user, request.auth = user_auth
+
+        await aget_scope(request)
+        for permission_class in self.permission_classes:
+            permission = permission_class()
+            if not permission.has_permission(request, self):
+                message = getattr(permission, 'message', 'You do not have permission to perform this action.')
+                return self.error(str(message), 403)
+
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as e:
+            return JsonResponse(e.detail if isinstance(e.detail, (dict, list)) else {'detail': e.detail}, status=e.status_code, safe=False)
@@ -1,11 +1,21 @@
 from rest_framework.permissions import BasePermission
+from users.scope import get_scope
 
 class IsDivisionalOffice(BasePermission):
     def has_permission(self, request, view):
-
-        return bool(request.user and request.user.is_divisional)
+        scope = get_scope(request)
+        return bool(scope and scope.is_divisional)
 
 class IsSubDivisionalOffice(BasePermission):
     def has_permission(self, request, view):
+        scope = get_scope(request)
+        return bool(scope and scope.is_sub_divisional)
+
+class HasOfficeScope(BasePermission):
+    """
+    Allows users that act for a divisional or sub-divisional office.
+    """
+    message = 'User does not have access to this data'
 
-        return bool(request.user and request.user.is_sub_divisional)
\ No newline at end of file
+    def has_permission(self, request, view):
+        return get_scope(request) is not None
@@ -3,6 +3,19 @@ from rest_framework import serializers
 from users.models import User, DivisionalOffice, SubDivisionalOffice
 
 
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    A ModelSerializer that takes an additional `fields` argument
+    to limit the output to the columns the client asked for.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
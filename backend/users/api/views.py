@@ -8,12 +8,12 @@ from users.models import DivisionalOffice,SubDivisionalOffice
 from users.api.serializers import UserSerializer,DivisionalOfficeSignUpSerializer,SubDivisionalOfficeSignUpSerializer,DivisionalOfficeSerializer,SubDivisionalOfficeSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
 from users.api.permissions import IsDivisionalOffice,IsSubDivisionalOffice
+from users.api.authentication import token_cache
 
 class DivisionalOfficeSignUpView(generics.GenericAPIView):
     serializer_class=DivisionalOfficeSignUpSerializer
 
     def post(self, request, *args, **kwargs):
-        print(request)
         serializer=self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user=serializer.save()
@@ -50,7 +50,6 @@ class CustomAuthToken(ObtainAuthToken):
         user=serializer.validated_data['user']
 
         token,created = Token.objects.get_or_create(user=user)
-        print(token)
         data = None
         if user.is_divisional:
             offices = DivisionalOffice.objects.filter(user=user)
@@ -71,6 +70,7 @@ class CustomAuthToken(ObtainAuthToken):
 
 class LogoutView(APIView):
     def post(self, request, format=None):
+        token_cache.evict(request.auth.key)
         request.auth.delete()
         return Response(status=HTTP_200_OK)
 
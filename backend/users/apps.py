@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        # Register the scope and token cache invalidation signals
+        from users import scope  # noqa: F401
+        from users.api import authentication  # noqa: F401
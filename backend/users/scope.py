@@ -0,0 +1,139 @@
+import threading
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from post_office.hierarchy import offices_under
+from post_office.models import PostOffice
+from users.models import DivisionalOffice, SubDivisionalOffice, User
+
+DIVISIONAL = 'divisional'
+SUB_DIVISIONAL = 'sub_divisional'
+
+
+@dataclass(frozen=True)
+class OfficeScope:
+    """
+    The office a user acts for and the pincodes it may read and write.
+    """
+    role: str
+    office_pincode: str
+    pincodes: frozenset
+
+    @property
+    def is_divisional(self):
+        return self.role == DIVISIONAL
+
+    @property
+    def is_sub_divisional(self):
+        return self.role == SUB_DIVISIONAL
+
+
+# user id -> (generation, expiry, scope)
+_cache = {}
+_lock = threading.Lock()
+_generation = 0
+
+
+def _ttl():
+    return getattr(settings, 'SCOPE_CACHE_TTL', 300)
+
+
+def _load_scope(user):
+    if user.is_divisional:
+        pincode = DivisionalOffice.objects.filter(user_id=user.pk).values_list('pincode', flat=True).first()
+        if pincode is None:
+            return None
+        pincodes = offices_under(pincode).values_list('pincode', flat=True)
+        return OfficeScope(DIVISIONAL, str(pincode), frozenset(pincodes))
+    if user.is_sub_divisional:
+        pincode = SubDivisionalOffice.objects.filter(user_id=user.pk).values_list('pincode', flat=True).first()
+        if pincode is None:
+            return None
+        pincodes = offices_under(pincode, include_self=True).values_list('pincode', flat=True)
+        return OfficeScope(SUB_DIVISIONAL, str(pincode), frozenset(pincodes))
+    return None
+
+
+def resolve_scope(user):
+    """
+    Return the OfficeScope of the user from the process cache, loading it on a miss.
+    Returns None for users without an office.
+    """
+    if not user or not user.is_authenticated:
+        return None
+    now = time.monotonic()
+    entry, generation = _cached(user)
+    if entry and entry[0] == generation and entry[1] > now:
+        return entry[2]
+
+    scope = _load_scope(user)
+    with _lock:
+        # Only store if nothing was invalidated while loading
+        if generation == _generation:
+            _cache[user.pk] = (generation, now + _ttl(), scope)
+    return scope
+
+
+def _cached(user):
+    with _lock:
+        return _cache.get(user.pk), _generation
+
+
+async def aresolve_scope(user):
+    """
+    Async resolve_scope(): answers from the process cache without leaving the
+    event loop, and only runs the loading queries in a thread on a miss.
+    """
+    if user and user.is_authenticated:
+        entry, generation = _cached(user)
+        if entry and entry[0] == generation and entry[1] > time.monotonic():
+            return entry[2]
+    return await sync_to_async(resolve_scope)(user)
+
+
+def get_scope(request):
+    """
+    Request scoped accessor: resolves the scope once per request.
+    """
+    if not hasattr(request, '_office_scope'):
+        request._office_scope = resolve_scope(request.user)
+    return request._office_scope
+
+
+async def aget_scope(request):
+    if not hasattr(request, '_office_scope'):
+        request._office_scope = await aresolve_scope(request.user)
+    return request._office_scope
+
+
+def invalidate_user_scope(user_id):
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+def invalidate_all_scopes():
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=DivisionalOffice)
+@receiver([post_save, post_delete], sender=SubDivisionalOffice)
+def _office_changed(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    invalidate_user_scope(user_id)
+    transaction.on_commit(lambda: invalidate_user_scope(user_id))
+
+
+@receiver([post_save, post_delete], sender=PostOffice)
+def _post_office_changed(sender, **kwargs):
+    invalidate_all_scopes()
+    transaction.on_commit(invalidate_all_scopes)
@@ -1,3 +1,150 @@
+import base64
+import json
+
 from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.api.authentication import token_cache
+from users.models import SubDivisionalOffice, User
+from users.scope import invalidate_all_scopes, resolve_scope
+from waste_management.models import Ewaste, PaperWaste
+from waste_management.tests import QueryBudgetTestCase, RouteCase, has_keys, seed_hierarchy, seed_records
+
+
+def signup_body(t, role):
+    return {
+        'username': t.unique('officer'), 'password': 'secret', 'confirm_password': 'secret', 'email': 'o@example.com',
+        'full_name': 'Officer', 'phone_number': '0', 'address': '-', 'pincode': 101000, 'division_pincode': 100000,
+    }
+
+
+def login_body(t, role):
+    username = t.unique('member')
+    User.objects.create_user(username, password='secret', is_divisional=True)
+    return {'username': username, 'password': 'secret'}
+
+
+USER_ROUTES = [
+    RouteCase('POST', 'api/v1/user-auth/signup/division/', 7, data=signup_body, roles=(None,), expect=has_keys('token', 'user')),
+    RouteCase('POST', 'api/v1/user-auth/signup/sub-division/', 7, data=signup_body, roles=(None,), expect=has_keys('token', 'user')),
+    RouteCase('POST', 'api/v1/user-auth/login/', 3, data=login_body, roles=(None,), expect=has_keys('token')),
+    RouteCase('POST', 'api/v1/user-auth/logout/', 2, expect=lambda t, role, response, data: t.assertFalse(Token.objects.filter(user=t.seed.users[role]).exists())),
+    RouteCase('GET', 'api/v1/division/dashboard/', 3, roles=('divisional',), expect=has_keys('username', 'is_divisional')),
+    RouteCase('GET', 'api/v1/sub-division/dashboard/', 3, roles=('sub_divisional',), expect=has_keys('username', 'is_sub_divisional')),
+]
+
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+    routes = USER_ROUTES
+
+
+class AuthCacheTests(TestCase):
+    """
+    Cached tokens and office scopes go stale as soon as the user, token or office changes.
+    """
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=2, offices=1)
+        self.user = self.seed.users['sub_divisional']
+        self.token = Token.objects.get_or_create(user=self.user)[0]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def dashboard(self):
+        return self.client.get('/api/v1/sub-division/dashboard/').status_code
+
+    def test_logout_evicts_the_cached_token(self):
+        self.assertEqual(self.dashboard(), 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.post('/api/v1/user-auth/logout/').status_code, 200)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.dashboard(), 401)
+
+    def test_deleted_token_and_inactive_user_are_not_served_from_the_cache(self):
+        self.assertEqual(self.dashboard(), 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.dashboard(), 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.dashboard(), 200)
+        Token.objects.filter(user=self.user).delete()
+        self.assertEqual(self.dashboard(), 401)
+
+    def test_scope_follows_a_change_of_office(self):
+        PaperWaste.objects.create(pincode_id='101001', weight=1)
+        PaperWaste.objects.create(pincode_id='102001', weight=2)
+
+        def listed():
+            response = self.client.get('/api/v1/waste-management/paperwaste/')
+            self.assertEqual(response.status_code, 200)
+            return [row['pincode'] for row in response.json()['results']]
+
+        self.assertEqual(resolve_scope(self.user).office_pincode, '101000')
+        self.assertEqual(listed(), ['101001'])
+        office = SubDivisionalOffice.objects.get(user=self.user)
+        office.pincode = 102000
+        office.save()
+        self.assertEqual(resolve_scope(self.user).pincodes, {'102000', '102001'})
+        self.assertEqual(listed(), ['102001'])
+
+
+def cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class KeysetPaginationTests(TestCase):
+    routes = {'/api/v1/waste-management/ewaste/': 'results', '/api/v1/waste-management/ewaste/analytics/': 'data'}
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=2, sub_divisions=2, offices=2)
+        seed_records(self.seed.pincodes, 3)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['divisional'])[0].key)
+
+    def pages(self, url, key, **params):
+        rows, next_cursor = [], None
+        while True:
+            response = self.client.get(url, {**params, **({'cursor': next_cursor} if next_cursor else {})})
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            rows.extend(body[key])
+            next_cursor = body['next_cursor']
+            if next_cursor is None:
+                return rows
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = list(
+            Ewaste.objects.filter(pincode__in=resolve_scope(self.seed.users['divisional']).pincodes)
+            .order_by('date_time', 'id').values_list('id', flat=True)
+        )
+        # Rows share date_time across offices, so pages end in the middle of a tie
+        self.assertGreater(len(expected), 7)
+        for url, key in self.routes.items():
+            with self.subTest(url):
+                self.assertEqual([row['id'] for row in self.pages(url, key, page_size=7)], expected)
+
+    def test_analytics_fields_projection(self):
+        response = self.client.get('/api/v1/waste-management/ewaste/analytics/', {'fields': 'id,no_of_units', 'page_size': 2})
+        self.assertEqual({tuple(sorted(row)) for row in response.json()['data']}, {('id', 'no_of_units')})
+        # Totals are still computed over every row, not the page
+        self.assertEqual(len(response.json()['data']), 2)
+        full = self.client.get('/api/v1/waste-management/ewaste/analytics/', {'page_size': 1000}).json()
+        self.assertEqual({key: value for key, value in response.json().items() if key not in ('data', 'next_cursor')},
+                         {key: value for key, value in full.items() if key not in ('data', 'next_cursor')})
+
+    def test_invalid_cursors_are_refused(self):
+        for url in self.routes:
+            for values in (['notadate', 1], ['2024-01-01T00:00:00Z', 'x'], [None, None], [{'a': 1}, 2], ['2024-01-01T00:00:00Z'], {'a': 1}):
+                with self.subTest(url=url, cursor=values):
+                    response = self.client.get(url, {'cursor': cursor(values)})
+                    self.assertEqual(response.status_code, 400, response.content)
+                    self.assertIn('cursor', response.json())
+            self.assertEqual(self.client.get(url, {'cursor': 'not base64!'}).status_code, 400)
 
-# Create your tests here.
@@ -0,0 +1,265 @@
+from django.db.models import Count, DateField, FloatField, Max, Min, Q, Sum, Value
+from django.db.models.functions import Cast, NullIf, Trunc
+from django.utils.dateparse import parse_date
+
+from waste_management.models import DailyWasteRollup
+
+# Supported time buckets for the analytics summary
+GRANULARITIES = ('day', 'week', 'month')
+
+# Decimal places of the weights, prices and averages in summary buckets
+SUMMARY_DECIMALS = 2
+
+
+class SummaryParamsError(ValueError):
+    pass
+
+
+def parse_date_range(query_params):
+    """
+    Read the optional from/to dates from the query string.
+    Raises SummaryParamsError with a client facing message on bad input.
+    """
+    date_from = date_to = None
+    if query_params.get('from'):
+        date_from = parse_date(query_params['from'])
+        if date_from is None:
+            raise SummaryParamsError("from must be a date in YYYY-MM-DD format")
+    if query_params.get('to'):
+        date_to = parse_date(query_params['to'])
+        if date_to is None:
+            raise SummaryParamsError("to must be a date in YYYY-MM-DD format")
+    if date_from and date_to and date_from > date_to:
+        raise SummaryParamsError("from must not be after to")
+    return date_from, date_to
+
+
+def date_filters(lookup, date_from=None, date_to=None):
+    """
+    filter() arguments restricting `lookup`, e.g. 'date' or 'date_time__date', to the range.
+    """
+    filters = {}
+    if date_from:
+        filters[f'{lookup}__gte'] = date_from
+    if date_to:
+        filters[f'{lookup}__lte'] = date_to
+    return filters
+
+
+def parse_summary_params(query_params):
+    """
+    Read granularity, from/to and group_by from the query string.
+    Raises SummaryParamsError with a client facing message on bad input.
+    """
+    granularity = query_params.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise SummaryParamsError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    date_from, date_to = parse_date_range(query_params)
+
+    group_by = query_params.get('group_by')
+    if group_by not in (None, '', 'pincode'):
+        raise SummaryParamsError("group_by only supports pincode")
+
+    return {
+        'granularity': granularity,
+        'date_from': date_from,
+        'date_to': date_to,
+        'group_by_pincode': group_by == 'pincode',
+    }
+
+
+def summary_queryset(queryset, metrics, granularity='day', date_from=None, date_to=None, group_by_pincode=False):
+    """
+    Group DailyWasteRollup rows into time buckets and compute Sum/Count/Avg in the database.
+
+    `metrics` maps the output name to the rollup field, e.g. {'weight': 'weight'}.
+    Only one row per bucket (and pincode) is returned.
+    """
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+
+    group_fields = ['period', 'pincode'] if group_by_pincode else ['period']
+    annotations = {'count': Sum('record_count')}
+    for name, field in metrics.items():
+        annotations[f'total_{name}'] = Sum(field)
+        annotations[f'avg_{name}'] = Cast(Sum(field), FloatField()) / Sum('record_count')
+
+    return (
+        queryset
+        .annotate(period=Trunc('date', granularity, output_field=DateField()))
+        .values(*group_fields)
+        .annotate(**annotations)
+        .order_by(*group_fields)
+    )
+
+
+def summarize(queryset, metrics, **params):
+    """
+    The summary buckets as dicts, with float figures rounded to SUMMARY_DECIMALS places.
+    """
+    return [
+        {key: round(value, SUMMARY_DECIMALS) if isinstance(value, float) else value for key, value in row.items()}
+        for row in summary_queryset(queryset, metrics, **params)
+    ]
+
+
+class Metric:
+    """
+    One analytics metric: how to compute it on the daily rollup (None if the
+    rollup cannot answer it, e.g. min/max of single records) and on the raw rows,
+    and how to combine the raw values of the live and the archive tables.
+    """
+
+    def __init__(self, rollup, raw, empty=0, combine=sum):
+        self.rollup = rollup
+        self.raw = raw
+        self.empty = empty
+        self.combine = combine
+
+
+def weighted_price_per_unit(price, weight):
+    return Cast(Sum(price), FloatField()) / NullIf(Sum(weight), Value(0.0))
+
+
+def parse_metrics(query_params, catalogue, default):
+    """
+    Read the comma separated `metrics=` parameter, defaulting to `default`.
+    """
+    if not query_params.get('metrics'):
+        return list(default)
+    names = [name.strip() for name in query_params['metrics'].split(',') if name.strip()]
+    unknown = [name for name in names if name not in catalogue]
+    if unknown:
+        raise SummaryParamsError(f"Unknown metrics: {', '.join(unknown)}. Available: {', '.join(catalogue)}")
+    return names
+
+
+def compute_metrics(names, catalogue, rollup_queryset, raw_queryset, archive_queryset=None):
+    """
+    Compute every requested metric with a single aggregate() query.
+    Uses the rollup when it can answer all of them, the raw rows otherwise.
+    With `archive_queryset` (archived raw rows in range), metrics the rollup cannot
+    answer are aggregated on both raw querysets and combined.
+    """
+    results = [source.aggregate(**aggregates) for source, aggregates in _metrics_queries(
+        names, catalogue, rollup_queryset, raw_queryset, archive_queryset
+    )]
+    return _metric_values(names, catalogue, results)
+
+
+async def acompute_metrics(names, catalogue, rollup_queryset, raw_queryset, archive_queryset=None):
+    """
+    Async counterpart of compute_metrics() for the ASGI views.
+    """
+    results = [await source.aaggregate(**aggregates) for source, aggregates in _metrics_queries(
+        names, catalogue, rollup_queryset, raw_queryset, archive_queryset
+    )]
+    return _metric_values(names, catalogue, results)
+
+
+def _alias(name):
+    # Aggregates named after a column, e.g. total_price=Sum('total_price'), are refused by the ORM
+    return f'metric_{name}'
+
+
+def _metrics_queries(names, catalogue, rollup_queryset, raw_queryset, archive_queryset):
+    """
+    [(queryset, aggregates)] to run: one query without archive, else the rollup for
+    what it can answer and the live and archived rows for the rest.
+    """
+    if archive_queryset is None:
+        use_rollup = all(catalogue[name].rollup is not None for name in names)
+        source = rollup_queryset if use_rollup else raw_queryset
+        return [(source, {_alias(name): catalogue[name].rollup if use_rollup else catalogue[name].raw for name in names})]
+
+    queries = []
+    rollup_names = [name for name in names if catalogue[name].rollup is not None]
+    raw_names = [name for name in names if catalogue[name].rollup is None]
+    if rollup_names:
+        queries.append((rollup_queryset, {_alias(name): catalogue[name].rollup for name in rollup_names}))
+    if raw_names:
+        queries.extend(
+            (source, {_alias(name): catalogue[name].raw for name in raw_names}) for source in (raw_queryset, archive_queryset)
+        )
+    return queries
+
+
+def _metric_values(names, catalogue, results):
+    values = {}
+    for name in names:
+        found = [result[_alias(name)] for result in results if result.get(_alias(name)) is not None]
+        values[name] = catalogue[name].combine(found) if found else catalogue[name].empty
+    return values
+
+
+EWASTE_METRICS = {
+    'total_units': Metric(Sum('units'), Sum('no_of_units')),
+    'count': Metric(Sum('record_count'), Count('id')),
+    'min_units': Metric(None, Min('no_of_units'), empty=None, combine=min),
+    'max_units': Metric(None, Max('no_of_units'), empty=None, combine=max),
+}
+
+PAPER_WASTE_METRICS = {
+    'total_weight': Metric(Sum('weight'), Sum('weight')),
+    'count': Metric(Sum('record_count'), Count('id')),
+    'min_weight': Metric(None, Min('weight'), empty=None, combine=min),
+    'max_weight': Metric(None, Max('weight'), empty=None, combine=max),
+}
+
+SELLED_PAPER_WASTE_METRICS = {
+    'total_weight': Metric(Sum('weight'), Sum('total_weight')),
+    'total_price': Metric(Sum('price'), Sum('total_price')),
+    'count': Metric(Sum('record_count'), Count('id')),
+    'min_weight': Metric(None, Min('total_weight'), empty=None, combine=min),
+    'max_weight': Metric(None, Max('total_weight'), empty=None, combine=max),
+    'min_price_per_unit': Metric(None, Min('selling_price_per_unit'), empty=None, combine=min),
+    'max_price_per_unit': Metric(None, Max('selling_price_per_unit'), empty=None, combine=max),
+    'avg_price_per_unit': Metric(
+        weighted_price_per_unit('price', 'weight'),
+        weighted_price_per_unit('total_price', 'total_weight'),
+        empty=None,
+    ),
+}
+
+
+# Dashboard figure -> (rollup kind, rollup field)
+DASHBOARD_METRICS = {
+    'ewaste_units': (DailyWasteRollup.EWASTE, 'units'),
+    'ewaste_records': (DailyWasteRollup.EWASTE, 'record_count'),
+    'paper_generated': (DailyWasteRollup.PAPER, 'weight'),
+    'paper_sold': (DailyWasteRollup.SOLD_PAPER, 'weight'),
+    'revenue': (DailyWasteRollup.SOLD_PAPER, 'price'),
+}
+
+
+def dashboard(pincodes, date_from=None, date_to=None):
+    """
+    Cross-waste figures per post office and for the whole scope, from one
+    grouped query over the rollup (one conditional Sum per figure).
+    Offices without activity are listed with zeros.
+    """
+    queryset = DailyWasteRollup.objects.filter(pincode__in=pincodes)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    rows = queryset.values('pincode').annotate(**{
+        name: Sum(field, filter=Q(kind=kind)) for name, (kind, field) in DASHBOARD_METRICS.items()
+    })
+
+    empty = dict.fromkeys(DASHBOARD_METRICS, 0)
+    offices = {str(pincode): {'pincode': str(pincode), **empty} for pincode in pincodes}
+    for row in rows:
+        office = offices[row.pop('pincode')]
+        office.update({name: value or 0 for name, value in row.items()})
+
+    totals = dict(empty)
+    for office in offices.values():
+        office['unsold_backlog'] = office['paper_generated'] - office['paper_sold']
+        for name in DASHBOARD_METRICS:
+            totals[name] += office[name]
+    totals['unsold_backlog'] = totals['paper_generated'] - totals['paper_sold']
+    return {'offices': sorted(offices.values(), key=lambda office: office['pincode']), 'totals': totals}
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WasteManagementConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "waste_management"
+
+    def ready(self):
+        # Register the SQLite connection tuning hook
+        from backend import database  # noqa: F401
@@ -0,0 +1,175 @@
+"""
+Archival of old Ewaste, PaperWaste and SelledPaperWaste rows.
+
+Rows dated before the start of a financial year are moved, whole years at a
+time, to the archive tables (EwasteArchive, ...), keeping their ids, and the
+totals of each archived year are kept in ArchivedYear. The daily rollup is not
+touched, so the summary, dashboard and rollup based metrics read the same
+figures as before.
+
+The first day after the latest archived year is the archive boundary: the
+archive only holds rows dated before it. Analytics and exports always read the
+live tables (rows of an archived year may still be added later) and also read
+the archive only when the requested range starts before the boundary.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from waste_management.models import ArchivedYear
+from waste_management.rollups import ARCHIVE_MODELS, KIND_FOR_MODEL, ROLLUP_SOURCES, _day
+
+DEFAULTS = {
+    'KEEP_YEARS': 2,  # financial years kept in the live tables, the current one included
+    'YEAR_START_MONTH': 4,  # the financial year starts on April 1
+    'BATCH_SIZE': 5000,
+    # How long a process may use the boundary it read. The archiving command runs in
+    # its own process and cannot clear the cache of the servers unless it is shared
+    'BOUNDARY_CACHE_SECONDS': 60,
+}
+
+BOUNDARY_CACHE_KEY = 'waste-archive-boundary'
+
+
+def option(name):
+    return getattr(settings, 'WASTE_ARCHIVE', {}).get(name, DEFAULTS[name])
+
+
+def financial_year(day):
+    """
+    The financial year of a date, named after the calendar year it starts in.
+    """
+    return day.year if day.month >= option('YEAR_START_MONTH') else day.year - 1
+
+
+def year_start(year):
+    return date(year, option('YEAR_START_MONTH'), 1)
+
+
+def default_before_year(today=None):
+    """
+    The first financial year kept live with the KEEP_YEARS setting.
+    """
+    return financial_year(today or timezone.localdate()) - option('KEEP_YEARS') + 1
+
+
+def _cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def _boundary_after(latest_year):
+    return None if latest_year is None else year_start(latest_year + 1)
+
+
+def _from_cache(cached):
+    return date.fromisoformat(cached) if cached else None
+
+
+def _to_cache(boundary):
+    # '' caches "nothing archived", which a cache miss (None) cannot
+    return boundary.isoformat() if boundary else ''
+
+
+def archive_boundary():
+    """
+    The date the archive holds no rows from, or None when nothing was archived.
+    Cached for BOUNDARY_CACHE_SECONDS, since every analytics request asks.
+    """
+    cached = _cache().get(BOUNDARY_CACHE_KEY)
+    if cached is not None:
+        return _from_cache(cached)
+    boundary = _boundary_after(ArchivedYear.objects.aggregate(year=Max('year'))['year'])
+    _cache().set(BOUNDARY_CACHE_KEY, _to_cache(boundary), option('BOUNDARY_CACHE_SECONDS'))
+    return boundary
+
+
+async def aarchive_boundary():
+    cached = await _cache().aget(BOUNDARY_CACHE_KEY)
+    if cached is not None:
+        return _from_cache(cached)
+    boundary = _boundary_after((await ArchivedYear.objects.aaggregate(year=Max('year')))['year'])
+    await _cache().aset(BOUNDARY_CACHE_KEY, _to_cache(boundary), option('BOUNDARY_CACHE_SECONDS'))
+    return boundary
+
+
+def _refresh_boundary():
+    _cache().delete(BOUNDARY_CACHE_KEY)
+
+
+def _archive_in_range(model, boundary, date_from):
+    if boundary is None or (date_from is not None and date_from >= boundary):
+        return None
+    return ARCHIVE_MODELS[model].objects.all()
+
+
+def archived_rows(model, date_from=None):
+    """
+    The archive queryset of `model` when a range starting at `date_from` (None: all
+    history) reaches into the archive, else None.
+    """
+    return _archive_in_range(model, archive_boundary(), date_from)
+
+
+async def aarchived_rows(model, date_from=None):
+    return _archive_in_range(model, await aarchive_boundary(), date_from)
+
+
+def _before(model, date_field, day):
+    if model._meta.get_field(date_field).get_internal_type() == 'DateTimeField':
+        # Midnight in the current time zone, the day boundary the rollup uses
+        return {f'{date_field}__lt': timezone.make_aware(datetime.combine(day, time.min))}
+    return {f'{date_field}__lt': day}
+
+
+def _add_year_totals(kind, years):
+    for year, totals in years.items():
+        values = {field: int(value) if field in ('record_count', 'units') else value for field, value in totals.items()}
+        if not ArchivedYear.objects.filter(kind=kind, year=year).update(**{field: F(field) + value for field, value in values.items()}):
+            ArchivedYear.objects.create(kind=kind, year=year, **values)
+
+
+def archive_model_rows(model, before_year, batch_size=None):
+    """
+    Move the rows of `model` dated before financial year `before_year` to its archive
+    table, one transaction per batch. Returns {financial year: rows moved}.
+    """
+    archive_model = ARCHIVE_MODELS[model]
+    kind = KIND_FOR_MODEL[model]
+    _, date_field, fields = ROLLUP_SOURCES[kind]
+    names = [field.attname for field in archive_model._meta.concrete_fields if field.name != 'year']
+    queryset = model.objects.filter(**_before(model, date_field, year_start(before_year))).order_by('id')
+
+    moved = defaultdict(int)
+    while True:
+        with transaction.atomic():
+            rows = list(queryset[:batch_size or option('BATCH_SIZE')])
+            if not rows:
+                break
+            years = defaultdict(lambda: defaultdict(float))
+            archived = []
+            for row in rows:
+                year = financial_year(_day(getattr(row, date_field)))
+                archived.append(archive_model(year=year, **{name: getattr(row, name) for name in names}))
+                totals = years[year]
+                totals['record_count'] += 1
+                for rollup_field, source_field in fields.items():
+                    totals[rollup_field] += getattr(row, source_field)
+                moved[year] += 1
+            archive_model.objects.bulk_create(archived)
+            model.objects.filter(id__in=[row.id for row in rows]).delete()
+            _add_year_totals(kind, years)
+            transaction.on_commit(_refresh_boundary)
+    return dict(moved)
+
+
+def archive_before(before_year, batch_size=None):
+    """
+    Archive every waste kind before financial year `before_year`.
+    Returns {model name: {financial year: rows moved}}.
+    """
+    return {model.__name__: archive_model_rows(model, before_year, batch_size) for model in ARCHIVE_MODELS}
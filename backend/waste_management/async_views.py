@@ -0,0 +1,56 @@
+import asyncio
+
+from django.http import JsonResponse
+
+from backend.database import read_replica
+from users.api.async_views import AsyncAPIView
+from users.api.pagination import KeysetPagination, requested_fields
+from waste_management.analytics import SummaryParamsError, acompute_metrics, date_filters, parse_date_range, parse_metrics
+from waste_management.archive import aarchived_rows
+from waste_management.response_cache import json_response, cache_response
+from waste_management.rollups import rollup_queryset
+
+
+class AsyncWasteAnalyticsView(AsyncAPIView):
+    """
+    ASGI version of the `<waste>/analytics` action of `viewset_class`: the data page
+    and the metric aggregate are awaited together with the async ORM. It returns the
+    same body and shares the cached responses of the DRF action with the same basename.
+    """
+    viewset_class = None
+    basename = None
+
+    @property
+    def keyset_ordering(self):
+        return self.viewset_class.keyset_ordering
+
+    @read_replica
+    @cache_response('analytics')
+    async def get(self, request, *args, **kwargs):
+        scope = request._office_scope
+        viewset = self.viewset_class
+
+        try:
+            metrics = parse_metrics(request.query_params, viewset.analytics_metrics, viewset.default_metrics)
+            date_from, date_to = parse_date_range(request.query_params)
+        except SummaryParamsError as e:
+            return JsonResponse({'message': str(e)}, status=400)
+
+        in_range = date_filters(viewset.date_lookup, date_from, date_to)
+        queryset = viewset.queryset.filter(pincode__in=scope.pincodes, **in_range)
+        archive = await aarchived_rows(queryset.model, date_from)
+        paginator = KeysetPagination()
+        if archive is None:
+            page_rows = paginator.apaginate_queryset(queryset, request, view=self)
+        else:
+            archive = archive.filter(pincode__in=scope.pincodes, **in_range)
+            page_rows = paginator.apaginate_querysets([archive, queryset], request, view=self)
+        rollups = rollup_queryset(viewset.rollup_kind, scope.pincodes).filter(**date_filters('date', date_from, date_to))
+        page, totals = await asyncio.gather(
+            page_rows,
+            acompute_metrics(metrics, viewset.analytics_metrics, rollups, queryset, archive),
+        )
+        data = viewset.serializer_class(page, many=True, fields=requested_fields(request)).data
+
+        message = 'Divisional office analytics' if scope.is_divisional else 'Sub-divisional office analytics'
+        return json_response({'data': data, 'next_cursor': paginator.next_cursor, **totals, 'message': message})
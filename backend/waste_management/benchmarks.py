@@ -0,0 +1,138 @@
+"""
+In-process load drivers used by the benchmark commands. Requests go straight to
+Django's WSGI and ASGI handlers, so the numbers measure the application (middleware,
+auth, views, ORM) and not an HTTP server or the network.
+"""
+import asyncio
+import io
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+
+HOST = 'localhost'
+
+
+def latency_stats(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return round(latencies[max(math.ceil(p / 100 * len(latencies)) - 1, 0)] * 1000, 3)
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': percentile(100),
+    }
+
+
+def run_wsgi(url, headers, requests, concurrency, method='GET', body=None):
+    """
+    Send `requests` requests to `url` through the WSGI handler from `concurrency` threads.
+    `body` is bytes, or a callable taking the request number and returning bytes,
+    so write benchmarks can vary the payload.
+    """
+    handler = WSGIHandler()
+    parts = urlsplit(url)
+    extra = {}
+    for name, value in headers.items():
+        key = name.upper().replace('-', '_')
+        # Content-Type is a plain CGI variable, not an HTTP_ one
+        extra[key if key == 'CONTENT_TYPE' else 'HTTP_' + key] = value
+
+    def one(number):
+        payload = body(number) if callable(body) else (body or b'')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': parts.path,
+            'QUERY_STRING': parts.query,
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': HOST,
+            'CONTENT_LENGTH': str(len(payload)),
+            'wsgi.input': io.BytesIO(payload),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.url_scheme': 'http',
+            **extra,
+        }
+        status = []
+        start = time.perf_counter()
+        result = handler(environ, lambda s, h, exc_info=None: status.append(int(s.split()[0])))
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return time.perf_counter() - start, status[0]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    return latency_stats([r[0] for r in results], elapsed, sum(1 for r in results if r[1] >= 400))
+
+
+def run_asgi(url, headers, requests, concurrency):
+    """
+    Send `requests` GETs to `url` through the ASGI handler, `concurrency` at a time on one event loop.
+    """
+    handler = ASGIHandler()
+    parts = urlsplit(url)
+    raw_headers = [(b'host', HOST.encode())] + [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+
+    async def one(semaphore):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': parts.path,
+            'raw_path': parts.path.encode(),
+            'query_string': parts.query.encode(),
+            'root_path': '',
+            'headers': raw_headers,
+            'client': ('127.0.0.1', 0),
+            'server': (HOST, 80),
+        }
+        body_sent = False
+        status = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Django listens for a disconnect until the response is sent, then cancels this
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(scope, receive, send)
+            return time.perf_counter() - start, status[0]
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(one(semaphore) for _ in range(requests)))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    return latency_stats([r[0] for r in results], elapsed, sum(1 for r in results if r[1] >= 400))
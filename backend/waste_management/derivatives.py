@@ -0,0 +1,177 @@
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.utils import timezone
+
+try:
+    from PIL import Image
+except ImportError:  # Listed in requirements.txt; without it images get no derivatives
+    Image = None
+
+from waste_management.models import DerivativeJob, Event, EventReport
+
+logger = logging.getLogger(__name__)
+
+# job.model -> (model, file field); derivatives live in <field>_thumbnail / <field>_compressed
+SOURCES = {
+    'event': (Event, 'attachment'),
+    'event_report': (EventReport, 'attached_report'),
+}
+MODEL_KEYS = {model: key for key, (model, _) in SOURCES.items()}
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+# Formats that are already compressed; gzip would only waste CPU on them
+PACKED_EXTENSIONS = IMAGE_EXTENSIONS | {'.gz', '.zip', '.7z', '.rar', '.mp3', '.mp4', '.mov', '.avi', '.docx', '.xlsx', '.pptx'}
+
+
+def _option(name, default):
+    return getattr(settings, 'DERIVATIVES', {}).get(name, default)
+
+
+def enqueue(instance):
+    """
+    Queue derivative generation for `instance`. Called inside the request's
+    transaction, so the job only becomes visible if the upload is committed.
+    """
+    return DerivativeJob.objects.create(model=MODEL_KEYS[type(instance)], object_id=instance.pk)
+
+
+def claim(batch_size):
+    """
+    Atomically mark up to `batch_size` pending jobs as running for this worker.
+    Concurrent workers never get the same job: the UPDATE only matches rows still pending.
+    """
+    worker = uuid.uuid4().hex
+    ids = list(
+        DerivativeJob.objects.filter(status=DerivativeJob.PENDING).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    DerivativeJob.objects.filter(id__in=ids, status=DerivativeJob.PENDING).update(
+        status=DerivativeJob.RUNNING, worker=worker, attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    return list(DerivativeJob.objects.filter(worker=worker, status=DerivativeJob.RUNNING).order_by('id'))
+
+
+def requeue_stale(timeout):
+    """
+    Put jobs back in the queue whose worker died while running them.
+    """
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return DerivativeJob.objects.filter(status=DerivativeJob.RUNNING, updated_at__lt=cutoff).update(
+        status=DerivativeJob.PENDING, worker='', updated_at=timezone.now()
+    )
+
+
+def _image_derivatives(source):
+    """
+    Return (thumbnail, compressed) JPEG bytes for an image file.
+    """
+    quality = _option('JPEG_QUALITY', 70)
+    with source.open('rb') as handle, Image.open(handle) as image:
+        image = image.convert('RGB')
+        outputs = []
+        for size in (_option('THUMBNAIL_SIZE', (320, 320)), _option('COMPRESSED_MAX_SIZE', (1600, 1600))):
+            copy = image.copy()
+            copy.thumbnail(size)
+            buffer = BytesIO()
+            copy.save(buffer, 'JPEG', quality=quality, optimize=True)
+            outputs.append(buffer.getvalue())
+    return outputs
+
+
+def _gzip_derivative(source):
+    """
+    Gzip a file into a temporary file without loading it into memory.
+    """
+    compressed = tempfile.TemporaryFile()
+    with source.open('rb') as handle, gzip.GzipFile(fileobj=compressed, mode='wb') as target:
+        shutil.copyfileobj(handle, target, 64 * 1024)
+    compressed.seek(0)
+    return compressed
+
+
+def delete_derivatives(instance, field_name):
+    for suffix in ('thumbnail', 'compressed'):
+        derivative = getattr(instance, f'{field_name}_{suffix}')
+        if derivative:
+            derivative.delete(save=False)
+
+
+def build_derivatives(instance, field_name):
+    """
+    Write the thumbnail (images only) and the compressed copy of `instance.<field_name>`
+    and record their paths and sizes. A derivative that is not smaller than the
+    original is not kept.
+    """
+    source = getattr(instance, field_name)
+    delete_derivatives(instance, field_name)
+    updates = {
+        f'{field_name}_thumbnail': '',
+        f'{field_name}_thumbnail_size': None,
+        f'{field_name}_compressed': '',
+        f'{field_name}_compressed_size': None,
+    }
+    if source:
+        stem, extension = os.path.splitext(os.path.basename(source.name))
+        extension = extension.lower()
+        thumbnail = compressed = None
+        if extension in IMAGE_EXTENSIONS and Image is None:
+            logger.warning('Pillow is not installed; no thumbnail or compressed copy for %s', source.name)
+        elif extension in IMAGE_EXTENSIONS:
+            thumbnail_bytes, compressed_bytes = _image_derivatives(source)
+            thumbnail = (f'{stem}.jpg', ContentFile(thumbnail_bytes))
+            compressed = (f'{stem}.jpg', ContentFile(compressed_bytes))
+        elif extension not in PACKED_EXTENSIONS:
+            compressed = (f'{stem}{extension}.gz', File(_gzip_derivative(source)))
+
+        for suffix, derivative in (('thumbnail', thumbnail), ('compressed', compressed)):
+            if derivative is None:
+                continue
+            name, content = derivative
+            if suffix == 'compressed' and content.size >= source.size:
+                content.close()
+                continue
+            field_file = getattr(instance, f'{field_name}_{suffix}')
+            field_file.save(name, content, save=False)
+            content.close()
+            updates[f'{field_name}_{suffix}'] = field_file.name
+            updates[f'{field_name}_{suffix}_size'] = field_file.size
+
+    # update() rather than save() so the upload handlers are not triggered again
+    type(instance).objects.filter(pk=instance.pk).update(**updates)
+
+
+def process(job):
+    model, field_name = SOURCES[job.model]
+    instance = model.objects.filter(pk=job.object_id).first()
+    if instance is not None:
+        build_derivatives(instance, field_name)
+
+
+def run_pending(batch_size=10):
+    """
+    Claim and process one batch of jobs. Returns the number of jobs claimed.
+    """
+    jobs = claim(batch_size)
+    max_attempts = _option('MAX_ATTEMPTS', 3)
+    for job in jobs:
+        try:
+            process(job)
+        except Exception as error:
+            job.status = DerivativeJob.PENDING if job.attempts < max_attempts else DerivativeJob.FAILED
+            job.error = f'{type(error).__name__}: {error}'
+        else:
+            job.status = DerivativeJob.DONE
+            job.error = ''
+        job.worker = ''
+        job.save(update_fields=['status', 'error', 'worker', 'updated_at'])
+    return len(jobs)
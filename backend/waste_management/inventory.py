@@ -0,0 +1,154 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from waste_management.models import PaperInventory, PaperWaste, PaperWasteArchive, SelledPaperWaste, SelledPaperWasteArchive
+
+# Float sums drift by tiny amounts; anything within this is treated as equal
+STOCK_TOLERANCE = 1e-6
+
+# model -> (ledger field, source field, effect on the balance)
+INVENTORY_SOURCES = {
+    PaperWaste: ('generated_weight', 'weight', 1),
+    SelledPaperWaste: ('sold_weight', 'total_weight', -1),
+}
+
+
+class InsufficientStock(Exception):
+    def __init__(self, pincode, available, requested):
+        super().__init__(f'Only {available:g} kg of paper in stock at {pincode}, {requested:g} kg needed')
+        self.pincode = pincode
+        self.available = available
+        self.requested = requested
+
+
+def _apply(instances, sign):
+    _apply_changes((instance, sign) for instance in instances)
+
+
+def _apply_changes(changes):
+    # changes: (instance, +1 to add it or -1 to take it out)
+    deltas = defaultdict(lambda: defaultdict(float))
+    for instance, sign in changes:
+        field, source_field, effect = INVENTORY_SOURCES[type(instance)]
+        amount = sign * getattr(instance, source_field)
+        deltas[instance.pincode_id][field] += amount
+        deltas[instance.pincode_id]['balance'] += effect * amount
+
+    now = timezone.now()
+    for pincode, delta in sorted(deltas.items()):
+        updates = {field: F(field) + value for field, value in delta.items()}
+        queryset = PaperInventory.objects.filter(pincode_id=pincode)
+        if delta['balance'] < 0:
+            # Check and write in one statement, so two concurrent sales cannot both take the last stock
+            needed = -delta['balance']
+            if queryset.filter(balance__gte=needed - STOCK_TOLERANCE).update(**updates, updated_at=now):
+                continue
+            raise InsufficientStock(pincode, queryset.values_list('balance', flat=True).first() or 0, needed)
+        if queryset.update(**updates, updated_at=now):
+            continue
+        try:
+            # Savepoint so a concurrent insert of the same row does not break the outer transaction
+            with transaction.atomic():
+                PaperInventory.objects.create(pincode_id=pincode, **delta)
+        except IntegrityError:
+            queryset.update(**updates, updated_at=now)
+
+
+def add_to_inventory(*instances):
+    """
+    Add saved PaperWaste (stock in) and SelledPaperWaste (stock out) rows to the ledger.
+    Call inside the transaction that saved them: InsufficientStock rolls the whole write back.
+    """
+    _apply(instances, 1)
+
+
+def remove_from_inventory(*instances):
+    """
+    Undo rows that are about to be deleted. Deleting generated paper that was
+    already sold raises InsufficientStock.
+    """
+    _apply(instances, -1)
+
+
+def replace_in_inventory(previous, current):
+    """
+    Move the ledger from the old values of an edited row (a copy taken before the
+    save) to its new ones in one step, so the edit is only refused when the result
+    would oversell.
+    """
+    _apply_changes([(previous, -1), (current, 1)])
+
+
+def stock_shortfalls(sales):
+    """
+    Return {position: available stock} for the sales that would exceed the stock
+    when applied in order, reading the balances of all their pincodes at once.
+    """
+    balances = dict(
+        PaperInventory.objects.filter(pincode_id__in={sale.pincode_id for sale in sales}).values_list('pincode_id', 'balance')
+    )
+    shortfalls = {}
+    for position, sale in enumerate(sales):
+        available = balances.get(sale.pincode_id, 0)
+        if sale.total_weight > available + STOCK_TOLERANCE:
+            shortfalls[position] = available
+        else:
+            balances[sale.pincode_id] = available - sale.total_weight
+    return shortfalls
+
+
+def expected_inventory(paper_models=(PaperWaste, PaperWasteArchive), sold_models=(SelledPaperWaste, SelledPaperWasteArchive)):
+    """
+    {pincode: (generated weight, sold weight)} summed from the raw tables and their archives.
+    """
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for position, models, field in ((0, paper_models, 'weight'), (1, sold_models, 'total_weight')):
+        for model in models:
+            for pincode, weight in model.objects.values_list('pincode').annotate(total=Sum(field)).order_by():
+                totals[pincode][position] += weight or 0
+    return {pincode: tuple(values) for pincode, values in totals.items()}
+
+
+def rebuild_inventory(paper_models=(PaperWaste, PaperWasteArchive), sold_models=(SelledPaperWaste, SelledPaperWasteArchive),
+                      inventory_model=PaperInventory):
+    """
+    Recreate every ledger row from the raw tables. Returns the number of rows written.
+    """
+    inventory_model.objects.all().delete()
+    return len(inventory_model.objects.bulk_create(
+        inventory_model(pincode_id=pincode, generated_weight=generated, sold_weight=sold, balance=generated - sold)
+        for pincode, (generated, sold) in expected_inventory(paper_models, sold_models).items()
+    ))
+
+
+@transaction.atomic
+def reconcile_inventory(fix=False):
+    """
+    Compare the ledger with the raw tables and return the drifted pincodes.
+    With `fix`, the drifted rows are overwritten with the recomputed values.
+    """
+    expected = expected_inventory()
+    ledger = {row.pincode_id: row for row in PaperInventory.objects.select_for_update()}
+    drift = []
+    for pincode in sorted(set(expected) | set(ledger)):
+        generated, sold = expected.get(pincode, (0.0, 0.0))
+        row = ledger.get(pincode)
+        current = (row.generated_weight, row.sold_weight, row.balance) if row else (0.0, 0.0, 0.0)
+        if all(abs(a - b) <= STOCK_TOLERANCE for a, b in zip(current, (generated, sold, generated - sold))):
+            continue
+        drift.append({
+            'pincode': pincode,
+            'ledger_balance': current[2],
+            'expected_balance': generated - sold,
+            'expected_generated': generated,
+            'expected_sold': sold,
+        })
+        if fix:
+            PaperInventory.objects.update_or_create(
+                pincode_id=pincode,
+                defaults={'generated_weight': generated, 'sold_weight': sold, 'balance': generated - sold},
+            )
+    return drift
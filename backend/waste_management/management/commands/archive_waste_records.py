@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from waste_management.archive import archive_before, archive_boundary, default_before_year, financial_year, year_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Move Ewaste, PaperWaste and SelledPaperWaste rows of old financial years to the archive tables and keep "
+        "their yearly totals. Analytics read the archive only for date ranges that reach into it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before-year",
+            type=int,
+            help="Archive the financial years before this one (e.g. 2023 for April 2023). "
+            "Default: keep WASTE_ARCHIVE['KEEP_YEARS'] years live.",
+        )
+        parser.add_argument("--batch-size", type=int, help="Rows moved per transaction. Default: WASTE_ARCHIVE['BATCH_SIZE'].")
+
+    def handle(self, *args, **options):
+        before_year = options["before_year"] or default_before_year()
+        if before_year > financial_year(timezone.localdate()):
+            raise CommandError("--before-year must not be after the current financial year")
+        if options["batch_size"] is not None and options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        moved = archive_before(before_year, options["batch_size"])
+        boundary = archive_boundary()
+        self.stdout.write(json.dumps({
+            "before": year_start(before_year).isoformat(),
+            "moved": moved,
+            "archive_boundary": boundary.isoformat() if boundary else None,
+        }, indent=2))
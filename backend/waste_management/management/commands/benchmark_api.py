@@ -0,0 +1,121 @@
+import json
+import platform
+import subprocess
+from datetime import date, datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from users.scope import resolve_scope
+from waste_management.benchmarks import run_wsgi
+from waste_management.management.commands.benchmark_asgi import NO_CACHE
+from waste_management.models import DailyWasteRollup, Ewaste, PaperWaste, SelledPaperWaste
+from waste_management.synthetic import division_username, sub_division_username
+
+WM = "/api/v1/waste-management/"
+
+# name -> (user role, method, path); the runs mutating data come last so they do not skew the reads
+SCENARIOS = {
+    "login": (None, "POST", "/api/v1/user-auth/login/"),
+    "postoffice": ("divisional", "GET", "/api/v1/post/postoffice/"),
+    "ewaste_analytics": ("divisional", "GET", WM + "ewaste/analytics/"),
+    "paperwaste_analytics": ("divisional", "GET", WM + "paperwaste/analytics/"),
+    "selledpaperwaste_analytics": ("divisional", "GET", WM + "selledpaperwaste/analytics/"),
+    "paperwaste_summary": ("divisional", "GET", WM + "paperwaste/analytics/summary/?granularity=month"),
+    "cleaning_staff": ("divisional", "GET", WM + "cleaning-staff/"),
+    "cleaning_staff_search": ("divisional", "GET", WM + "cleaning-staff/?search=ra"),
+    "ewaste_add_data": ("sub_divisional", "POST", WM + "ewaste/add-data/"),
+    "paperwaste_add_data": ("sub_divisional", "POST", WM + "paperwaste/add-data/"),
+}
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the login, postoffice, analytics, cleaning staff and add-data endpoints in process through the WSGI handler and print "
+        "throughput and latency percentiles per scenario as JSON. Meant for data from generate_synthetic_data; "
+        "the add-data scenarios insert rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Default: all of them.")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--warmup", type=int, default=10, help="Requests sent before measuring each scenario.")
+        parser.add_argument("--division-user", default=division_username(1))
+        parser.add_argument("--sub-division-user", default=sub_division_username(1, 1))
+        parser.add_argument("--password", default="synthetic", help="Password of the login scenario's user.")
+        parser.add_argument(
+            "--with-cache", action="store_true", help="Keep the response cache on (by default every request is computed)."
+        )
+        parser.add_argument("--output", help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        users = {"divisional": self.user(options["division_user"]), "sub_divisional": self.user(options["sub_division_user"])}
+        tokens = {role: Token.objects.get_or_create(user=user)[0].key for role, user in users.items()}
+        # add-data rotates over the offices the sub-divisional officer may write to
+        pincodes = sorted(resolve_scope(users["sub_divisional"]).pincodes)
+        today = date.today().isoformat()
+        login = json.dumps({"username": users["sub_divisional"].username, "password": options["password"]}).encode()
+
+        bodies = {
+            "login": login,
+            "ewaste_add_data": lambda i: json.dumps(
+                {"pincode": pincodes[i % len(pincodes)], "no_of_units": 1, "name": "Monitor", "date_time": f"{today}T12:00:00Z"}
+            ).encode(),
+            "paperwaste_add_data": lambda i: json.dumps(
+                {"pincode": pincodes[i % len(pincodes)], "weight": 1.5, "date": today}
+            ).encode(),
+        }
+
+        results = {}
+        with override_settings(**({} if options["with_cache"] else {"CACHES": NO_CACHE})):
+            for name in options["scenario"] or list(SCENARIOS):
+                role, method, path = SCENARIOS[name]
+                headers = {"Content-Type": "application/json"}
+                if role:
+                    headers["Authorization"] = f"Token {tokens[role]}"
+                run = dict(url=path, headers=headers, concurrency=options["concurrency"], method=method, body=bodies.get(name))
+                if options["warmup"]:
+                    run_wsgi(requests=options["warmup"], **run)
+                results[name] = run_wsgi(requests=options["requests"], **run)
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "dataset": {
+                model.__name__: model.objects.count() for model in (Ewaste, PaperWaste, SelledPaperWaste, DailyWasteRollup)
+            },
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "response_cache": options["with_cache"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as target:
+                target.write(output + "\n")
+        self.stdout.write(output)
+
+    def user(self, username):
+        try:
+            return get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown user {username!r}; run generate_synthetic_data first or pass the username")
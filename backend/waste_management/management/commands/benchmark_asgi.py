@@ -0,0 +1,73 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from waste_management.benchmarks import run_asgi, run_wsgi
+
+# name -> (sync DRF route, async route)
+ENDPOINTS = {
+    "ewaste": ("/api/v1/waste-management/ewaste/analytics/", "/api/v1/waste-management/async/ewaste/analytics/"),
+    "paperwaste": (
+        "/api/v1/waste-management/paperwaste/analytics/",
+        "/api/v1/waste-management/async/paperwaste/analytics/",
+    ),
+    "selledpaperwaste": (
+        "/api/v1/waste-management/selledpaperwaste/analytics/",
+        "/api/v1/waste-management/async/selledpaperwaste/analytics/",
+    ),
+    "postoffice": ("/api/v1/post/postoffice/", "/api/v1/post/async/postoffice/"),
+}
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the analytics endpoints in process and print requests/sec and latency percentiles as JSON for "
+        "the sync views under WSGI, the sync views under ASGI and the async views under ASGI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Username of a divisional or sub-divisional officer.")
+        parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS), help="Default: all of them.")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--query", default="", help="Query string appended to every request, e.g. page_size=100.")
+        parser.add_argument(
+            "--with-cache", action="store_true", help="Keep the response cache on (by default every request is computed)."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}")
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {"Authorization": f"Token {token.key}"}
+        suffix = f"?{options['query']}" if options["query"] else ""
+
+        runs = [
+            ("wsgi", run_wsgi, 0),
+            ("asgi_sync_view", run_asgi, 0),
+            ("asgi_async_view", run_asgi, 1),
+        ]
+        results = {}
+        with override_settings(**({} if options["with_cache"] else {"CACHES": NO_CACHE})):
+            for name in options["endpoint"] or sorted(ENDPOINTS):
+                results[name] = {}
+                for mode, runner, route in runs:
+                    url = ENDPOINTS[name][route] + suffix
+                    runner(url, headers, min(options["concurrency"], options["requests"]), options["concurrency"])  # warm up
+                    results[name][mode] = runner(url, headers, options["requests"], options["concurrency"])
+
+        report = {
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "query": options["query"],
+            "response_cache": options["with_cache"],
+            "results": results,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
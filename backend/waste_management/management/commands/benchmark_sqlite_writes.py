@@ -0,0 +1,89 @@
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from backend.database import pragma_values
+from users.scope import resolve_scope
+from waste_management.benchmarks import run_wsgi
+from waste_management.management.commands.benchmark_asgi import NO_CACHE
+from waste_management.synthetic import sub_division_username
+
+ADD_DATA = "/api/v1/waste-management/paperwaste/add-data/"
+
+# mode -> (SQLITE_TUNING["ENABLED"], CONN_MAX_AGE, OPTIONS)
+MODES = {
+    "default": (False, 0, {}),
+    "production": (True, 600, {"transaction_mode": "IMMEDIATE"}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure paperwaste add-data throughput with many simultaneous callers, with SQLite's defaults and with the "
+        "production mode (WAL, synchronous=NORMAL, busy timeout, mmap, persistent connections). Each mode runs on its "
+        "own copy of the database, so the real database is not written to. Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", default=sub_division_username(1, 1), help="Username of a sub-divisional officer.")
+        parser.add_argument("--requests", type=int, default=400, help="Requests per mode and concurrency level.")
+        parser.add_argument(
+            "--concurrency", type=int, action="append", help="Simultaneous callers; repeatable. Default: 1, 8 and 32."
+        )
+
+    def handle(self, *args, **options):
+        database = connections["default"].settings_dict
+        if connections["default"].vendor != "sqlite" or database["NAME"] == ":memory:":
+            raise CommandError("The default database must be an SQLite file")
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}")
+        headers = {
+            "Authorization": f"Token {Token.objects.get_or_create(user=user)[0].key}",
+            "Content-Type": "application/json",
+        }
+        pincodes = sorted(resolve_scope(user).pincodes)
+        today = date.today().isoformat()
+
+        def body(number):
+            return json.dumps({"pincode": pincodes[number % len(pincodes)], "weight": 1.5, "date": today}).encode()
+
+        original = {key: database.get(key) for key in ("NAME", "CONN_MAX_AGE", "OPTIONS")}
+        connections.close_all()
+        results = {}
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for mode, (tuned, max_age, db_options) in MODES.items():
+                    copy = os.path.join(directory, f"{mode}.sqlite3")
+                    self.copy_database(original["NAME"], copy)
+                    database.update(NAME=copy, CONN_MAX_AGE=max_age, OPTIONS=db_options)
+                    results[mode] = {}
+                    with override_settings(SQLITE_TUNING={"ENABLED": tuned}, CACHES=NO_CACHE):
+                        results[mode]["pragmas"] = pragma_values(connections["default"])
+                        connections.close_all()
+                        for concurrency in options["concurrency"] or [1, 8, 32]:
+                            results[mode][f"concurrency_{concurrency}"] = run_wsgi(
+                                ADD_DATA, headers, options["requests"], concurrency, method="POST", body=body
+                            )
+                        connections.close_all()
+        finally:
+            database.update(original)
+            connections.close_all()
+
+        self.stdout.write(json.dumps({"endpoint": ADD_DATA, "requests": options["requests"], "results": results}, indent=2))
+
+    def copy_database(self, source, target):
+        # The backup API copies a consistent snapshot, WAL contents included; the copy
+        # starts in rollback journal mode until the production pragmas switch it
+        with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+            src.backup(dst)
+            dst.execute("PRAGMA journal_mode = DELETE")
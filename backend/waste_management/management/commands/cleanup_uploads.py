@@ -0,0 +1,24 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from waste_management.uploads import cleanup_abandoned
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the resumable upload sessions, finished or not, that are older than UPLOAD_ABANDON_HOURS together with "
+        "their .part files, and .part files left without a session. Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=float, default=settings.UPLOAD_ABANDON_HOURS, help="Age after which an upload is abandoned."
+        )
+
+    def handle(self, *args, **options):
+        if options["hours"] < 0:
+            raise CommandError("--hours must not be negative")
+        sessions, files = cleanup_abandoned(options["hours"])
+        self.stdout.write(json.dumps({"sessions": sessions, "orphaned_files": files}, indent=2))
@@ -0,0 +1,61 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from post_office.models import PostOffice
+from waste_management.synthetic import MAX_DIVISIONS, MAX_OFFICES, MAX_SUB_DIVISIONS, delete_synthetic_data, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic postal hierarchy with officers, cleaning staff and years of Ewaste, PaperWaste and "
+        "SelledPaperWaste records for load testing. Officers are synthetic-division-<d> and synthetic-sub-division-<d>-<s>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--divisions", type=int, default=2)
+        parser.add_argument("--sub-divisions", type=int, default=3, help="Per division.")
+        parser.add_argument("--offices", type=int, default=10, help="Branch offices per sub-division.")
+        parser.add_argument("--years", type=float, default=3)
+        parser.add_argument(
+            "--records-per-day", type=float, default=1.0, help="Average Ewaste and PaperWaste rows per office per day."
+        )
+        parser.add_argument("--staff-per-office", type=int, default=20, help="Cleaning staff per branch office.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="9", help="First digit of every synthetic pincode.")
+        parser.add_argument("--end", type=date.fromisoformat, help="Last day of data (YYYY-MM-DD). Default: today.")
+        parser.add_argument("--password", default="synthetic", help="Password of the synthetic officers.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--replace", action="store_true", help="Delete the data of an earlier run first.")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if len(prefix) != 1 or not prefix.isdigit():
+            raise CommandError("--prefix must be a single digit")
+        for name, limit in (("divisions", MAX_DIVISIONS), ("sub_divisions", MAX_SUB_DIVISIONS), ("offices", MAX_OFFICES)):
+            if not 1 <= options[name] <= limit:
+                raise CommandError(f"--{name.replace('_', '-')} must be between 1 and {limit}")
+        if options["staff_per_office"] < 0:
+            raise CommandError("--staff-per-office must not be negative")
+
+        with transaction.atomic():
+            if options["replace"]:
+                delete_synthetic_data(prefix)
+            elif PostOffice.objects.filter(pincode__startswith=prefix).exists():
+                raise CommandError(f"Post offices with pincodes starting with {prefix} exist; use --replace or another --prefix")
+            summary = generate(
+                prefix=prefix,
+                divisions=options["divisions"],
+                sub_divisions=options["sub_divisions"],
+                offices=options["offices"],
+                years=options["years"],
+                records_per_day=options["records_per_day"],
+                staff_per_office=options["staff_per_office"],
+                seed=options["seed"],
+                password=options["password"],
+                batch_size=options["batch_size"],
+                end=options["end"],
+            )
+        self.stdout.write(json.dumps(summary, indent=2))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from waste_management.derivatives import requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Build thumbnails and compressed copies of Event and EventReport files from the "
+        "derivative job queue. Several workers can run at the same time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit instead of polling.")
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument(
+            "--stale-after", type=int, default=600, help="Requeue running jobs not updated for this many seconds."
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            requeue_stale(options["stale_after"])
+            claimed = run_pending(options["batch_size"])
+            processed += claimed
+            if claimed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} derivative jobs."))
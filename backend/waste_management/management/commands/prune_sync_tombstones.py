@@ -0,0 +1,16 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from waste_management.sync import option, prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the offline sync tombstones older than SYNC['TOMBSTONE_DAYS']. Change tokens that old are already "
+        "rejected, so their clients sync from scratch. Prints JSON."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(json.dumps({"deleted": deleted, "kept_days": option("TOMBSTONE_DAYS")}, indent=2))
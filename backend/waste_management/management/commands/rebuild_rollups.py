@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from waste_management.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily waste rollup table from the Ewaste, PaperWaste and SelledPaperWaste tables."
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily rollups: {written} rows written."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from waste_management.inventory import reconcile_inventory
+
+
+class Command(BaseCommand):
+    help = "Recompute the paper inventory ledger from the PaperWaste and SelledPaperWaste tables and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Overwrite drifted ledger rows with the recomputed values.")
+
+    def handle(self, *args, **options):
+        drift = reconcile_inventory(fix=options["fix"])
+        for row in drift:
+            self.stdout.write(
+                f"{row['pincode']}: ledger {row['ledger_balance']:g}, expected {row['expected_balance']:g} "
+                f"(generated {row['expected_generated']:g}, sold {row['expected_sold']:g})"
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Paper inventory ledger matches the raw tables."))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} drifted ledger rows."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} ledger rows drifted; run with --fix to repair them."))
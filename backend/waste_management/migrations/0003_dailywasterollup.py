@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    from waste_management.models import DailyWasteRollup
+    from waste_management.rollups import rebuild_rollups
+
+    # The archive tables do not exist yet at this point
+    rebuild_rollups(
+        {
+            DailyWasteRollup.EWASTE: (apps.get_model("waste_management", "Ewaste"),),
+            DailyWasteRollup.PAPER: (apps.get_model("waste_management", "PaperWaste"),),
+            DailyWasteRollup.SOLD_PAPER: (
+                apps.get_model("waste_management", "SelledPaperWaste"),
+            ),
+        },
+        apps.get_model("waste_management", "DailyWasteRollup"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0001_initial"),
+        ("waste_management", "0002_selledpaperwaste_date_alter_paperwaste_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyWasteRollup",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("date", models.DateField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("ewaste", "E-waste"),
+                            ("paper", "Paper waste"),
+                            ("sold_paper", "Sold paper waste"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("record_count", models.PositiveIntegerField(default=0)),
+                ("units", models.BigIntegerField(default=0)),
+                ("weight", models.FloatField(default=0)),
+                ("price", models.FloatField(default=0)),
+                (
+                    "pincode",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="post_office.postoffice",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("pincode", "date", "kind"), name="unique_rollup_per_day"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0003_postoffice_division_idx"),
+        ("waste_management", "0003_dailywasterollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ewaste",
+            index=models.Index(
+                fields=["pincode", "date_time", "id"], name="ewaste_pincode_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paperwaste",
+            index=models.Index(
+                fields=["pincode", "date", "id"], name="paperwaste_pincode_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="selledpaperwaste",
+            index=models.Index(
+                fields=["pincode", "date", "id"], name="selledpaper_pincode_date_idx"
+            ),
+        ),
+    ]
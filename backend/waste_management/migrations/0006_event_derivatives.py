@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("waste_management", "0005_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="attachment_compressed",
+            field=models.FileField(blank=True, upload_to="compressed/"),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="attachment_compressed_size",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="attachment_thumbnail",
+            field=models.FileField(blank=True, upload_to="thumbnails/"),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="attachment_thumbnail_size",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="eventreport",
+            name="attached_report_compressed",
+            field=models.FileField(blank=True, upload_to="compressed/"),
+        ),
+        migrations.AddField(
+            model_name="eventreport",
+            name="attached_report_compressed_size",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="eventreport",
+            name="attached_report_thumbnail",
+            field=models.FileField(blank=True, upload_to="thumbnails/"),
+        ),
+        migrations.AddField(
+            model_name="eventreport",
+            name="attached_report_thumbnail_size",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="DerivativeJob",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("model", models.CharField(max_length=32)),
+                ("object_id", models.PositiveIntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("worker", models.CharField(blank=True, max_length=32)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "id"], name="derivativejob_status_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_inventory(apps, schema_editor):
+    from waste_management.inventory import rebuild_inventory
+
+    # The archive tables do not exist yet at this point
+    rebuild_inventory(
+        (apps.get_model("waste_management", "PaperWaste"),),
+        (apps.get_model("waste_management", "SelledPaperWaste"),),
+        apps.get_model("waste_management", "PaperInventory"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0003_postoffice_division_idx"),
+        ("waste_management", "0006_event_derivatives"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaperInventory",
+            fields=[
+                (
+                    "pincode",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="post_office.postoffice",
+                    ),
+                ),
+                ("generated_weight", models.FloatField(default=0)),
+                ("sold_weight", models.FloatField(default=0)),
+                ("balance", models.FloatField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_inventory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# PostgreSQL only. BRIN indexes summarise block ranges of the append-mostly date
+# columns in a few pages, so date range scans over years of rows skip most of the
+# table. The partial rollup index leaves out the emptied days that
+# rollup_queryset() filters away.
+POSTGRES_INDEXES = [
+    (
+        "ewaste_date_time_brin",
+        "CREATE INDEX IF NOT EXISTS ewaste_date_time_brin ON waste_management_ewaste USING brin (date_time)",
+    ),
+    (
+        "paperwaste_date_brin",
+        "CREATE INDEX IF NOT EXISTS paperwaste_date_brin ON waste_management_paperwaste USING brin (date)",
+    ),
+    (
+        "selledpaper_date_brin",
+        "CREATE INDEX IF NOT EXISTS selledpaper_date_brin ON waste_management_selledpaperwaste USING brin (date)",
+    ),
+    (
+        "rollup_live_kind_pincode_date_idx",
+        "CREATE INDEX IF NOT EXISTS rollup_live_kind_pincode_date_idx "
+        "ON waste_management_dailywasterollup (kind, pincode_id, date) WHERE record_count > 0",
+    ),
+]
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for _, sql in POSTGRES_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in POSTGRES_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("waste_management", "0007_paperinventory"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0003_postoffice_division_idx"),
+        ("waste_management", "0008_postgres_date_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedYear",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("ewaste", "E-waste"),
+                            ("paper", "Paper waste"),
+                            ("sold_paper", "Sold paper waste"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("year", models.PositiveSmallIntegerField()),
+                ("record_count", models.PositiveIntegerField(default=0)),
+                ("units", models.BigIntegerField(default=0)),
+                ("weight", models.FloatField(default=0)),
+                ("price", models.FloatField(default=0)),
+                ("archived_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "year"), name="unique_archived_year_per_kind"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="EwasteArchive",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("year", models.PositiveSmallIntegerField()),
+                ("no_of_units", models.PositiveIntegerField()),
+                ("date_time", models.DateTimeField()),
+                ("name", models.CharField(max_length=255)),
+                (
+                    "pincode",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="post_office.postoffice",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["pincode", "date_time", "id"],
+                        name="ewastearchive_pincode_date_idx",
+                    ),
+                    models.Index(fields=["year"], name="ewastearchive_year_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PaperWasteArchive",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("year", models.PositiveSmallIntegerField()),
+                ("weight", models.FloatField()),
+                ("date", models.DateField()),
+                (
+                    "pincode",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="post_office.postoffice",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["pincode", "date", "id"],
+                        name="paperarchive_pincode_date_idx",
+                    ),
+                    models.Index(fields=["year"], name="paperarchive_year_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="SelledPaperWasteArchive",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("year", models.PositiveSmallIntegerField()),
+                ("total_weight", models.FloatField()),
+                ("selling_price_per_unit", models.FloatField()),
+                ("total_price", models.FloatField()),
+                ("date", models.DateField()),
+                (
+                    "pincode",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="post_office.postoffice",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["pincode", "date", "id"],
+                        name="selledarchive_pincode_date_idx",
+                    ),
+                    models.Index(fields=["year"], name="selledarchive_year_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0004_sync_updated_at"),
+        ("waste_management", "0009_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("model", models.CharField(max_length=32)),
+                ("object_id", models.CharField(max_length=32)),
+                ("pincode", models.CharField(max_length=10)),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="cleaningstaff",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="ewaste",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="ewastearchive",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="paperwaste",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="paperwastearchive",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="selledpaperwaste",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="selledpaperwastearchive",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="cleaningstaff",
+            index=models.Index(fields=["updated_at"], name="cleaningstaff_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ewaste",
+            index=models.Index(fields=["updated_at"], name="ewaste_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="paperwaste",
+            index=models.Index(fields=["updated_at"], name="paperwaste_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="selledpaperwaste",
+            index=models.Index(fields=["updated_at"], name="selledpaper_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(
+                fields=["pincode", "deleted_at"], name="tombstone_pincode_deleted_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(fields=["deleted_at"], name="tombstone_deleted_idx"),
+        ),
+    ]
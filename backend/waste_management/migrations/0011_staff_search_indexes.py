@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:49
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post_office", "0004_sync_updated_at"),
+        ("waste_management", "0010_sync_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cleaningstaff",
+            index=models.Index(
+                models.F("pincode"),
+                django.db.models.functions.text.Lower("name"),
+                name="staff_pincode_name_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cleaningstaff",
+            index=models.Index(
+                fields=["pincode", "contactNo"], name="staff_pincode_contact_idx"
+            ),
+        ),
+    ]
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Lower
 from post_office.models import PostOffice
 from datetime import date
+from django.utils import timezone
+import uuid
 # Create your models here.
 
 class CleaningStaff(models.Model):
@@ -8,6 +12,16 @@ class CleaningStaff(models.Model):
     name = models.CharField(max_length=255)
     contactNo = models.CharField(max_length=15)
     pincode = models.ForeignKey(PostOffice, on_delete=models.CASCADE)
+    # Read by the offline sync endpoint (see waste_management.sync)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='cleaningstaff_updated_idx'),
+            # Prefix search of the staff listing, within the offices of a scope
+            models.Index(models.F('pincode'), Lower('name'), name='staff_pincode_name_idx'),
+            models.Index(fields=['pincode', 'contactNo'], name='staff_pincode_contact_idx'),
+        ]
 
 class Event(models.Model):
     id = models.AutoField(primary_key=True)
@@ -15,6 +29,11 @@ class Event(models.Model):
     description = models.TextField()
     attachment = models.FileField(upload_to='attachments/')
     date_time = models.DateTimeField()
+    # Derivatives written by the background worker (see waste_management.derivatives)
+    attachment_thumbnail = models.FileField(upload_to='thumbnails/', blank=True)
+    attachment_thumbnail_size = models.PositiveIntegerField(null=True, blank=True)
+    attachment_compressed = models.FileField(upload_to='compressed/', blank=True)
+    attachment_compressed_size = models.PositiveBigIntegerField(null=True, blank=True)
 
 class EventReport(models.Model):
     id = models.AutoField(primary_key=True)
@@ -25,6 +44,11 @@ class EventReport(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
     attached_report = models.FileField(upload_to='reports/')
     date_time = models.DateTimeField()
+    # Derivatives written by the background worker (see waste_management.derivatives)
+    attached_report_thumbnail = models.FileField(upload_to='thumbnails/', blank=True)
+    attached_report_thumbnail_size = models.PositiveIntegerField(null=True, blank=True)
+    attached_report_compressed = models.FileField(upload_to='compressed/', blank=True)
+    attached_report_compressed_size = models.PositiveBigIntegerField(null=True, blank=True)
 
 class Ewaste(models.Model):
     id = models.AutoField(primary_key=True)
@@ -32,12 +56,26 @@ class Ewaste(models.Model):
     date_time = models.DateTimeField()
     name = models.CharField(max_length=255)
     pincode = models.ForeignKey(PostOffice, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pincode', 'date_time', 'id'], name='ewaste_pincode_date_idx'),
+            models.Index(fields=['updated_at'], name='ewaste_updated_idx'),
+        ]
 
 class PaperWaste(models.Model):
     id = models.AutoField(primary_key=True)
     weight = models.FloatField()
     date = models.DateField(default=date.today)
     pincode = models.ForeignKey(PostOffice, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pincode', 'date', 'id'], name='paperwaste_pincode_date_idx'),
+            models.Index(fields=['updated_at'], name='paperwaste_updated_idx'),
+        ]
 
 class SelledPaperWaste(models.Model):
     id = models.AutoField(primary_key=True)
@@ -46,3 +84,195 @@ class SelledPaperWaste(models.Model):
     total_price = models.FloatField()
     date = models.DateField(default=date.today)
     pincode = models.ForeignKey(PostOffice, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pincode', 'date', 'id'], name='selledpaper_pincode_date_idx'),
+            models.Index(fields=['updated_at'], name='selledpaper_updated_idx'),
+        ]
+
+class EwasteArchive(models.Model):
+    """
+    Ewaste rows moved out of the live table by waste_management.archive, keeping
+    their id. `year` is the financial year (e.g. 2022 for April 2022 - March 2023).
+    """
+    id = models.IntegerField(primary_key=True)
+    year = models.PositiveSmallIntegerField()
+    no_of_units = models.PositiveIntegerField()
+    date_time = models.DateTimeField()
+    name = models.CharField(max_length=255)
+    pincode = models.ForeignKey(PostOffice, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pincode', 'date_time', 'id'], name='ewastearchive_pincode_date_idx'),
+            models.Index(fields=['year'], name='ewastearchive_year_idx'),
+        ]
+
+class PaperWasteArchive(models.Model):
+    """
+    Archived PaperWaste rows, see EwasteArchive.
+    """
+    id = models.IntegerField(primary_key=True)
+    year = models.PositiveSmallIntegerField()
+    weight = models.FloatField()
+    date = models.DateField()
+    pincode = models.ForeignKey(PostOffice, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pincode', 'date', 'id'], name='paperarchive_pincode_date_idx'),
+            models.Index(fields=['year'], name='paperarchive_year_idx'),
+        ]
+
+class SelledPaperWasteArchive(models.Model):
+    """
+    Archived SelledPaperWaste rows, see EwasteArchive.
+    """
+    id = models.IntegerField(primary_key=True)
+    year = models.PositiveSmallIntegerField()
+    total_weight = models.FloatField()
+    selling_price_per_unit = models.FloatField()
+    total_price = models.FloatField()
+    date = models.DateField()
+    pincode = models.ForeignKey(PostOffice, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pincode', 'date', 'id'], name='selledarchive_pincode_date_idx'),
+            models.Index(fields=['year'], name='selledarchive_year_idx'),
+        ]
+
+class DailyWasteRollup(models.Model):
+    """
+    Per post office, per day totals for each waste kind.
+    Kept up to date by the add/delete actions so analytics never scan the raw tables.
+    """
+    EWASTE = 'ewaste'
+    PAPER = 'paper'
+    SOLD_PAPER = 'sold_paper'
+    KIND_CHOICES = [
+        (EWASTE, 'E-waste'),
+        (PAPER, 'Paper waste'),
+        (SOLD_PAPER, 'Sold paper waste'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    pincode = models.ForeignKey(PostOffice, on_delete=models.CASCADE)
+    date = models.DateField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    record_count = models.PositiveIntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    weight = models.FloatField(default=0)
+    price = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pincode', 'date', 'kind'], name='unique_rollup_per_day'),
+        ]
+
+
+class ArchivedYear(models.Model):
+    """
+    Totals of one waste kind over one archived financial year, written when its
+    rows are moved to the archive tables. The latest archived year marks where
+    the live tables start.
+    """
+    id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=DailyWasteRollup.KIND_CHOICES)
+    year = models.PositiveSmallIntegerField()
+    record_count = models.PositiveIntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    weight = models.FloatField(default=0)
+    price = models.FloatField(default=0)
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'year'], name='unique_archived_year_per_kind'),
+        ]
+
+
+class PaperInventory(models.Model):
+    """
+    Running paper stock of a post office: generated minus sold weight.
+    Kept up to date by the add/delete actions (see waste_management.inventory),
+    so the current stock is a single row lookup.
+    """
+    pincode = models.OneToOneField(PostOffice, on_delete=models.CASCADE, primary_key=True)
+    generated_weight = models.FloatField(default=0)
+    sold_weight = models.FloatField(default=0)
+    balance = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Tombstone(models.Model):
+    """
+    A record deleted through the API, kept so offline clients can drop it on their
+    next sync. `pincode` is the office the record was visible through: its own
+    pincode, or the parent office for a deleted PostOffice.
+    """
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=32)
+    object_id = models.CharField(max_length=32)
+    pincode = models.CharField(max_length=10)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pincode', 'deleted_at'], name='tombstone_pincode_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+
+class UploadSession(models.Model):
+    """
+    A resumable, chunked upload. Chunks are appended to a temporary file until
+    `received` reaches `size`, then the SHA-256 is checked before the file can
+    be attached to an Event or EventReport.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64)
+    completed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class DerivativeJob(models.Model):
+    """
+    Queue entry asking the derivative worker to build the thumbnail and the
+    compressed copy of an Event attachment or EventReport file. Workers claim
+    pending jobs with a conditional UPDATE, so no broker is needed.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=32)
+    object_id = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=32, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='derivativejob_status_idx'),
+        ]
@@ -0,0 +1,63 @@
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class InvalidLine:
+    """
+    Stands in for a line of an NDJSON body that is not valid JSON, so the view can
+    report it as that row's error and still keep the other rows.
+    """
+
+    def __init__(self, line_no, error):
+        self.line_no = line_no
+        self.error = error
+
+    def __str__(self):
+        return f'NDJSON parse error on line {self.line_no} - {self.error}'
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline delimited JSON into a list of objects, one line at a time.
+    Lines that are not valid JSON become InvalidLine entries.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        reader = codecs.getreader(encoding)(stream)
+        rows = []
+        try:
+            for line_no, line in enumerate(reader, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as exc:
+                    rows.append(InvalidLine(line_no, exc))
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'NDJSON parse error - {exc}')
+        return rows
+
+
+class CSVParser(BaseParser):
+    """
+    Parses CSV with a header line into a list of objects keyed by the header.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        reader = codecs.getreader(encoding)(stream)
+        try:
+            return list(csv.DictReader(reader))
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ParseError(f'CSV parse error - {exc}')
@@ -0,0 +1,182 @@
+import hashlib
+import inspect
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.database import replica_may_lag
+from post_office.models import PostOfficeClosure
+from users.scope import aget_scope, get_scope
+
+GLOBAL_VERSION_KEY = 'analytics-version:*'
+
+
+def _cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 600)
+
+
+def _version_key(office_pincode):
+    return f'analytics-version:{office_pincode}'
+
+
+def get_versions(office_pincode):
+    """
+    Return (global version, office version). Versions are the time of the last
+    write, so the newer of the two doubles as Last-Modified.
+    """
+    cache = _cache()
+    values = cache.get_many([GLOBAL_VERSION_KEY, _version_key(office_pincode)])
+    now = time.time()
+    global_version = values.get(GLOBAL_VERSION_KEY)
+    if global_version is None:
+        global_version = now
+        cache.add(GLOBAL_VERSION_KEY, global_version, None)
+    office_version = values.get(_version_key(office_pincode), 0)
+    return global_version, office_version
+
+
+def _bump(keys):
+    now = time.time()
+    _cache().set_many({key: now for key in keys}, None)
+
+
+def invalidate_pincodes(pincodes):
+    """
+    Invalidate the cached responses of every office whose scope contains one of
+    `pincodes`, i.e. the pincodes themselves and all their ancestors.
+    The bump happens once the current transaction commits.
+    """
+    pincodes = {str(pincode) for pincode in pincodes}
+    if not pincodes:
+        return
+    offices = set(pincodes)
+    offices.update(PostOfficeClosure.objects.filter(descendant_id__in=pincodes).values_list('ancestor_id', flat=True))
+    keys = [_version_key(pincode) for pincode in offices]
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_all():
+    transaction.on_commit(lambda: _bump([GLOBAL_VERSION_KEY]))
+
+
+def _etag(body):
+    return quote_etag(hashlib.md5(body.encode()).hexdigest())
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def _cache_key(view, request, name, scope, global_version, office_version):
+    params = hashlib.md5(json.dumps(sorted(request.GET.lists())).encode()).hexdigest()
+    endpoint = f"{getattr(view, 'basename', None) or ''}:{name}"
+    return f'analytics:{endpoint}:{scope.role}:{scope.office_pincode}:{global_version}:{office_version}:{params}'
+
+
+def _to_cached(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return (_etag(body), json.loads(body))
+
+
+def _conditional(request, response_class, cached, global_version, office_version):
+    etag, data = cached
+    last_modified = max(global_version, office_version)
+    if _not_modified(request, etag, last_modified):
+        response = response_class(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = response_class(data)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def json_response(data=None, status=200):
+    """
+    JsonResponse with the key order used for the cached bodies and ETags.
+    """
+    if status == 304:
+        return HttpResponseNotModified()
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, json_dumps_params={'sort_keys': True})
+
+
+async def aget_versions(office_pincode):
+    cache = _cache()
+    values = await cache.aget_many([GLOBAL_VERSION_KEY, _version_key(office_pincode)])
+    global_version = values.get(GLOBAL_VERSION_KEY)
+    if global_version is None:
+        global_version = time.time()
+        await cache.aadd(GLOBAL_VERSION_KEY, global_version, None)
+    return global_version, values.get(_version_key(office_pincode), 0)
+
+
+def cache_response(name):
+    """
+    Cache the 200 responses of a read-only view per (endpoint, office scope, query params)
+    and answer conditional requests with 304 Not Modified.
+
+    Responses read from a replica shortly after a write are served but not stored,
+    so a lagging replica cannot pin stale figures under the new version.
+
+    Works on DRF view methods and on the async views (which return JsonResponse);
+    both share the cached entries when they use the same basename and name.
+    """
+    def decorator(view_method):
+        if inspect.iscoroutinefunction(view_method):
+            @wraps(view_method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                scope = await aget_scope(request)
+                if scope is None:
+                    return await view_method(self, request, *args, **kwargs)
+
+                versions = await aget_versions(scope.office_pincode)
+                key = _cache_key(self, request, name, scope, *versions)
+                cache = _cache()
+                cached = await cache.aget(key)
+                if cached is None:
+                    response = await view_method(self, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK or not isinstance(response, JsonResponse):
+                        return response
+                    cached = _to_cached(json.loads(response.content))
+                    if not replica_may_lag(max(versions)):
+                        await cache.aset(key, cached, _timeout())
+                return _conditional(request, json_response, cached, *versions)
+            return async_wrapper
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            scope = get_scope(request)
+            if scope is None:
+                return view_method(self, request, *args, **kwargs)
+
+            versions = get_versions(scope.office_pincode)
+            key = _cache_key(self, request, name, scope, *versions)
+            cache = _cache()
+            cached = cache.get(key)
+            if cached is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK or not isinstance(response, Response):
+                    return response
+                cached = _to_cached(response.data)
+                if not replica_may_lag(max(versions)):
+                    cache.set(key, cached, _timeout())
+            return _conditional(request, Response, cached, *versions)
+        return wrapper
+    return decorator
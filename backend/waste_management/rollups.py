@@ -0,0 +1,131 @@
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from waste_management.models import DailyWasteRollup, Ewaste, EwasteArchive, PaperWaste, PaperWasteArchive
+from waste_management.models import SelledPaperWaste, SelledPaperWasteArchive
+from waste_management.response_cache import invalidate_all, invalidate_pincodes
+
+# kind -> (source model, date field, {rollup field: source field})
+ROLLUP_SOURCES = {
+    DailyWasteRollup.EWASTE: (Ewaste, 'date_time', {'units': 'no_of_units'}),
+    DailyWasteRollup.PAPER: (PaperWaste, 'date', {'weight': 'weight'}),
+    DailyWasteRollup.SOLD_PAPER: (SelledPaperWaste, 'date', {'weight': 'total_weight', 'price': 'total_price'}),
+}
+
+KIND_FOR_MODEL = {model: kind for kind, (model, _, _) in ROLLUP_SOURCES.items()}
+
+# Live fact table -> the table its old rows are archived to (see waste_management.archive)
+ARCHIVE_MODELS = {
+    Ewaste: EwasteArchive,
+    PaperWaste: PaperWasteArchive,
+    SelledPaperWaste: SelledPaperWasteArchive,
+}
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def _apply(instances, sign):
+    deltas = defaultdict(lambda: defaultdict(float))
+    for instance in instances:
+        kind = KIND_FOR_MODEL[type(instance)]
+        _, date_field, fields = ROLLUP_SOURCES[kind]
+        key = (kind, instance.pincode_id, _day(getattr(instance, date_field)))
+        deltas[key]['record_count'] += sign
+        for rollup_field, source_field in fields.items():
+            deltas[key][rollup_field] += sign * getattr(instance, source_field)
+
+    # Every write that changes the rollup also changes the cached analytics of its offices
+    invalidate_pincodes({pincode for _, pincode, _ in deltas})
+
+    for (kind, pincode, day), delta in deltas.items():
+        lookup = {'kind': kind, 'pincode_id': pincode, 'date': day}
+        values = {field: int(value) if field in ('record_count', 'units') else value for field, value in delta.items()}
+        updates = {field: F(field) + value for field, value in values.items()}
+        if DailyWasteRollup.objects.filter(**lookup).update(**updates):
+            continue
+        try:
+            # Savepoint so a concurrent insert of the same row does not break the outer transaction
+            with transaction.atomic():
+                DailyWasteRollup.objects.create(**lookup, **values)
+        except IntegrityError:
+            DailyWasteRollup.objects.filter(**lookup).update(**updates)
+
+
+def add_to_rollup(*instances):
+    """
+    Add saved Ewaste/PaperWaste/SelledPaperWaste rows to the daily rollup.
+    Call inside the same transaction that saved them.
+    """
+    _apply(instances, 1)
+
+
+def remove_from_rollup(*instances):
+    """
+    Subtract rows that are about to be deleted from the daily rollup.
+    """
+    _apply(instances, -1)
+
+
+def rollup_queryset(kind, post_offices):
+    """
+    Rollup rows of one kind for the given post offices, skipping emptied days.
+    """
+    return DailyWasteRollup.objects.filter(kind=kind, pincode__in=post_offices, record_count__gt=0)
+
+
+@transaction.atomic
+def rebuild_rollups(source_models=None, rollup_model=DailyWasteRollup):
+    """
+    Recompute the whole rollup table from the raw fact tables and their archives,
+    or from `source_models` ({kind: models}), e.g. historical models in a migration.
+    Returns the number of rollup rows written.
+    """
+    rollup_model.objects.all().delete()
+    invalidate_all()
+    written = 0
+    for kind, (model, date_field, fields) in ROLLUP_SOURCES.items():
+        # A day can have rows in both tables when old rows were added after archiving
+        days = defaultdict(lambda: defaultdict(float))
+        for source in (ARCHIVE_MODELS[model], model) if source_models is None else source_models[kind]:
+            rows = (
+                source.objects
+                .annotate(day=Trunc(date_field, 'day', output_field=DateField()))
+                .values('pincode', 'day')
+                .annotate(row_count=Count('id'), **{field: Sum(source_field) for field, source_field in fields.items()})
+                .order_by()
+            )
+            for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+                totals = days[row['pincode'], row['day']]
+                totals['record_count'] += row['row_count']
+                for field in fields:
+                    totals[field] += row[field]
+
+        batch = []
+        for (pincode, day), totals in days.items():
+            batch.append(rollup_model(
+                kind=kind,
+                pincode_id=pincode,
+                date=day,
+                record_count=int(totals['record_count']),
+                **{field: int(totals[field]) if field == 'units' else totals[field] for field in fields},
+            ))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                rollup_model.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        rollup_model.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -1,32 +1,111 @@
 from rest_framework import serializers
-from waste_management.models import CleaningStaff, Event,EventReport,Ewaste,PaperWaste,SelledPaperWaste
+from django.conf import settings
+from waste_management.models import CleaningStaff, Event,EventReport,Ewaste,PaperWaste,SelledPaperWaste,UploadSession
+from waste_management.uploads import attach
+from waste_management.derivatives import enqueue
+from users.api.serializers import DynamicFieldsModelSerializer
 
-class CleaningStaffSerializer(serializers.ModelSerializer):
+class CleaningStaffSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = CleaningStaff
         fields = '__all__'
 
-class EventSerializer(serializers.ModelSerializer):
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'received', 'sha256', 'completed', 'created_at']
+        read_only_fields = ['received', 'completed', 'created_at']
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Empty files are not accepted.")
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Files larger than {settings.UPLOAD_MAX_SIZE} bytes are not accepted.")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+            raise serializers.ValidationError("Must be a hex encoded SHA-256 digest.")
+        return value
+
+class UploadedFileSerializerMixin(serializers.Serializer):
+    """
+    Lets the file field be filled from a completed resumable upload (`upload`)
+    instead of a multipart file in the same request, and queues the thumbnail
+    and compressed copy whenever a new file arrives.
+    """
+    upload_file_field = None
+    upload = serializers.PrimaryKeyRelatedField(queryset=UploadSession.objects.filter(completed=True), write_only=True, required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields[self.upload_file_field].required = False
+        return fields
+
+    def validate(self, attrs):
+        upload = attrs.get('upload')
+        if upload and upload.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError({'upload': 'Unknown upload.'})
+        if self.instance is None and not upload and not attrs.get(self.upload_file_field):
+            raise serializers.ValidationError({self.upload_file_field: 'Send the file or the id of a completed upload.'})
+        return attrs
+
+    def save(self, **kwargs):
+        upload = self.validated_data.pop('upload', None)
+        new_file = upload is not None or self.validated_data.get(self.upload_file_field) is not None
+        instance = super().save(**kwargs)
+        if upload:
+            attach(upload, getattr(instance, self.upload_file_field))
+            instance.save(update_fields=[self.upload_file_field])
+        if new_file:
+            enqueue(instance)
+        return instance
+
+class EventSerializer(UploadedFileSerializerMixin, serializers.ModelSerializer):
+    upload_file_field = 'attachment'
+
     class Meta:
         model = Event
         fields = '__all__'
+        read_only_fields = ['attachment_thumbnail', 'attachment_thumbnail_size', 'attachment_compressed', 'attachment_compressed_size']
+
+class EventReportSerializer(UploadedFileSerializerMixin, serializers.ModelSerializer):
+    upload_file_field = 'attached_report'
 
-class EventReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = EventReport
         fields = '__all__'
+        read_only_fields = ['attached_report_thumbnail', 'attached_report_thumbnail_size', 'attached_report_compressed', 'attached_report_compressed_size']
 
-class EwasteSerializer(serializers.ModelSerializer):
+class EwasteSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Ewaste
         fields = '__all__'
 
-class PaperWasteSerializer(serializers.ModelSerializer):
+class PaperWasteSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = PaperWaste
         fields = '__all__'
 
-class SelledPaperWasteSerializer(serializers.ModelSerializer):
+class SelledPaperWasteSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = SelledPaperWaste
         fields = '__all__'
+
+
+class BulkRowSerializerMixin(serializers.Serializer):
+    """
+    Takes the pincode as plain text so bulk rows are not looked up one by one;
+    the view checks all pincodes against the user's scope at once.
+    """
+    pincode = serializers.CharField(max_length=10)
+
+class EwasteBulkSerializer(BulkRowSerializerMixin, EwasteSerializer):
+    pass
+
+class PaperWasteBulkSerializer(BulkRowSerializerMixin, PaperWasteSerializer):
+    pass
+
+class SelledPaperWasteBulkSerializer(BulkRowSerializerMixin, SelledPaperWasteSerializer):
+    pass
@@ -0,0 +1,177 @@
+"""
+Offline sync for field clients: the records of the user's scope created,
+updated or deleted since a change token.
+
+A token stands for a point in time. A sync returns, per model, the rows whose
+updated_at falls in [token, until) and the tombstones deleted in that window,
+then hands out `until` as the next token. `until` stays SETTLE_SECONDS behind
+the clock, so rows saved by transactions still in flight are not skipped. When a
+model has more than `limit` changes, `until` stops at its first row left out and
+`has_more` asks the client to call again.
+
+A PostOffice tombstone also stands for every record of that office, which the
+database deleted with it. Rows moved to the archive tables are not reported.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from backend.database import reading_from_replica
+from post_office.hierarchy import offices_under
+from post_office.models import PostOffice
+from waste_management.models import CleaningStaff, Ewaste, PaperWaste, SelledPaperWaste, Tombstone
+
+DEFAULTS = {
+    'PAGE_SIZE': 500,  # changed rows per model and call
+    'MAX_PAGE_SIZE': 5000,
+    'SETTLE_SECONDS': 2,  # longer than any write transaction
+    'TOMBSTONE_DAYS': 90,  # older tokens must sync from scratch
+}
+
+# name -> (model, fields sent to the client)
+SYNC_MODELS = {
+    'ewaste': (Ewaste, ('id', 'pincode_id', 'no_of_units', 'name', 'date_time', 'updated_at')),
+    'paperwaste': (PaperWaste, ('id', 'pincode_id', 'weight', 'date', 'updated_at')),
+    'selledpaperwaste': (
+        SelledPaperWaste, ('id', 'pincode_id', 'total_weight', 'selling_price_per_unit', 'total_price', 'date', 'updated_at'),
+    ),
+    'cleaningstaff': (CleaningStaff, ('id', 'pincode_id', 'name', 'contactNo', 'updated_at')),
+    'postoffice': (PostOffice, ('pincode', 'name', 'contactNo', 'address', 'division_pincode_id', 'updated_at')),
+}
+
+MODEL_NAMES = {model: name for name, (model, _) in SYNC_MODELS.items()}
+
+TOMBSTONES = 'deleted'
+
+
+class SyncTokenError(ValueError):
+    pass
+
+
+class SyncTokenExpired(SyncTokenError):
+    pass
+
+
+def option(name):
+    return getattr(settings, 'SYNC', {}).get(name, DEFAULTS[name])
+
+
+def encode_token(moment):
+    return base64.urlsafe_b64encode(json.dumps({'t': moment.isoformat()}).encode()).decode()
+
+
+def decode_token(token):
+    """
+    The moment a token stands for. Raises SyncTokenExpired when tombstones
+    from that far back may have been pruned.
+    """
+    try:
+        moment = datetime.fromisoformat(json.loads(base64.urlsafe_b64decode(token.encode()))['t'])
+    except (ValueError, TypeError, KeyError):
+        raise SyncTokenError('Invalid change token.')
+    if timezone.is_naive(moment):
+        raise SyncTokenError('Invalid change token.')
+    if moment < timezone.now() - timedelta(days=option('TOMBSTONE_DAYS')):
+        raise SyncTokenExpired('Change token expired; sync again without a token.')
+    return moment
+
+
+def record_deletion(*instances, pincode=None):
+    """
+    Write the tombstones of records about to be deleted, visible through their own
+    pincode or `pincode`. Call in the deleting transaction.
+    """
+    Tombstone.objects.bulk_create(
+        Tombstone(model=MODEL_NAMES[type(instance)], object_id=str(instance.pk), pincode=str(pincode or instance.pincode_id))
+        for instance in instances
+    )
+
+
+def record_office_deletion(office):
+    """
+    Tombstones for a PostOffice about to be deleted and for the offices below it,
+    which leave the scopes above it as well. The office's parent stays in those scopes.
+    """
+    record_deletion(office, *offices_under(office.pk), pincode=office.division_pincode_id or office.pk)
+
+
+def prune_tombstones():
+    """
+    Delete the tombstones older than TOMBSTONE_DAYS. Returns the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=option('TOMBSTONE_DAYS'))
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
+
+def _horizon():
+    settle = option('SETTLE_SECONDS')
+    if reading_from_replica():
+        settle += getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
+    return timezone.now() - timedelta(seconds=settle)
+
+
+def _streams(scope, condition, limit=None, tombstones=True):
+    """
+    {stream: rows} of every model, and of the tombstones, matching `condition` on
+    their updated_at, in change order, at most `limit` + 1 rows each.
+    """
+    querysets = {
+        name: model.objects.filter(condition, pincode__in=scope.pincodes).order_by('updated_at', model._meta.pk.name).values(*fields)
+        for name, (model, fields) in SYNC_MODELS.items()
+    }
+    if tombstones:
+        querysets[TOMBSTONES] = (
+            Tombstone.objects
+            .annotate(updated_at=F('deleted_at'))
+            .filter(condition, pincode__in=scope.pincodes | {scope.office_pincode})
+            .order_by('deleted_at', 'id')
+            .values('model', 'object_id', 'updated_at')
+        )
+    return {name: list(queryset if limit is None else queryset[:limit + 1]) for name, queryset in querysets.items()}
+
+
+def changes(scope, since=None, limit=None):
+    """
+    The changes visible to `scope` since the moment `since` (None: everything,
+    without tombstones), with one query per model and one for the tombstones.
+    """
+    limit = max(1, min(limit or option('PAGE_SIZE'), option('MAX_PAGE_SIZE')))
+    horizon = _horizon()
+    if since is not None and since >= horizon:
+        return _payload({}, since, has_more=False)
+
+    condition = Q(updated_at__lt=horizon) if since is None else Q(updated_at__gte=since, updated_at__lt=horizon)
+    streams = _streams(scope, condition, limit, tombstones=since is not None)
+    # A stream with more than `limit` rows ends the window, for all streams, at its first row left out
+    until = min([horizon] + [rows[limit]['updated_at'] for rows in streams.values() if len(rows) > limit])
+    if since is not None and until <= since:
+        # More than `limit` changes share the timestamp `since`: send all of them
+        until = since + timedelta(microseconds=1)
+        streams = _streams(scope, Q(updated_at=since))
+    return _payload(streams, until, has_more=until < horizon)
+
+
+def _payload(streams, until, has_more):
+    result = {'changes': {name: [] for name in SYNC_MODELS}, 'deleted': {}}
+    for name, rows in streams.items():
+        for row in rows:
+            if row['updated_at'] >= until:
+                break
+            if name == TOMBSTONES:
+                result['deleted'].setdefault(row['model'], []).append(row['object_id'])
+            else:
+                result['changes'][name].append(_client_row(row))
+    result['next_token'] = encode_token(until)
+    result['has_more'] = has_more
+    return result
+
+
+def _client_row(row):
+    for field in ('pincode', 'division_pincode'):
+        if f'{field}_id' in row:
+            row[field] = row.pop(f'{field}_id')
+    return row
@@ -0,0 +1,167 @@
+"""
+Synthetic data for load testing: a postal hierarchy, one officer per (sub-)division,
+cleaning staff and years of daily Ewaste, PaperWaste and SelledPaperWaste records. The same seed
+always produces the same data, so benchmark runs on different commits are comparable.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+
+from post_office.hierarchy import rebuild_closure
+from post_office.models import PostOffice
+from users.models import DivisionalOffice, SubDivisionalOffice, User
+from waste_management.inventory import rebuild_inventory
+from waste_management.models import CleaningStaff, Ewaste, PaperWaste, SelledPaperWaste
+from waste_management.rollups import rebuild_rollups
+
+USERNAME_PREFIX = 'synthetic-'
+EWASTE_ITEMS = ('Monitor', 'CPU', 'Printer', 'Keyboard', 'UPS', 'Scanner', 'Cables')
+STAFF_NAMES = ('Anil', 'Asha', 'Deepak', 'Geeta', 'Kiran', 'Meena', 'Ramesh', 'Rani', 'Suresh', 'Sunita')
+
+# Pincodes are <prefix><division><sub-division><office:03d>, with 0 for the levels above
+MAX_DIVISIONS = 9
+MAX_SUB_DIVISIONS = 9
+MAX_OFFICES = 999
+
+
+def division_username(d):
+    return f'{USERNAME_PREFIX}division-{d}'
+
+
+def sub_division_username(d, s):
+    return f'{USERNAME_PREFIX}sub-division-{d}-{s}'
+
+
+def delete_synthetic_data(prefix):
+    """
+    Remove the offices (and, by cascade, their records) and the officers of an earlier run.
+    """
+    PostOffice.objects.filter(pincode__startswith=prefix).delete()
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+
+def create_hierarchy(prefix, divisions, sub_divisions, offices, password):
+    """
+    Create the offices, the closure table and the officers. Returns the branch office pincodes.
+    """
+    post_offices, branches, officers = [], [], []
+    for d in range(1, divisions + 1):
+        division = PostOffice(pincode=f'{prefix}{d}0000', name=f'Synthetic Division {d}', contactNo='0000000000', address='-')
+        post_offices.append(division)
+        officers.append((division_username(d), DivisionalOffice, {'pincode': int(division.pincode)}))
+        for s in range(1, sub_divisions + 1):
+            sub_division = PostOffice(
+                pincode=f'{prefix}{d}{s}000', name=f'Synthetic Sub-division {d}.{s}', contactNo='0000000000', address='-',
+                division_pincode=division,
+            )
+            post_offices.append(sub_division)
+            officers.append((sub_division_username(d, s), SubDivisionalOffice, {
+                'pincode': int(sub_division.pincode), 'division_pincode': int(division.pincode),
+            }))
+            for o in range(1, offices + 1):
+                branch = PostOffice(
+                    pincode=f'{prefix}{d}{s}{o:03d}', name=f'Synthetic Office {d}.{s}.{o}', contactNo='0000000000', address='-',
+                    division_pincode=sub_division,
+                )
+                post_offices.append(branch)
+                branches.append(branch.pincode)
+
+    PostOffice.objects.bulk_create(post_offices)
+    rebuild_closure()
+
+    # Hash once for everyone; bulk_create skips post_save, so tokens are made on first login
+    password = make_password(password)
+    User.objects.bulk_create(
+        User(username=username, password=password, is_divisional=model is DivisionalOffice, is_sub_divisional=model is SubDivisionalOffice)
+        for username, model, _ in officers
+    )
+    users = User.objects.in_bulk([username for username, _, _ in officers], field_name='username')
+    for model in (DivisionalOffice, SubDivisionalOffice):
+        model.objects.bulk_create(
+            model(user=users[username], full_name=username, phone_number='0000000000', email='synthetic@example.com', address='-', **fields)
+            for username, office_model, fields in officers if office_model is model
+        )
+    return branches
+
+
+def generate_records(pincodes, start, days, records_per_day, rng):
+    """
+    Yield unsaved Ewaste, PaperWaste and SelledPaperWaste rows, office by office and day by day.
+    Each office only sells paper it has in stock, so the inventory ledger never goes negative.
+    """
+    for pincode in pincodes:
+        stock = 0.0
+        for day in range(days):
+            moment = start + timedelta(days=day, seconds=rng.randrange(8 * 3600, 18 * 3600))
+            for _ in range(_daily_count(records_per_day, rng)):
+                yield Ewaste(pincode_id=pincode, no_of_units=rng.randint(1, 20), date_time=moment, name=rng.choice(EWASTE_ITEMS))
+            for _ in range(_daily_count(records_per_day, rng)):
+                weight = round(rng.uniform(0.5, 25.0), 2)
+                stock += weight
+                yield PaperWaste(pincode_id=pincode, weight=weight, date=moment.date())
+            if stock >= 50 and rng.random() < records_per_day / 7:
+                # A weekly-ish sale of most of the stock
+                weight = round(stock * rng.uniform(0.5, 0.9), 2)
+                price = round(rng.uniform(8.0, 15.0), 2)
+                stock -= weight
+                yield SelledPaperWaste(
+                    pincode_id=pincode, total_weight=weight, selling_price_per_unit=price, total_price=round(weight * price, 2), date=moment.date(),
+                )
+
+
+def generate_staff(pincodes, per_office, rng):
+    """
+    Yield unsaved CleaningStaff rows, `per_office` for each office.
+    """
+    for pincode in pincodes:
+        for _ in range(per_office):
+            yield CleaningStaff(
+                pincode_id=pincode, name=f'{rng.choice(STAFF_NAMES)} {rng.randrange(1000)}', contactNo=f'9{rng.randrange(10 ** 9):09d}',
+            )
+
+
+def _daily_count(mean, rng):
+    # Whole part always, fractional part as a probability, e.g. 1.5 -> 1 or 2
+    return int(mean) + (rng.random() < mean - int(mean))
+
+
+def insert_records(rows, batch_size):
+    """
+    bulk_create rows of mixed models in batches. Returns {model name: rows inserted}.
+    """
+    counts = {model.__name__: 0 for model in (Ewaste, PaperWaste, SelledPaperWaste)}
+    batches = {model: [] for model in (Ewaste, PaperWaste, SelledPaperWaste)}
+    for row in rows:
+        batch = batches[type(row)]
+        batch.append(row)
+        if len(batch) >= batch_size:
+            type(row).objects.bulk_create(batch)
+            counts[type(row).__name__] += len(batch)
+            batch.clear()
+    for model, batch in batches.items():
+        model.objects.bulk_create(batch)
+        counts[model.__name__] += len(batch)
+    return counts
+
+
+def generate(prefix='9', divisions=2, sub_divisions=3, offices=10, years=3, records_per_day=1.0, seed=0,
+             password='synthetic', batch_size=5000, end=None, staff_per_office=20):
+    """
+    Create a complete synthetic dataset ending on `end` (default today) and rebuild
+    the derived tables. Returns a summary of what was written.
+    """
+    rng = random.Random(seed)
+    days = int(years * 365)
+    end = end or datetime.now(timezone.utc).date()
+    start = datetime(end.year, end.month, end.day, tzinfo=timezone.utc) - timedelta(days=days)
+    pincodes = create_hierarchy(prefix, divisions, sub_divisions, offices, password)
+    counts = insert_records(generate_records(pincodes, start, days, records_per_day, rng), batch_size)
+    staff = CleaningStaff.objects.bulk_create(generate_staff(pincodes, staff_per_office, rng), batch_size=batch_size)
+    return {
+        'offices': len(pincodes),
+        'days': days,
+        'rows': {**counts, 'CleaningStaff': len(staff)},
+        'rollup_rows': rebuild_rollups(),
+        'inventory_rows': rebuild_inventory(),
+    }
@@ -1,3 +1,1652 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from io import BytesIO, StringIO
+from importlib import import_module
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.urls.resolvers import URLResolver
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from backend import instrumentation
+from backend.database import REPLICA_ALIAS, PrimaryReplicaRouter, pragma_values, read_replica
+from post_office.hierarchy import offices_under, rebuild_closure
+from post_office.models import PostOffice, PostOfficeClosure
+from users.api.authentication import token_cache
+from users.models import DivisionalOffice, SubDivisionalOffice, User
+from users.scope import invalidate_all_scopes, resolve_scope
+from waste_management import uploads
+from waste_management.analytics import SUMMARY_DECIMALS, summary_queryset
+from waste_management.archive import archive_before, archive_boundary, option as archive_option
+from waste_management.derivatives import Image, run_pending
+from waste_management.inventory import rebuild_inventory, reconcile_inventory
+from waste_management.models import ArchivedYear, CleaningStaff, DailyWasteRollup, DerivativeJob, Event, EventReport, Ewaste, PaperInventory, PaperWaste, SelledPaperWaste, UploadSession
+from waste_management.models import PaperWasteArchive, Tombstone
+from waste_management.rollups import add_to_rollup, rebuild_rollups, remove_from_rollup, rollup_queryset
+from waste_management.sync import encode_token, prune_tombstones, record_deletion
+from waste_management.synthetic import delete_synthetic_data, generate, sub_division_username
+from waste_management.uploads import temp_path
+from waste_management.views import search_staff
+
+PINCODES = ['411001', '411002', '411003']
+
+
+def explain(queryset):
+    """
+    Return the SQLite EXPLAIN QUERY PLAN lines for a queryset.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Fails when one of the analytics queries falls back to a full table scan.
+    """
+
+    def assertNoFullScan(self, queryset):
+        plan = explain(queryset)
+        # "SCAN <table>" without an index is a full table scan; "SEARCH" and "SCAN ... USING INDEX" are fine
+        full_scans = [line for line in plan if re.match(r'SCAN \S+$', line)]
+        self.assertEqual(full_scans, [], '\n'.join(plan))
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = explain(queryset)
+        self.assertTrue(any(index_name in line for line in plan), '\n'.join(plan))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class WasteQueryPlanTests(QueryPlanTestCase):
+
+    def test_ewaste_data_page_uses_pincode_date_index(self):
+        queryset = Ewaste.objects.filter(pincode__in=PINCODES).order_by('date_time', 'id')[:101]
+        self.assertNoFullScan(queryset)
+        self.assertUsesIndex(queryset, 'ewaste_pincode_date_idx')
+
+    def test_paper_waste_date_range_uses_pincode_date_index(self):
+        queryset = PaperWaste.objects.filter(
+            pincode__in=PINCODES, date__gte=date(2024, 4, 1), date__lte=date(2025, 3, 31)
+        ).order_by('date', 'id')
+        self.assertNoFullScan(queryset)
+        self.assertUsesIndex(queryset, 'paperwaste_pincode_date_idx')
+
+    def test_selled_paper_waste_export_uses_pincode_date_index(self):
+        queryset = SelledPaperWaste.objects.filter(
+            pincode__in=PINCODES, date__gte=date(2024, 4, 1)
+        ).order_by('date', 'id').values_list('id', 'date', 'total_weight')
+        self.assertNoFullScan(queryset)
+        self.assertUsesIndex(queryset, 'selledpaper_pincode_date_idx')
+
+    def test_rollup_totals_do_not_scan(self):
+        queryset = rollup_queryset(DailyWasteRollup.SOLD_PAPER, PINCODES)
+        self.assertNoFullScan(queryset.values('kind').annotate(total=Sum('weight')))
+
+    def test_rollup_summary_does_not_scan(self):
+        queryset = summary_queryset(
+            rollup_queryset(DailyWasteRollup.EWASTE, PINCODES),
+            {'no_of_units': 'units'},
+            granularity='month',
+            date_from=date(2024, 4, 1),
+            group_by_pincode=True,
+        )
+        self.assertNoFullScan(queryset)
+
+    def test_scoped_queries_through_hierarchy_do_not_scan(self):
+        queryset = Ewaste.objects.filter(pincode__in=offices_under('411000')).order_by('date_time', 'id')[:101]
+        self.assertNoFullScan(queryset)
+
+    def test_staff_listing_does_not_scan(self):
+        self.assertNoFullScan(CleaningStaff.objects.filter(pincode__in=PINCODES).order_by('id')[:101])
+
+    def test_staff_name_search_uses_name_index(self):
+        queryset = search_staff(CleaningStaff.objects.filter(pincode__in=PINCODES), 'Ra').order_by('id')[:101]
+        self.assertNoFullScan(queryset)
+        self.assertUsesIndex(queryset, 'staff_pincode_name_idx')
+
+    def test_staff_contact_search_uses_contact_index(self):
+        queryset = search_staff(CleaningStaff.objects.filter(pincode__in=PINCODES), '98').order_by('id')[:101]
+        self.assertNoFullScan(queryset)
+        self.assertUsesIndex(queryset, 'staff_pincode_contact_idx')
+
+
+def seed_hierarchy(divisions=2, sub_divisions=2, offices=2):
+    """
+    `divisions` divisional offices, each with `sub_divisions` sub-divisional offices
+    that each have `offices` branch offices, and one officer per (sub-)division.
+    The first division and its first sub-division are the ones the tests act as.
+    """
+    post_offices, division_users, sub_users = [], [], []
+    for d in range(1, divisions + 1):
+        division = PostOffice(pincode=f'{d}00000', name=f'Division {d}', contactNo='0', address='-')
+        post_offices.append(division)
+        for s in range(1, sub_divisions + 1):
+            sub_division = PostOffice(pincode=f'{d}{s:02d}000', name=f'Sub-division {d}.{s}', contactNo='0', address='-', division_pincode=division)
+            post_offices.append(sub_division)
+            post_offices.extend(
+                PostOffice(pincode=f'{d}{s:02d}{o:03d}', name=f'Office {d}.{s}.{o}', contactNo='0', address='-', division_pincode=sub_division)
+                for o in range(1, offices + 1)
+            )
+    PostOffice.objects.bulk_create(post_offices)
+    rebuild_closure(PostOffice, PostOfficeClosure)
+
+    for d in range(1, divisions + 1):
+        user = User.objects.create_user(f'division{d}', is_divisional=True)
+        DivisionalOffice.objects.create(user=user, full_name=f'Division {d}', phone_number='0', email='d@example.com', address='-', pincode=int(f'{d}00000'))
+        division_users.append(user)
+        for s in range(1, sub_divisions + 1):
+            user = User.objects.create_user(f'subdivision{d}{s}', is_sub_divisional=True)
+            SubDivisionalOffice.objects.create(
+                user=user, full_name=f'Sub-division {d}.{s}', phone_number='0', email='s@example.com', address='-',
+                pincode=int(f'{d}{s:02d}000'), division_pincode=int(f'{d}00000'),
+            )
+            sub_users.append(user)
+
+    staff = User.objects.create_user('staff', is_staff=True)
+    return SimpleNamespace(
+        pincodes=[office.pincode for office in post_offices if office.division_pincode_id],
+        users={'divisional': division_users[0], 'sub_divisional': sub_users[0], 'staff': staff, None: None},
+        # An office inside the scope of each role
+        office={'divisional': '101001', 'sub_divisional': '101001', 'staff': None, None: None},
+    )
+
+
+def seed_records(pincodes, count):
+    """
+    `count` rows of every per-office model for each pincode, then rebuild the
+    rollup and the paper inventory from them.
+    """
+    start = datetime(2024, 4, 1, tzinfo=timezone.utc)
+    event = Event.objects.create(title='Drive', description='-', attachment='attachments/seed.txt', date_time=start)
+    rows = {model: [] for model in (Ewaste, PaperWaste, SelledPaperWaste, CleaningStaff, EventReport)}
+    for pincode in pincodes:
+        for i in range(count):
+            when = start + timedelta(days=i)
+            rows[Ewaste].append(Ewaste(pincode_id=pincode, no_of_units=i + 1, date_time=when, name='Monitor'))
+            rows[PaperWaste].append(PaperWaste(pincode_id=pincode, weight=10, date=when.date()))
+            rows[SelledPaperWaste].append(SelledPaperWaste(pincode_id=pincode, total_weight=1, selling_price_per_unit=5, total_price=5, date=when.date()))
+            rows[CleaningStaff].append(CleaningStaff(pincode_id=pincode, name=f'Staff {i}', contactNo='0'))
+            rows[EventReport].append(EventReport(
+                pincode_id=pincode, event=event, report_description='-', name='-', attached_report='reports/seed.txt', date_time=when,
+            ))
+    for model, instances in rows.items():
+        model.objects.bulk_create(instances)
+    rebuild_rollups()
+    rebuild_inventory()
+
+
+@dataclass
+class RouteCase:
+    """
+    One request against a route. `route` is the URL pattern as the instrumentation
+    reports it, `budget` the most SQL queries the request may run with cold token,
+    scope and response caches. `path`, `data` and `headers` build the request from
+    the seeded data for a role: callables taking (test, role). `status` is the
+    expected status code, or {role: code}, and `expect(test, role, response, data)`
+    checks the body of a successful response.
+    """
+    method: str
+    route: str
+    budget: int
+    path: object = None
+    data: object = None
+    format: str = 'json'
+    content_type: str = None
+    headers: object = None
+    roles: tuple = ('divisional', 'sub_divisional')
+    status: object = 200
+    expect: object = None
+
+    def expected_status(self, role):
+        return self.status[role] if isinstance(self.status, dict) else self.status
+
+    def build(self, test, role):
+        url = self.path(test, role) if self.path else '/' + self.route
+        kwargs = {'format': self.format} if self.content_type is None else {'content_type': self.content_type}
+        if self.headers:
+            kwargs.update(self.headers(test, role))
+        return url, (self.data(test, role) if self.data else None), kwargs
+
+
+def normalize_route(route):
+    route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', route)
+    route = re.sub(r'<\w+:(\w+)>', r'<\1>', route)
+    return route.replace('^', '').replace('$', '')
+
+
+def project_routes():
+    """
+    Every URL pattern served by backend/urls.py, except the admin, DRF format
+    suffixes and the API root.
+    """
+    def walk(patterns, prefix=''):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, prefix + str(pattern.pattern))
+            else:
+                yield normalize_route(prefix + str(pattern.pattern))
+
+    return {
+        route for route in walk(get_resolver().url_patterns)
+        if not route.startswith('admin/') and '<format>' not in route and '<drf_format_suffix' not in route
+    }
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTestCase(TestCase):
+    """
+    Requests every route in `routes` as each role, with cold caches, and checks that
+    the number of queries stays within the budget and does not grow with the data.
+    """
+    routes = ()
+    records = 2
+    more_records = 8
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_hierarchy()
+        seed_records(cls.seed.pincodes, cls.records)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.reset_caches()
+        self.counter = 0
+
+    def reset_caches(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        cache.clear()
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+    def client_for(self, role):
+        client = APIClient()
+        user = self.seed.users[role]
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=user)[0].key)
+        return client
+
+    def count_queries(self, case, role):
+        client = self.client_for(role)
+        url, data, kwargs = case.build(self, role)
+        self.reset_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, case.method.lower())(url, data, **kwargs)
+            if response.streaming:
+                response.streamed = b''.join(response.streaming_content)
+        request = f'{case.method} {url} as {role}'
+        self.assertEqual(response.status_code, case.expected_status(role), f'{request}: {getattr(response, "content", b"")[:200]}')
+        if response.status_code >= 400:
+            self.assertTrue({'detail', 'message'} & set(response.json()), request)
+        elif case.expect:
+            with self.subTest(request):
+                case.expect(self, role, response, data)
+        return len(queries)
+
+    def measure(self):
+        return {
+            (case.method, case.route, role): (case.budget, self.count_queries(case, role))
+            for case in self.routes for role in case.roles
+        }
+
+    def test_query_budgets(self):
+        before = self.measure()
+        seed_records(self.seed.pincodes, self.more_records)
+        after = self.measure()
+        for key, (budget, queries) in before.items():
+            with self.subTest(key):
+                self.assertLessEqual(queries, budget)
+                self.assertEqual(after[key][1], queries, 'query count grows with the number of records')
+
+    # Builders for the route tables
+
+    def new_row(self, model, role, **fields):
+        basename, defaults = {
+            Ewaste: ('ewaste', {'no_of_units': 1, 'date_time': '2024-04-01T00:00:00Z', 'name': 'Monitor'}),
+            PaperWaste: ('paperwaste', {'weight': 1, 'date': '2024-04-01'}),
+            SelledPaperWaste: ('selledpaperwaste', {'total_weight': 1, 'selling_price_per_unit': 1, 'total_price': 1, 'date': '2024-04-01'}),
+            CleaningStaff: ('cleaning-staff', {'name': 'Staff', 'contactNo': '0'}),
+        }[model]
+        # Through the API, which keeps the rollup and the ledger; only sub-divisional officers add records
+        response = self.client_for('sub_divisional').post(
+            f'/{WM}{basename}/', {'pincode': self.seed.office[role], **defaults, **fields}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data['id']
+
+    def new_event(self):
+        name = default_storage.save('attachments/budget.txt', ContentFile(b'0123456789'))
+        return Event.objects.create(title='Drive', description='-', attachment=name, date_time=datetime(2024, 4, 1, tzinfo=timezone.utc))
+
+    def new_report(self, role):
+        name = default_storage.save('reports/budget.txt', ContentFile(b'0123456789'))
+        return EventReport.objects.create(
+            pincode_id=self.seed.office[role], event=self.new_event(), report_description='-', name='-',
+            attached_report=name, date_time=datetime(2024, 4, 1, tzinfo=timezone.utc),
+        ).pk
+
+    def new_upload(self, role, content=b''):
+        session = UploadSession.objects.create(
+            user=self.seed.users[role], filename='budget.txt', size=10, received=len(content), sha256=hashlib.sha256(b'0123456789').hexdigest(),
+        )
+        if content:
+            os.makedirs(os.path.dirname(temp_path(session)), exist_ok=True)
+            with open(temp_path(session), 'wb') as target:
+                target.write(content)
+        return session.pk
+
+
+WM = 'api/v1/waste-management/'
+
+
+def sub_divisional_only(code):
+    return {'divisional': 403, 'sub_divisional': code}
+
+
+def divisional_only(code):
+    return {'divisional': code, 'sub_divisional': 403}
+
+
+# Body checks for RouteCase.expect
+
+def in_scope(t, role, response, data):
+    rows = response.json()['results']
+    t.assertTrue(rows)
+    t.assertLessEqual({row['pincode'] for row in rows}, resolve_scope(t.seed.users[role]).pincodes)
+
+
+def echoes(t, role, response, data):
+    body = response.json()
+    for field, value in data.items():
+        if isinstance(value, (str, int, float)):
+            t.assertEqual(body[field], value, field)
+
+
+def same_row(t, role, response, data):
+    t.assertEqual(str(response.json()['id']), re.search(r'/([^/]+)/$', response.wsgi_request.path).group(1))
+
+
+def deleted(model):
+    def expect(t, role, response, data):
+        pk = re.search(r'/([0-9a-f-]+)/(?:delete-data/)?$', response.wsgi_request.path).group(1)
+        t.assertFalse(model.objects.filter(pk=pk).exists())
+    return expect
+
+
+def bulk_added(t, role, response, data):
+    t.assertEqual((response.data['created'], response.data['errors']), (len(data), []))
+
+
+def csv_header(*fields):
+    def expect(t, role, response, data):
+        t.assertEqual(response.streamed.decode().splitlines()[0], ','.join(fields))
+    return expect
+
+
+def has_keys(*keys):
+    def expect(t, role, response, data):
+        body = response.json()
+        t.assertLessEqual(set(keys), set(body))
+        t.assertTrue(body[keys[0]])
+    return expect
+
+
+def waste_routes(basename, model, row, export_fields):
+    """
+    The routes of one waste viewset; `row(pincode)` is a valid request body.
+    """
+    base = f'{WM}{basename}/'
+    detail = lambda suffix='': lambda t, role: f'/{base}{t.new_row(model, role)}/{suffix}'
+    body = lambda t, role: row(t.seed.office[role])
+    return [
+        RouteCase('GET', base, 4, expect=in_scope),
+        RouteCase('POST', base, 10, data=body, status=sub_divisional_only(201), expect=echoes),
+        RouteCase('POST', base + 'bulk-add/', 10, data=lambda t, role: [body(t, role)] * 3, status=sub_divisional_only(201), expect=bulk_added),
+        RouteCase('GET', base + 'export/', 5, expect=csv_header(*export_fields)),
+        RouteCase('GET', base + 'analytics/', 6, expect=has_keys('data')),
+        RouteCase('GET', base + 'analytics/summary/', 4, expect=has_keys('buckets')),
+        RouteCase('POST', base + 'add-data/', 10, data=body, status=sub_divisional_only(201), expect=echoes),
+        RouteCase('GET', base + '<pk>/', 4, path=detail(), expect=same_row),
+        RouteCase('PUT', base + '<pk>/', 13, path=detail(), data=body, status=sub_divisional_only(200), expect=echoes),
+        RouteCase('PATCH', base + '<pk>/', 13, path=detail(), data=body, status=sub_divisional_only(200), expect=echoes),
+        RouteCase('DELETE', base + '<pk>/', 11, path=detail(), status=204, expect=deleted(model)),
+        RouteCase('DELETE', base + '<pk>/delete-data/', 11, path=detail('delete-data/'), status=204, expect=deleted(model)),
+    ]
+
+
+def event_body(t, role):
+    return {'title': 'Drive', 'description': '-', 'date_time': '2024-04-01T00:00:00Z', 'attachment': ContentFile(b'0123', name='a.txt')}
+
+
+def report_body(t, role):
+    return {
+        'pincode': t.seed.office[role], 'event': t.new_event().pk, 'report_description': '-', 'name': '-',
+        'date_time': '2024-04-01T00:00:00Z', 'attached_report': ContentFile(b'0123', name='r.txt'),
+    }
+
+
+WASTE_MANAGEMENT_ROUTES = [
+    *waste_routes('ewaste', Ewaste, lambda pincode: {'pincode': pincode, 'no_of_units': 2, 'date_time': '2024-04-01T10:00:00Z', 'name': 'Monitor'},
+                  ('id', 'date_time', 'pincode_id', 'name', 'no_of_units')),
+    *waste_routes('paperwaste', PaperWaste, lambda pincode: {'pincode': pincode, 'weight': 3, 'date': '2024-04-01'},
+                  ('id', 'date', 'pincode_id', 'weight')),
+    *waste_routes('selledpaperwaste', SelledPaperWaste, lambda pincode: {
+        'pincode': pincode, 'total_weight': 1, 'selling_price_per_unit': 2, 'total_price': 2, 'date': '2024-04-01',
+    }, ('id', 'date', 'pincode_id', 'total_weight', 'selling_price_per_unit', 'total_price')),
+    RouteCase('GET', WM + 'paperwaste/inventory/', 4, expect=has_keys('data')),
+    RouteCase('GET', WM + 'async/ewaste/analytics/', 6, expect=has_keys('data')),
+    RouteCase('GET', WM + 'async/paperwaste/analytics/', 6, expect=has_keys('data')),
+    RouteCase('GET', WM + 'async/selledpaperwaste/analytics/', 6, expect=has_keys('data')),
+    RouteCase('GET', WM + 'dashboard/', 4, expect=has_keys('offices')),
+    RouteCase('GET', WM + 'sync/', 9, path=lambda t, role: f'/{WM}sync/?token={encode_token(datetime.now(timezone.utc) - timedelta(days=1))}',
+              expect=has_keys('next_token', 'changes', 'deleted')),
+    RouteCase('GET', WM, 1, expect=has_keys('ewaste')),
+    RouteCase('GET', WM + 'cleaning-staff/', 4, expect=in_scope),
+    RouteCase('POST', WM + 'cleaning-staff/', 5, data=lambda t, role: {'pincode': t.seed.office[role], 'name': 'Staff', 'contactNo': '0'},
+              status=sub_divisional_only(201), expect=echoes),
+    RouteCase('GET', WM + 'cleaning-staff/<pk>/', 4, path=lambda t, role: f'/{WM}cleaning-staff/{t.new_row(CleaningStaff, role)}/', expect=same_row),
+    RouteCase('PUT', WM + 'cleaning-staff/<pk>/', 6, path=lambda t, role: f'/{WM}cleaning-staff/{t.new_row(CleaningStaff, role)}/',
+              data=lambda t, role: {'pincode': t.seed.office[role], 'name': 'Staff', 'contactNo': '1'}, expect=echoes),
+    RouteCase('PATCH', WM + 'cleaning-staff/<pk>/', 5, path=lambda t, role: f'/{WM}cleaning-staff/{t.new_row(CleaningStaff, role)}/',
+              data=lambda t, role: {'contactNo': '1'}, expect=echoes),
+    RouteCase('DELETE', WM + 'cleaning-staff/<pk>/', 8, path=lambda t, role: f'/{WM}cleaning-staff/{t.new_row(CleaningStaff, role)}/',
+              status=sub_divisional_only(204), expect=deleted(CleaningStaff)),
+    RouteCase('POST', WM + 'uploads/', 2, data=lambda t, role: {'filename': 'a.txt', 'size': 10, 'sha256': '0' * 64}, status=201, expect=echoes),
+    RouteCase('GET', WM + 'uploads/<pk>/', 2, path=lambda t, role: f'/{WM}uploads/{t.new_upload(role)}/', expect=same_row),
+    RouteCase('PUT', WM + 'uploads/<pk>/', 5, path=lambda t, role: f'/{WM}uploads/{t.new_upload(role)}/',
+              data=lambda t, role: b'01234', content_type='application/octet-stream',
+              headers=lambda t, role: {'HTTP_CONTENT_RANGE': 'bytes 0-4/10'},
+              expect=lambda t, role, response, data: t.assertEqual(response.data['received'], 5)),
+    RouteCase('DELETE', WM + 'uploads/<pk>/', 3, path=lambda t, role: f'/{WM}uploads/{t.new_upload(role)}/', status=204, expect=deleted(UploadSession)),
+    RouteCase('POST', WM + 'uploads/<pk>/complete/', 5, path=lambda t, role: f'/{WM}uploads/{t.new_upload(role, b"0123456789")}/complete/',
+              expect=lambda t, role, response, data: t.assertTrue(response.data['completed'])),
+    RouteCase('GET', WM + 'events/', 4, expect=has_keys('results')),
+    RouteCase('POST', WM + 'events/', 5, data=event_body, format='multipart', status=divisional_only(201), expect=echoes),
+    RouteCase('GET', WM + 'events/<pk>/', 4, path=lambda t, role: f'/{WM}events/{t.new_event().pk}/', expect=same_row),
+    RouteCase('PUT', WM + 'events/<pk>/', 6, path=lambda t, role: f'/{WM}events/{t.new_event().pk}/', data=event_body, format='multipart',
+              status=divisional_only(200), expect=echoes),
+    RouteCase('PATCH', WM + 'events/<pk>/', 5, path=lambda t, role: f'/{WM}events/{t.new_event().pk}/',
+              data=lambda t, role: {'title': 'Renamed'}, status=divisional_only(200), expect=echoes),
+    RouteCase('DELETE', WM + 'events/<pk>/', 6, path=lambda t, role: f'/{WM}events/{t.new_event().pk}/', status=divisional_only(204), expect=deleted(Event)),
+    RouteCase('GET', WM + 'events/<pk>/attachment/', 4, path=lambda t, role: f'/{WM}events/{t.new_event().pk}/attachment/',
+              expect=lambda t, role, response, data: t.assertEqual(response.streamed, b'0123456789')),
+    RouteCase('GET', WM + 'event-reports/', 4, expect=in_scope),
+    RouteCase('POST', WM + 'event-reports/', 7, data=report_body, format='multipart', status=sub_divisional_only(201), expect=echoes),
+    RouteCase('GET', WM + 'event-reports/<pk>/', 4, path=lambda t, role: f'/{WM}event-reports/{t.new_report(role)}/', expect=same_row),
+    RouteCase('PUT', WM + 'event-reports/<pk>/', 8, path=lambda t, role: f'/{WM}event-reports/{t.new_report(role)}/', data=report_body, format='multipart',
+              status=sub_divisional_only(200), expect=echoes),
+    RouteCase('PATCH', WM + 'event-reports/<pk>/', 5, path=lambda t, role: f'/{WM}event-reports/{t.new_report(role)}/',
+              data=lambda t, role: {'name': 'Renamed'}, status=sub_divisional_only(200), expect=echoes),
+    RouteCase('DELETE', WM + 'event-reports/<pk>/', 5, path=lambda t, role: f'/{WM}event-reports/{t.new_report(role)}/',
+              status=sub_divisional_only(204), expect=deleted(EventReport)),
+    RouteCase('GET', WM + 'event-reports/<pk>/report/', 4, path=lambda t, role: f'/{WM}event-reports/{t.new_report(role)}/report/',
+              expect=lambda t, role, response, data: t.assertEqual(response.streamed, b'0123456789')),
+    RouteCase('GET', 'api/v1/stats/', 1, roles=('staff',), expect=has_keys('routes')),
+]
+
+
+class AsyncParityTestCase(TestCase):
+    """
+    Requests each `async/...` route and its DRF counterpart as every role with the
+    same query strings, following the cursors, and checks that status and body match.
+    """
+    # (DRF route, async route, [query parameters])
+    pairs = ()
+    roles = ('divisional', 'sub_divisional', 'staff', None)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_hierarchy()
+        seed_records(cls.seed.pincodes, 4)
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+
+    def fetch(self, role, path, params):
+        # Both routes share the cached responses; each must compute its own
+        cache.clear()
+        client = APIClient()
+        if self.seed.users[role] is not None:
+            client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users[role])[0].key)
+        response = client.get(path, params)
+        return response.status_code, response.json()
+
+    def test_async_routes_answer_like_the_drf_ones(self):
+        for sync_path, async_path, queries in self.pairs:
+            for role in self.roles:
+                for params in queries:
+                    with self.subTest(path=async_path, role=role, params=params):
+                        pages = 0
+                        while True:
+                            expected = self.fetch(role, sync_path, params)
+                            self.assertEqual(self.fetch(role, async_path, params), expected)
+                            pages += 1
+                            if expected[0] != 200 or not expected[1]['next_cursor']:
+                                break
+                            params = {**params, 'cursor': expected[1]['next_cursor']}
+                        self.assertLess(pages, 20)
+
+
+class WasteAnalyticsAsyncParityTests(AsyncParityTestCase):
+    pairs = [
+        (f'/{WM}{basename}/analytics/', f'/{WM}async/{basename}/analytics/', [
+            {}, {'page_size': 5}, {'page_size': 5, 'fields': 'id,pincode'}, {'metrics': metrics, 'from': '2024-04-02', 'to': '2024-04-03'},
+            {'from': 'yesterday'}, {'metrics': 'nonsense'}, {'cursor': 'not a cursor'},
+        ])
+        for basename, metrics in (
+            ('ewaste', 'total_units,count,min_units,max_units'),
+            ('paperwaste', 'total_weight,count,min_weight,max_weight'),
+            ('selledpaperwaste', 'total_price,total_weight,min_price_per_unit,avg_price_per_unit'),
+        )
+    ]
+
+
+class WasteManagementQueryBudgetTests(QueryBudgetTestCase):
+    routes = WASTE_MANAGEMENT_ROUTES
+
+    def test_every_project_route_has_a_budget(self):
+        from post_office.tests import POST_OFFICE_ROUTES
+        from users.tests import USER_ROUTES
+
+        covered = {case.route for case in [*WASTE_MANAGEMENT_ROUTES, *POST_OFFICE_ROUTES, *USER_ROUTES]}
+        self.assertEqual(sorted(project_routes() - covered), [])
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generator_is_reproducible_and_consistent(self):
+        def run():
+            summary = generate(divisions=1, sub_divisions=1, offices=2, years=0.2, records_per_day=1.5, seed=7, end=date(2024, 3, 31))
+            totals = (
+                Ewaste.objects.aggregate(Sum('no_of_units')),
+                PaperWaste.objects.aggregate(Sum('weight')),
+                SelledPaperWaste.objects.aggregate(Sum('total_weight')),
+            )
+            return summary, totals
+
+        first = run()
+        delete_synthetic_data('9')
+        self.assertEqual(run(), first)
+        self.assertEqual(reconcile_inventory(), [])
+        self.assertFalse(PaperInventory.objects.filter(balance__lt=0).exists())
+        self.assertTrue(User.objects.get(username=sub_division_username(1, 1)).check_password('synthetic'))
+
+
+class AnalyticsSummaryTests(TestCase):
+
+    def setUp(self):
+        invalidate_all_scopes()
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=1, offices=1)
+        SelledPaperWaste.objects.bulk_create(
+            SelledPaperWaste(pincode_id='101001', total_weight=weight, selling_price_per_unit=price, total_price=weight * price, date=date(2024, 4, 1))
+            for weight, price in ((1.1, 3.3), (2.2, 7.7), (3.3, 1.9))
+        )
+        rebuild_rollups()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['sub_divisional'])[0].key)
+        cache.clear()
+
+    def test_sold_paper_buckets_have_clean_rounded_figures(self):
+        response = self.client.get('/api/v1/waste-management/selledpaperwaste/analytics/summary/', {'granularity': 'month'})
+        self.assertEqual(response.status_code, 200)
+        bucket = response.json()['buckets'][0]
+        self.assertEqual(set(bucket), {'period', 'count', 'total_weight', 'avg_weight', 'total_price', 'avg_price'})
+        self.assertEqual(bucket['count'], 3)
+        self.assertEqual(bucket['total_weight'], 6.6)
+        self.assertEqual(bucket['avg_weight'], 2.2)
+        self.assertEqual(bucket['total_price'], round(1.1 * 3.3 + 2.2 * 7.7 + 3.3 * 1.9, 2))
+        self.assertEqual(bucket['avg_price'], round((1.1 * 3.3 + 2.2 * 7.7 + 3.3 * 1.9) / 3, 2))
+
+
+class AnalyticsMetricTests(TestCase):
+    """
+    The analytics metrics and summary averages, read from the rollup and from the
+    live and archived rows, equal the same figures computed from the raw rows.
+    """
+    # basename -> (model, date of a row, {metric: figure from the rows in range})
+    figures = {
+        'ewaste': (Ewaste, lambda row: row.date_time.date(), {
+            'total_units': lambda rows: sum(row.no_of_units for row in rows),
+            'count': len,
+            'min_units': lambda rows: min(row.no_of_units for row in rows),
+            'max_units': lambda rows: max(row.no_of_units for row in rows),
+        }),
+        'paperwaste': (PaperWaste, lambda row: row.date, {
+            'total_weight': lambda rows: sum(row.weight for row in rows),
+            'count': len,
+            'min_weight': lambda rows: min(row.weight for row in rows),
+            'max_weight': lambda rows: max(row.weight for row in rows),
+        }),
+        'selledpaperwaste': (SelledPaperWaste, lambda row: row.date, {
+            'total_weight': lambda rows: sum(row.total_weight for row in rows),
+            'total_price': lambda rows: sum(row.total_price for row in rows),
+            'count': len,
+            'min_weight': lambda rows: min(row.total_weight for row in rows),
+            'max_weight': lambda rows: max(row.total_weight for row in rows),
+            'min_price_per_unit': lambda rows: min(row.selling_price_per_unit for row in rows),
+            'max_price_per_unit': lambda rows: max(row.selling_price_per_unit for row in rows),
+            'avg_price_per_unit': lambda rows: sum(row.total_price for row in rows) / sum(row.total_weight for row in rows),
+        }),
+    }
+    ranges = ({}, {'from': '2022-01-01', 'to': '2023-12-31'}, {'from': '2023-06-01'}, {'to': '2021-05-31'})
+
+    def setUp(self):
+        invalidate_all_scopes()
+        self.seed = seed_hierarchy(divisions=2, sub_divisions=1, offices=2)
+        rows = []
+        for number, pincode in enumerate(self.seed.pincodes):
+            for i in range(30):
+                when = datetime(2021, 4, 1, 12, tzinfo=timezone.utc) + timedelta(days=37 * i + number)
+                price = i % 5 + 0.5
+                weight = (i % 3 + 1) * 1.25
+                rows.append(Ewaste(pincode_id=pincode, no_of_units=(i + number) % 9 + 1, date_time=when, name='Monitor'))
+                rows.append(PaperWaste(pincode_id=pincode, weight=1.5 + (i + number) % 4 * 0.75, date=when.date()))
+                rows.append(SelledPaperWaste(pincode_id=pincode, total_weight=weight, selling_price_per_unit=price, total_price=weight * price, date=when.date()))
+        for model in (Ewaste, PaperWaste, SelledPaperWaste):
+            model.objects.bulk_create([row for row in rows if type(row) is model])
+        rebuild_rollups()
+        rebuild_inventory()
+        self.pincodes = resolve_scope(self.seed.users['divisional']).pincodes
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['divisional'])[0].key)
+
+    def expected(self, basename, params):
+        model, day, metrics = self.figures[basename]
+        low, high = params.get('from'), params.get('to')
+        rows = [
+            row for row in model.objects.filter(pincode__in=self.pincodes)
+            if (not low or day(row) >= date.fromisoformat(low)) and (not high or day(row) <= date.fromisoformat(high))
+        ]
+        self.assertTrue(rows)
+        return {name: figure(rows) for name, figure in metrics.items()}
+
+    def analytics(self, basename, params):
+        cache.clear()
+        response = self.client.get(f'/api/v1/waste-management/{basename}/analytics/', {'metrics': ','.join(self.figures[basename][2]), **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def assertFigures(self, actual, expected):
+        for name, value in expected.items():
+            self.assertAlmostEqual(actual[name], value, places=6, msg=name)
+
+    def test_metrics_match_the_raw_rows(self):
+        expected = {(basename, str(params)): self.expected(basename, params) for basename in self.figures for params in self.ranges}
+        for archived in (False, True):
+            if archived:
+                # Moves the rows before April 2023 out of the live tables
+                with self.captureOnCommitCallbacks(execute=True):
+                    archive_before(2023)
+                self.assertEqual(archive_boundary(), date(2023, 4, 1))
+                self.assertFalse(PaperWaste.objects.filter(date__lt=date(2023, 4, 1)).exists())
+            for basename in self.figures:
+                for params in self.ranges:
+                    with self.subTest(basename=basename, params=params, archived=archived):
+                        self.assertFigures(self.analytics(basename, params), expected[(basename, str(params))])
+
+    def test_summary_averages_match_the_raw_rows(self):
+        # Empty the last month: its rollup rows stay, with a record_count of 0
+        last = PaperWaste.objects.filter(pincode__in=self.pincodes).latest('date').date.replace(day=1)
+        emptied = list(PaperWaste.objects.filter(pincode__in=self.pincodes, date__gte=last))
+        remove_from_rollup(*emptied)
+        PaperWaste.objects.filter(pk__in=[row.pk for row in emptied]).delete()
+        self.assertTrue(DailyWasteRollup.objects.filter(date__gte=last, kind=DailyWasteRollup.PAPER, record_count=0).exists())
+
+        months = {}
+        for row in PaperWaste.objects.filter(pincode__in=self.pincodes):
+            months.setdefault(row.date.replace(day=1), []).append(row.weight)
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_before(2023)
+        cache.clear()
+        response = self.client.get('/api/v1/waste-management/paperwaste/analytics/summary/', {'granularity': 'month'})
+        self.assertEqual(response.status_code, 200, response.content)
+        buckets = {bucket['period']: bucket for bucket in response.json()['buckets']}
+        self.assertEqual(set(buckets), {month.isoformat() for month in months})
+        for month, weights in months.items():
+            bucket = buckets[month.isoformat()]
+            self.assertEqual(bucket['count'], len(weights))
+            self.assertEqual(bucket['total_weight'], round(sum(weights), SUMMARY_DECIMALS))
+            self.assertEqual(bucket['avg_weight'], round(sum(weights) / len(weights), SUMMARY_DECIMALS))
+
+
+class DashboardTests(TestCase):
+
+    def setUp(self):
+        invalidate_all_scopes()
+        self.seed = seed_hierarchy(divisions=2, sub_divisions=1, offices=2)
+        Ewaste.objects.bulk_create([
+            Ewaste(pincode_id='101001', no_of_units=3, date_time=datetime(2024, 4, 2, 12, tzinfo=timezone.utc), name='Monitor'),
+            Ewaste(pincode_id='101001', no_of_units=2, date_time=datetime(2024, 6, 1, 12, tzinfo=timezone.utc), name='Printer'),
+        ])
+        PaperWaste.objects.bulk_create([
+            PaperWaste(pincode_id='101001', weight=10, date=date(2024, 4, 1)),
+            PaperWaste(pincode_id='101001', weight=5, date=date(2024, 5, 10)),
+            PaperWaste(pincode_id='101002', weight=7, date=date(2024, 4, 20)),
+            PaperWaste(pincode_id='201001', weight=100, date=date(2024, 4, 1)),
+        ])
+        SelledPaperWaste.objects.bulk_create([
+            SelledPaperWaste(pincode_id='101001', total_weight=4, selling_price_per_unit=3, total_price=12, date=date(2024, 4, 15)),
+            SelledPaperWaste(pincode_id='101001', total_weight=6, selling_price_per_unit=2, total_price=12, date=date(2024, 5, 20)),
+        ])
+        rebuild_rollups()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['divisional'])[0].key)
+        cache.clear()
+
+    def figures(self, **params):
+        response = self.client.get(f'/{WM}dashboard/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        offices = {office.pop('pincode'): office for office in body['offices']}
+        self.assertEqual(set(offices), set(resolve_scope(self.seed.users['divisional']).pincodes))
+        return offices, body['totals']
+
+    def office(self, ewaste_units=0, ewaste_records=0, paper_generated=0, paper_sold=0, revenue=0, unsold_backlog=0):
+        return {
+            'ewaste_units': ewaste_units, 'ewaste_records': ewaste_records, 'paper_generated': paper_generated,
+            'paper_sold': paper_sold, 'revenue': revenue, 'unsold_backlog': unsold_backlog,
+        }
+
+    def test_figures_per_office_and_in_total(self):
+        offices, totals = self.figures()
+        self.assertEqual(offices['101001'], self.office(5, 2, 15, 10, 24, 5))
+        self.assertEqual(offices['101002'], self.office(paper_generated=7, unsold_backlog=7))
+        self.assertEqual(offices['101000'], self.office())
+        self.assertEqual(totals, self.office(5, 2, 22, 10, 24, 12))
+
+    def test_backlog_is_counted_within_the_range(self):
+        offices, totals = self.figures(**{'from': '2024-04-01', 'to': '2024-04-30'})
+        self.assertEqual(offices['101001'], self.office(3, 1, 10, 4, 12, 6))
+        self.assertEqual(offices['101002'], self.office(paper_generated=7, unsold_backlog=7))
+        self.assertEqual(totals, self.office(3, 1, 17, 4, 12, 13))
+
+        # Paper sold in a range can exceed what was generated in it
+        offices, totals = self.figures(**{'from': '2024-05-15'})
+        self.assertEqual(offices['101001'], self.office(2, 1, 0, 6, 12, -6))
+        self.assertEqual(totals['unsold_backlog'], -6)
+
+
+class WasteRecordRouteTests(TestCase):
+    """
+    The generic create, update and list routes stay within the officer's scope and
+    keep the daily rollup in step, like add-data.
+    """
+    url = '/api/v1/waste-management/paperwaste/'
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=2, sub_divisions=1, offices=1)
+        self.client = self.client_for('sub_divisional')
+
+    def client_for(self, role):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users[role])[0].key)
+        return client
+
+    def rollup(self, pincode):
+        return list(DailyWasteRollup.objects.filter(kind=DailyWasteRollup.PAPER, pincode_id=pincode).values_list('date', 'record_count', 'weight'))
+
+    def test_create_and_update_keep_the_rollup(self):
+        response = self.client.post(self.url, {'pincode': '101001', 'weight': 3, 'date': '2024-04-01'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.rollup('101001'), [(date(2024, 4, 1), 1, 3.0)])
+
+        response = self.client.patch(f"{self.url}{response.json()['id']}/", {'weight': 5, 'date': '2024-04-02'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.rollup('101001'), [(date(2024, 4, 1), 0, 0.0), (date(2024, 4, 2), 1, 5.0)])
+
+    def test_records_outside_the_scope_are_rejected(self):
+        response = self.client.post(self.url, {'pincode': '201001', 'weight': 3, 'date': '2024-04-01'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client_for('divisional').post(self.url, {'pincode': '101001', 'weight': 3, 'date': '2024-04-01'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(PaperWaste.objects.exists())
+
+        other = PaperWaste.objects.create(pincode_id='201001', weight=1)
+        self.assertEqual(self.client.get(f'{self.url}{other.pk}/').status_code, 404)
+        self.assertEqual(self.client.patch(f'{self.url}{other.pk}/', {'weight': 2}, format='json').status_code, 404)
+        self.assertEqual(self.client.delete(f'{self.url}{other.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(self.url).json()['results'], [])
+
+    def test_migration_backfills_the_rollup(self):
+        PaperWaste.objects.create(pincode_id='101001', weight=2, date=date(2024, 4, 1))
+        PaperWaste.objects.create(pincode_id='101001', weight=3, date=date(2024, 4, 1))
+        import_module('waste_management.migrations.0003_dailywasterollup').populate_rollups(apps, None)
+        self.assertEqual(self.rollup('101001'), [(date(2024, 4, 1), 2, 5.0)])
+
+
+class BulkIngestAndExportTests(TestCase):
+    """
+    bulk-add keeps the valid rows and reports the others; export streams exactly
+    the scoped rows.
+    """
+    base = '/api/v1/waste-management/'
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=2, sub_divisions=1, offices=2)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['sub_divisional'])[0].key)
+
+    def bulk_add(self, basename, body, **kwargs):
+        return self.client.post(f'{self.base}{basename}/bulk-add/', body, **kwargs or {'format': 'json'})
+
+    def test_invalid_rows_are_reported_and_the_rest_added(self):
+        response = self.bulk_add('paperwaste', [
+            {'pincode': '101001', 'weight': 2, 'date': '2024-04-01'},
+            {'pincode': '101001', 'date': '2024-04-01'},
+            {'pincode': '201001', 'weight': 2, 'date': '2024-04-01'},
+            'not an object',
+            {'pincode': '101002', 'weight': 3, 'date': '2024-04-02'},
+        ])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2, 3])
+        self.assertIn('weight', response.data['errors'][0]['errors'])
+        self.assertIn('pincode', response.data['errors'][1]['errors'])
+        self.assertEqual(sorted(PaperWaste.objects.values_list('pincode_id', 'weight')), [('101001', 2.0), ('101002', 3.0)])
+        self.assertEqual(DailyWasteRollup.objects.filter(kind=DailyWasteRollup.PAPER).aggregate(Sum('weight'))['weight__sum'], 5.0)
+        self.assertEqual(PaperInventory.objects.get(pincode_id='101001').balance, 2.0)
+
+        response = self.bulk_add('paperwaste', [{'pincode': '201001', 'weight': 2}])
+        self.assertEqual((response.status_code, response.data['created']), (400, 0))
+
+    def test_ndjson_body(self):
+        body = '{"pincode": "101001", "weight": 1, "date": "2024-04-01"}\n\n{"pincode": "101002", "weight": 2, "date": "2024-04-01"}\n'
+        response = self.bulk_add('paperwaste', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['created'], 2)
+
+        # A malformed line is reported as that row's error; the valid rows are still added
+        response = self.bulk_add(
+            'paperwaste', '{"pincode": "101001"}\nnot json\n{"pincode": "101001", "weight": 3, "date": "2024-04-02"}\n',
+            content_type='application/x-ndjson',
+        )
+        self.assertEqual((response.status_code, response.data['created']), (201, 1), response.content)
+        self.assertEqual([error['row'] for error in response.data['errors']], [0, 1])
+        self.assertIn('line 2', response.data['errors'][1]['errors']['non_field_errors'][0])
+        self.assertEqual(PaperWaste.objects.count(), 3)
+
+        response = self.bulk_add('paperwaste', b'\xff\xfe{}\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('NDJSON parse error', response.data['detail'])
+        self.assertEqual(PaperWaste.objects.count(), 3)
+
+    def test_sales_beyond_the_stock(self):
+        self.bulk_add('paperwaste', [{'pincode': '101001', 'weight': 5, 'date': '2024-04-01'}])
+        sale = {'pincode': '101001', 'total_weight': 3, 'selling_price_per_unit': 2, 'total_price': 6, 'date': '2024-04-02'}
+        response = self.bulk_add('selledpaperwaste', [sale, sale])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'], [{'row': 1, 'errors': {'total_weight': ['Only 2 kg of paper in stock']}}])
+
+        # Stock taken between the check and the insert: nothing of the request is written
+        with patch('waste_management.views.stock_shortfalls', return_value={}):
+            response = self.bulk_add('selledpaperwaste', [{**sale, 'total_weight': 1}, sale])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(SelledPaperWaste.objects.count(), 1)
+        self.assertEqual(PaperInventory.objects.get(pincode_id='101001').balance, 2.0)
+        self.assertEqual(DailyWasteRollup.objects.get(kind=DailyWasteRollup.SOLD_PAPER).record_count, 1)
+
+    def export(self, export_type):
+        response = self.client.get(f'{self.base}paperwaste/export/', {'type': export_type})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_content(self):
+        PaperWaste.objects.bulk_create([
+            PaperWaste(pincode_id='101002', weight=1.5, date=date(2024, 4, 2)),
+            PaperWaste(pincode_id='101001', weight=2, date=date(2024, 4, 1)),
+            PaperWaste(pincode_id='201001', weight=9, date=date(2024, 4, 1)),
+        ])
+        first, second, _ = PaperWaste.objects.order_by('id').values_list('id', flat=True)
+
+        self.assertEqual(self.export('csv').splitlines(), [
+            'id,date,pincode_id,weight',
+            f'{second},2024-04-01,101001,2.0',
+            f'{first},2024-04-02,101002,1.5',
+        ])
+        self.assertEqual([json.loads(line) for line in self.export('ndjson').splitlines()], [
+            {'id': second, 'date': '2024-04-01', 'pincode_id': '101001', 'weight': 2.0},
+            {'id': first, 'date': '2024-04-02', 'pincode_id': '101002', 'weight': 1.5},
+        ])
+        self.assertEqual(self.client.get(f'{self.base}paperwaste/export/', {'type': 'xml'}).status_code, 400)
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Cached analytics answer conditional requests with 304 and are replaced once a
+    write to one of the scope's offices commits.
+    """
+    url = '/api/v1/waste-management/paperwaste/analytics/summary/'
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        cache.clear()
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=1, offices=1)
+        self.clients = {}
+        for role in ('divisional', 'sub_divisional'):
+            self.clients[role] = APIClient()
+            self.clients[role].credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users[role])[0].key)
+        self.add(2)
+
+    def add(self, weight):
+        response = self.clients['sub_divisional'].post(
+            '/api/v1/waste-management/paperwaste/add-data/', {'pincode': '101001', 'weight': weight, 'date': '2024-04-01'}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def summary(self, role='sub_divisional', **headers):
+        return self.clients[role].get(self.url, {'granularity': 'month'}, headers=headers)
+
+    def total(self, response):
+        self.assertEqual(response.status_code, 200)
+        return response.json()['buckets'][0]['total_weight']
+
+    def test_conditional_requests(self):
+        response = self.summary()
+        etag = response['ETag']
+        self.assertEqual(self.total(response), 2.0)
+
+        response = self.summary(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.summary(if_none_match='"other", ' + etag).status_code, 304)
+        self.assertEqual(self.summary(if_none_match='"other"').status_code, 200)
+        self.assertEqual(self.summary(if_modified_since=response['Last-Modified']).status_code, 304)
+
+    def test_writes_invalidate_on_commit(self):
+        etags = {role: self.summary(role)['ETag'] for role in self.clients}
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.add(3)
+        # Not committed yet: the cached figures are still served
+        self.assertEqual(self.total(self.summary()), 2.0)
+        self.assertTrue(callbacks)
+
+        for callback in callbacks:
+            callback()
+        for role in self.clients:
+            response = self.summary(role, if_none_match=etags[role])
+            self.assertEqual(self.total(response), 5.0)
+            self.assertNotEqual(response['ETag'], etags[role])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class UploadTests(TestCase):
+    """
+    Chunked uploads resume from the acknowledged offset and are checked before use;
+    stored files are served with byte ranges.
+    """
+    url = '/api/v1/waste-management/uploads/'
+    content = b'0123456789abcdef'
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=1, offices=1)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['sub_divisional'])[0].key)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def start(self, sha256=None):
+        response = self.client.post(self.url, {
+            'filename': 'report.txt', 'size': len(self.content), 'sha256': sha256 or hashlib.sha256(self.content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return f"{self.url}{response.data['id']}/"
+
+    def send(self, url, start, end, total=None):
+        return self.client.put(
+            url, self.content[start:end + 1], content_type='application/octet-stream',
+            headers={'Content-Range': f'bytes {start}-{end}/{total or len(self.content)}'},
+        )
+
+    def test_resume_from_the_offset(self):
+        url = self.start()
+        self.assertEqual(self.send(url, 0, 5)['Upload-Offset'], '6')
+        # The client lost the answer and asks where to resume
+        response = self.client.get(url)
+        self.assertEqual((response.data['received'], response['Upload-Offset']), (6, '6'))
+        response = self.send(url, 6, 15)
+        self.assertEqual((response.status_code, response['Upload-Offset']), (200, '16'))
+
+        response = self.client.post(url + 'complete/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(UploadSession.objects.get().completed)
+        with open(temp_path(UploadSession.objects.get()), 'rb') as source:
+            self.assertEqual(source.read(), self.content)
+        self.assertEqual(self.send(url, 0, 5).status_code, 409)
+
+    def test_chunks_out_of_order_are_refused(self):
+        url = self.start()
+        self.send(url, 0, 5)
+        response = self.send(url, 10, 15)
+        self.assertEqual((response.status_code, response['Upload-Offset']), (409, '6'))
+        self.assertEqual(self.send(url, 0, 5).status_code, 409)
+        self.assertEqual(self.send(url, 6, 20, total=21).status_code, 416)
+        self.assertEqual(self.client.put(url, b'x', content_type='application/octet-stream').status_code, 400)
+        self.assertEqual(UploadSession.objects.get().received, 6)
+
+    def test_chunks_are_received_outside_the_transaction(self):
+        url = self.start()
+        outer = len(connection.atomic_blocks)
+        receive_chunk = uploads.receive_chunk
+        depths = []
+
+        def receive(*args):
+            depths.append(len(connection.atomic_blocks))
+            return receive_chunk(*args)
+
+        with patch('waste_management.uploads.receive_chunk', side_effect=receive):
+            self.assertEqual(self.send(url, 0, 15).status_code, 200)
+        self.assertEqual(depths, [outer])
+        self.assertFalse([name for name in os.listdir(os.path.dirname(temp_path(UploadSession.objects.get()))) if name.endswith('.chunk')])
+
+    def test_a_chunk_for_a_stale_offset_is_dropped(self):
+        url = self.start()
+        stale = UploadSession.objects.get()
+        chunk = uploads.receive_chunk(stale, BytesIO(self.content[:6]), 6)
+        # Another request appends the same chunk first
+        self.send(url, 0, 5)
+        with self.assertRaises(uploads.UploadError) as error:
+            uploads.append_chunk(stale, chunk, 0, 6)
+        self.assertEqual((error.exception.status, stale.received), (409, 6))
+        self.assertFalse(os.path.exists(chunk))
+        with open(temp_path(stale), 'rb') as source:
+            self.assertEqual(source.read(), self.content[:6])
+
+    def test_checksum_mismatch(self):
+        url = self.start(sha256='0' * 64)
+        self.send(url, 0, 5)
+        self.assertEqual(self.client.post(url + 'complete/').status_code, 409)
+        self.send(url, 6, 15)
+        response = self.client.post(url + 'complete/')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(UploadSession.objects.get().completed)
+
+    def test_empty_uploads_are_refused(self):
+        response = self.client.post(self.url, {
+            'filename': 'empty.txt', 'size': 0, 'sha256': hashlib.sha256(b'').hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('size', response.data)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_ranges(self):
+        event = Event.objects.create(
+            title='Drive', description='-', date_time=datetime(2024, 4, 1, tzinfo=timezone.utc),
+            attachment=default_storage.save('attachments/range.txt', ContentFile(self.content)),
+        )
+        url = f'/api/v1/waste-management/events/{event.pk}/attachment/'
+
+        def get(header):
+            response = self.client.get(url, headers={'Range': header} if header else {})
+            return response.status_code, response.get('Content-Range'), b''.join(response.streaming_content)
+
+        self.assertEqual(get(None), (200, None, self.content))
+        self.assertEqual(get('bytes=2-5'), (206, 'bytes 2-5/16', b'2345'))
+        self.assertEqual(get('bytes=10-'), (206, 'bytes 10-15/16', b'abcdef'))
+        self.assertEqual(get('bytes=-3'), (206, 'bytes 13-15/16', b'def'))
+        self.assertEqual(get('bytes=16-20'), (416, 'bytes */16', b''))
+
+    def test_cleanup_of_abandoned_uploads(self):
+        old = UploadSession.objects.get(pk=self.start()[len(self.url):-1])
+        self.send(f'{self.url}{old.pk}/', 0, 5)
+        UploadSession.objects.filter(pk=old.pk).update(created_at=datetime.now(timezone.utc) - timedelta(days=2))
+        fresh = UploadSession.objects.exclude(pk=old.pk).get(pk=self.start()[len(self.url):-1])
+        orphan = os.path.join(MEDIA_ROOT, 'uploads', 'orphan.part')
+        with open(orphan, 'wb') as target:
+            target.write(b'0')
+        two_days_ago = time.time() - 2 * 86400
+        os.utime(orphan, (two_days_ago, two_days_ago))
+
+        out = StringIO()
+        call_command('cleanup_uploads', stdout=out)
+        self.assertEqual(json.loads(out.getvalue()), {'sessions': 1, 'orphaned_files': 1})
+        self.assertEqual(list(UploadSession.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertFalse(os.path.exists(temp_path(old)) or os.path.exists(orphan))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DerivativeWorkerTests(TestCase):
+    """
+    A file posted to events is queued, and the worker writes its derivatives and
+    records their sizes.
+    """
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=1, offices=1)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['divisional'])[0].key)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def post_event(self, name, content):
+        response = self.client.post('/api/v1/waste-management/events/', {
+            'title': 'Drive', 'description': '-', 'date_time': '2024-04-01T00:00:00Z', 'attachment': ContentFile(content, name=name),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        job = DerivativeJob.objects.get()
+        self.assertEqual((job.model, job.object_id, job.status), ('event', response.data['id'], DerivativeJob.PENDING))
+        return Event.objects.get(pk=response.data['id'])
+
+    def run_worker(self):
+        self.assertEqual(run_pending(), 1)
+        job = DerivativeJob.objects.get()
+        self.assertEqual((job.status, job.attempts, job.worker, job.error), (DerivativeJob.DONE, 1, '', ''))
+        self.assertEqual(run_pending(), 0)
+
+    def test_compressed_copy(self):
+        content = b'Cleanliness drive at the head post office.\n' * 100
+        event = self.post_event('minutes.txt', content)
+        self.run_worker()
+
+        event.refresh_from_db()
+        self.assertFalse(event.attachment_thumbnail)
+        self.assertEqual(event.attachment_compressed_size, event.attachment_compressed.size)
+        self.assertLess(event.attachment_compressed_size, len(content))
+        with event.attachment_compressed.open('rb') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), content)
+
+    @skipIf(Image is None, 'Pillow is not installed')
+    def test_image_derivatives(self):
+        buffer = BytesIO()
+        Image.new('RGB', (2000, 1000), 'green').save(buffer, 'PNG')
+        event = self.post_event('drive.png', buffer.getvalue())
+        self.run_worker()
+
+        event.refresh_from_db()
+        self.assertEqual(event.attachment_thumbnail_size, event.attachment_thumbnail.size)
+        with event.attachment_thumbnail.open('rb') as thumbnail, Image.open(thumbnail) as image:
+            self.assertEqual(image.size, (320, 160))
+
+    @skipUnless(Image is None, 'Pillow is installed')
+    def test_images_without_pillow_are_logged(self):
+        event = self.post_event('drive.png', b'0' * 100)
+        with self.assertLogs('waste_management.derivatives', 'WARNING'):
+            self.run_worker()
+        event.refresh_from_db()
+        self.assertFalse(event.attachment_thumbnail or event.attachment_compressed)
+
+
+class PaperLedgerRouteTests(TestCase):
+    """
+    The generic create and update routes keep the paper ledger, and refuse sales
+    beyond the stock, like add-data.
+    """
+    base = '/api/v1/waste-management/'
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=1, offices=1)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['sub_divisional'])[0].key)
+        self.paper = self.create('paperwaste', weight=5)
+
+    def create(self, basename, **fields):
+        response = self.client.post(f'{self.base}{basename}/', {'pincode': '101001', 'date': '2024-04-01', **fields}, format='json')
+        return response.json()['id'] if response.status_code == 201 else response
+
+    def sell(self, weight):
+        return self.create('selledpaperwaste', total_weight=weight, selling_price_per_unit=2, total_price=2 * weight)
+
+    def balance(self):
+        return PaperInventory.objects.get(pincode_id='101001').balance
+
+    def test_oversell_is_rejected(self):
+        sale = self.sell(3)
+        self.assertEqual(self.balance(), 2.0)
+
+        response = self.sell(3)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['available'], 2.0)
+        response = self.client.patch(f'{self.base}selledpaperwaste/{sale}/', {'total_weight': 6}, format='json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.patch(f'{self.base}paperwaste/{self.paper}/', {'weight': 2}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(SelledPaperWaste.objects.get().total_weight, 3.0)
+        self.assertEqual(PaperWaste.objects.get().weight, 5.0)
+        self.assertEqual(self.balance(), 2.0)
+
+        # Edits are checked on the result: selling 5 of the 5 kg is fine
+        response = self.client.patch(f'{self.base}selledpaperwaste/{sale}/', {'total_weight': 5}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.balance(), 0.0)
+        self.assertEqual(reconcile_inventory(), [])
+
+    def test_delete_of_sold_paper_is_rejected(self):
+        sale = self.sell(4)
+        for path in (f'paperwaste/{self.paper}/', f'paperwaste/{self.paper}/delete-data/'):
+            response = self.client.delete(self.base + path)
+            self.assertEqual(response.status_code, 409, path)
+        self.assertTrue(PaperWaste.objects.exists())
+        self.assertFalse(Tombstone.objects.exists())
+
+        self.assertEqual(self.client.delete(f'{self.base}selledpaperwaste/{sale}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'{self.base}paperwaste/{self.paper}/').status_code, 204)
+        self.assertEqual(self.balance(), 0.0)
+        self.assertEqual(DailyWasteRollup.objects.filter(record_count__gt=0).count(), 0)
+        self.assertEqual(Tombstone.objects.count(), 2)
+        self.assertEqual(reconcile_inventory(), [])
+
+    def test_reconcile_detects_drift(self):
+        self.sell(1)
+        self.assertEqual(reconcile_inventory(), [])
+        # A write behind the ledger's back
+        PaperWaste.objects.filter(pk=self.paper).update(weight=7)
+
+        drift = reconcile_inventory()
+        self.assertEqual([(row['pincode'], row['ledger_balance'], row['expected_balance']) for row in drift], [('101001', 4.0, 6.0)])
+        self.assertEqual(self.balance(), 4.0)
+        self.assertEqual(reconcile_inventory(fix=True), drift)
+        self.assertEqual(self.balance(), 6.0)
+        self.assertEqual(reconcile_inventory(), [])
+
+
+class ArchiveTests(TestCase):
+    """
+    Rows of the financial years before April 2023 are archived; the analytics and
+    exports must not change.
+    """
+
+    def setUp(self):
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=1, offices=2)
+        rows = []
+        for number, pincode in enumerate(self.seed.pincodes[1:]):
+            for i in range(40):
+                when = datetime(2021, 6, 1, 12, tzinfo=timezone.utc) + timedelta(days=29 * i + number)
+                rows.append(Ewaste(pincode_id=pincode, no_of_units=i % 7 + 1, date_time=when, name='Monitor'))
+                rows.append(PaperWaste(pincode_id=pincode, weight=10 + i % 5, date=when.date()))
+                rows.append(SelledPaperWaste(pincode_id=pincode, total_weight=2, selling_price_per_unit=i % 3 + 1, total_price=2 * (i % 3 + 1), date=when.date()))
+        for model in (Ewaste, PaperWaste, SelledPaperWaste):
+            model.objects.bulk_create([row for row in rows if type(row) is model])
+        rebuild_rollups()
+        rebuild_inventory()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['divisional'])[0].key)
+        cache.clear()
+
+    def read_everything(self, params=None):
+        cache.clear()
+        results = {}
+        for basename, metrics in (
+            ('ewaste', 'total_units,count,min_units,max_units'),
+            ('paperwaste', 'total_weight,count,min_weight,max_weight'),
+            ('selledpaperwaste', 'total_price,min_price_per_unit,max_price_per_unit,avg_price_per_unit'),
+        ):
+            url = f'/api/v1/waste-management/{basename}/analytics/'
+            query = {'metrics': metrics, 'page_size': 7, **(params or {})}
+            pages = [self.client.get(url, query).json()]
+            while pages[-1]['next_cursor']:
+                pages.append(self.client.get(url, {**query, 'cursor': pages[-1]['next_cursor']}).json())
+            export = self.client.get(f'/api/v1/waste-management/{basename}/export/', {'type': 'ndjson', **(params or {})})
+            results[basename] = {
+                'rows': [row for page in pages for row in page['data']],
+                'metrics': {key: value for key, value in pages[0].items() if key not in ('data', 'next_cursor')},
+                'export': b''.join(export.streaming_content),
+            }
+        return results
+
+    def test_archived_rows_are_still_read(self):
+        before = self.read_everything()
+        recent = self.read_everything({'from': '2023-04-01'})
+        summary = list(summary_queryset(DailyWasteRollup.objects.all(), {'weight': 'weight'}, 'month'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = archive_before(2023, batch_size=25)
+
+        self.assertEqual(sorted(moved['PaperWaste']), [2021, 2022])
+        self.assertFalse(PaperWaste.objects.filter(date__lt=date(2023, 4, 1)).exists())
+        self.assertEqual(PaperWasteArchive.objects.count(), sum(moved['PaperWaste'].values()))
+        self.assertEqual(archive_boundary(), date(2023, 4, 1))
+        year = ArchivedYear.objects.get(kind=DailyWasteRollup.PAPER, year=2022)
+        self.assertEqual(year.weight, PaperWasteArchive.objects.filter(year=2022).aggregate(Sum('weight'))['weight__sum'])
+
+        self.assertEqual(self.read_everything(), before)
+        self.assertEqual(list(summary_queryset(DailyWasteRollup.objects.all(), {'weight': 'weight'}, 'month')), summary)
+        self.assertEqual(reconcile_inventory(), [])
+        self.assertEqual(rebuild_rollups(), DailyWasteRollup.objects.count())
+        self.assertEqual(list(summary_queryset(DailyWasteRollup.objects.all(), {'weight': 'weight'}, 'month')), summary)
+
+        # Ranges after the boundary never read the archive tables, only the cached boundary
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.read_everything({'from': '2023-04-01'}), recent)
+        self.assertFalse([query for query in queries if 'wastearchive' in query['sql']])
+
+    def test_boundary_from_another_process_is_picked_up(self):
+        cache.clear()
+        self.assertIsNone(archive_boundary())
+        # The archiving command ran in its own process: this process's cache was not cleared
+        ArchivedYear.objects.create(kind=DailyWasteRollup.PAPER, year=2022)
+        self.assertIsNone(archive_boundary())
+        with patch('time.time', return_value=time.time() + archive_option('BOUNDARY_CACHE_SECONDS') + 1):
+            self.assertEqual(archive_boundary(), date(2023, 4, 1))
+
+
+class CleaningStaffListingTests(TestCase):
+    """
+    Officers only see the cleaning staff of their own offices.
+    """
+    url = '/api/v1/waste-management/cleaning-staff/'
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=2, sub_divisions=2, offices=2)
+        CleaningStaff.objects.bulk_create(
+            CleaningStaff(pincode_id=pincode, name=name, contactNo=f'98{i:03d}{pincode}')
+            for pincode in self.seed.pincodes for i, name in enumerate(('Ramesh', 'rani', 'Suresh'))
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users['sub_divisional'])[0].key)
+
+    def listing(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_listing_is_scoped_and_paginated(self):
+        scope = {'101000', '101001', '101002'}
+        rows, cursor = [], None
+        while True:
+            page = self.listing(page_size=4, **({'cursor': cursor} if cursor else {}))
+            rows.extend(page['results'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(rows), 9)
+        self.assertEqual({row['pincode'] for row in rows}, scope)
+
+        other = CleaningStaff.objects.filter(pincode_id='102001').first()
+        self.assertEqual(self.client.get(f'{self.url}{other.id}/').status_code, 404)
+
+    def test_search_and_pincode_filter(self):
+        names = [row['name'] for row in self.listing(search='RA')['results']]
+        self.assertEqual(sorted(names), ['Ramesh'] * 3 + ['rani'] * 3)
+        self.assertEqual(len(self.listing(search='98001')['results']), 3)
+        self.assertEqual(len(self.listing(search='ram', pincode='101001')['results']), 1)
+        self.assertEqual(self.client.get(self.url, {'pincode': '102001'}).status_code, 400)
+
+    def test_staff_cannot_be_added_outside_the_scope(self):
+        response = self.client.post(self.url, {'pincode': '102001', 'name': 'Staff', 'contactNo': '0'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(SYNC={'SETTLE_SECONDS': 0})
+class SyncTests(TestCase):
+    """
+    A field client syncs the sub-division's records, then only what changed since.
+    """
+    url = '/api/v1/waste-management/sync/'
+
+    def setUp(self):
+        invalidate_all_scopes()
+        token_cache.clear()
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=2, offices=2)
+        seed_records(self.seed.pincodes, 3)
+        self.client = self.client_for('sub_divisional')
+        self.scope = ['101000', '101001', '101002']
+
+    def client_for(self, role):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get_or_create(user=self.seed.users[role])[0].key)
+        return client
+
+    def sync(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_full_sync_then_changes(self):
+        full = self.sync()
+        self.assertEqual(full['message'], 'Full sync')
+        self.assertFalse(full['has_more'])
+        self.assertEqual({row['pincode'] for row in full['changes']['paperwaste']}, set(self.scope))
+        self.assertEqual(len(full['changes']['ewaste']), 9)
+        self.assertEqual(full['deleted'], {})
+
+        self.assertEqual(self.sync(token=full['next_token'])['changes']['paperwaste'], [])
+
+        paper = PaperWaste.objects.filter(pincode_id='101001').first()
+        paper.weight = 99
+        paper.save()
+        PaperWaste.objects.create(pincode_id='102001', weight=1, date=date(2024, 4, 1))  # another sub-division
+        staff = CleaningStaff.objects.filter(pincode_id='101001').first()
+        self.assertEqual(self.client.delete(f'/api/v1/waste-management/cleaning-staff/{staff.id}/').status_code, 204)
+        ewaste = Ewaste.objects.filter(pincode_id='101001').first()
+        self.assertEqual(self.client.delete(f'/api/v1/waste-management/ewaste/{ewaste.id}/').status_code, 204)
+        self.assertEqual(self.client_for('divisional').delete('/api/v1/post/postoffice/101002/').status_code, 204)
+
+        delta = self.sync(token=full['next_token'])
+        self.assertEqual(delta['message'], 'Changes since token')
+        self.assertEqual([(row['id'], row['weight']) for row in delta['changes']['paperwaste']], [(paper.id, 99)])
+        self.assertEqual(delta['deleted'], {
+            'cleaningstaff': [str(staff.id)], 'ewaste': [str(ewaste.id)], 'postoffice': ['101002'],
+        })
+        self.assertEqual(self.sync(token=delta['next_token'])['deleted'], {})
+
+    def test_pages_of_changes(self):
+        seen, token, calls = [], None, 0
+        while True:
+            page = self.sync(limit=4, **({'token': token} if token else {}))
+            seen.extend(row['id'] for row in page['changes']['cleaningstaff'])
+            token, calls = page['next_token'], calls + 1
+            if not page['has_more']:
+                break
+        self.assertGreater(calls, 1)
+        self.assertEqual(sorted(seen), sorted(CleaningStaff.objects.filter(pincode_id__in=self.scope).values_list('id', flat=True)))
+
+    def test_rows_sharing_a_timestamp_are_not_split(self):
+        moment = datetime.now(timezone.utc) - timedelta(hours=1)
+        PaperWaste.objects.filter(pincode_id__in=self.scope).update(updated_at=moment)
+        page = self.sync(limit=2, token=encode_token(moment))
+        self.assertEqual(len(page['changes']['paperwaste']), 9)
+        self.assertTrue(page['has_more'])
+
+    def test_bad_tokens(self):
+        self.assertEqual(self.client.get(self.url, {'token': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 'many'}).status_code, 400)
+        expired = encode_token(datetime.now(timezone.utc) - timedelta(days=91))
+        self.assertEqual(self.client.get(self.url, {'token': expired}).status_code, 410)
+
+    def test_prune_keeps_recent_tombstones(self):
+        record_deletion(*CleaningStaff.objects.filter(pincode_id='101001'))
+        Tombstone.objects.filter(object_id=str(CleaningStaff.objects.filter(pincode_id='101001').first().id)).update(
+            deleted_at=datetime.now(timezone.utc) - timedelta(days=91),
+        )
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertEqual(Tombstone.objects.count(), 2)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite production mode')
+class InstrumentationTests(TestCase):
+    url = '/api/v1/post/postoffice/'
+    route = 'api/v1/post/postoffice/'
+
+    def setUp(self):
+        seed = seed_hierarchy(divisions=1, sub_divisions=1, offices=1)
+        instrumentation.buffer.clear()
+        self.token = Token.objects.get_or_create(user=seed.users['divisional'])[0].key
+
+    def get(self):
+        # Cold caches, so every request runs the same queries
+        cache.clear()
+        token_cache.clear()
+        invalidate_all_scopes()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        return client.get(self.url)
+
+    def test_requests_are_recorded_with_a_server_timing_header(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="(\d+) queries", render;dur=[\d.]+, total;dur=[\d.]+$')
+        [record] = instrumentation.buffer.snapshot()
+        self.assertEqual((record['method'], record['route'], record['status']), ('GET', self.route, 200))
+        self.assertEqual(record['queries'], int(re.search(r'"(\d+) queries"', response['Server-Timing']).group(1)))
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(record['size'], len(response.content))
+
+    @override_settings(INSTRUMENTATION={'SERVER_TIMING': False})
+    def test_server_timing_can_be_turned_off(self):
+        self.assertNotIn('Server-Timing', self.get())
+        self.assertEqual(len(instrumentation.buffer.snapshot()), 1)
+
+    def test_ring_buffer_drops_the_oldest_records(self):
+        records = instrumentation.RingBuffer(2)
+        for number in range(3):
+            records.append({'number': number})
+        self.assertEqual(records.snapshot(), [{'number': 1}, {'number': 2}])
+
+    def test_query_budget_is_enforced(self):
+        with override_settings(INSTRUMENTATION={'QUERY_BUDGETS': {f'GET {self.route}': 1}, 'BUDGET_ACTION': 'raise'}):
+            with self.assertRaises(instrumentation.QueryBudgetExceeded):
+                self.get()
+        with override_settings(INSTRUMENTATION={'QUERY_BUDGETS': {self.route: 1}}):
+            with self.assertLogs('backend.instrumentation', 'WARNING') as logs:
+                self.assertEqual(self.get().status_code, 200)
+        self.assertIn(f'GET {self.route} ran', logs.output[0])
+        with override_settings(INSTRUMENTATION={'QUERY_BUDGETS': {f'GET {self.route}': 100}, 'BUDGET_ACTION': 'raise'}):
+            self.assertEqual(self.get().status_code, 200)
+
+    @override_settings(INSTRUMENTATION={'ENABLED': False})
+    def test_disabled_middleware_passes_requests_through(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(instrumentation.buffer.snapshot(), [])
+
+
+class SQLiteTuningTests(TestCase):
+
+    def test_new_connections_get_the_production_pragmas(self):
+        values = pragma_values(connection)
+        self.assertEqual(values['synchronous'], 1)  # NORMAL
+        self.assertEqual(values['busy_timeout'], 5000)
+        self.assertEqual(values['temp_store'], 2)  # MEMORY
+        # The in-memory test database reports "memory"; file databases switch to WAL
+        self.assertIn(values['journal_mode'], ('wal', 'memory'))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The replica is a copy of the SQLite test database')
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The replica is a snapshot of the test database in a local SQLite file; rows
+    written after the snapshot exist on the primary only.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Added here, not in the class body: the test runner would try to create a test database for it
+        cls.databases = {'default', REPLICA_ALIAS}
+        cls.directory = tempfile.mkdtemp()
+        cls.replica = os.path.join(cls.directory, 'replica.sqlite3')
+        connections.settings[REPLICA_ALIAS] = connections.configure_settings({
+            'default': connections.settings['default'],
+            REPLICA_ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': cls.replica},
+        })[REPLICA_ALIAS]
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_ALIAS].close()
+        del connections[REPLICA_ALIAS]
+        del connections.settings[REPLICA_ALIAS]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        self.seed = seed_hierarchy(divisions=1, sub_divisions=1, offices=1)
+        seed_records(self.seed.pincodes, 2)
+        connections[REPLICA_ALIAS].close()
+        connection.ensure_connection()
+        with closing(sqlite3.connect(self.replica)) as target:
+            connection.connection.backup(target)
+        # Only on the primary
+        add_to_rollup(PaperWaste.objects.create(pincode_id='101001', weight=1000))
+        invalidate_all_scopes()
+        token_cache.clear()
+        cache.clear()
+
+    def client_for(self, role):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get(user=self.seed.users[role]).key)
+        return client
+
+    def test_analytics_read_the_replica(self):
+        with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica_queries:
+            response = self.client_for('divisional').get('/api/v1/waste-management/paperwaste/analytics/', {'metrics': 'total_weight'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica_queries)
+        # The replica does not have the 1000 kg row yet
+        replica_total = PaperWaste.objects.using(REPLICA_ALIAS).aggregate(total=Sum('weight'))['total']
+        self.assertEqual(response.data['total_weight'], replica_total)
+        self.assertNotEqual(PaperWaste.objects.aggregate(total=Sum('weight'))['total'], replica_total)
+
+    def test_writes_and_other_reads_use_the_primary(self):
+        with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica_queries:
+            response = self.client_for('sub_divisional').post(
+                '/api/v1/waste-management/paperwaste/add-data/', {'pincode': '101001', 'weight': 5, 'date': '2024-04-01'}, format='json',
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(PaperWaste.objects.filter(weight=1000).count(), 1)
+        self.assertEqual(len(replica_queries), 0)
+        self.assertFalse(PaperWaste.objects.using(REPLICA_ALIAS).filter(pk=response.data['id']).exists())
+
+    def test_without_a_replica_reads_use_the_primary(self):
+        route = read_replica(lambda: PrimaryReplicaRouter().db_for_read(PaperWaste))
+        self.assertEqual(route(), REPLICA_ALIAS)
+        replica = connections.settings.pop(REPLICA_ALIAS)
+        try:
+            self.assertIsNone(route())
+        finally:
+            connections.settings[REPLICA_ALIAS] = replica
@@ -0,0 +1,212 @@
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from waste_management.models import UploadSession
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def temp_path(session):
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', f'{session.id}.part')
+
+
+def parse_content_range(header, session):
+    """
+    Parse a `Content-Range: bytes start-end/total` header for the next chunk of `session`.
+    Returns (start, length).
+    """
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise UploadError('Content-Range header must be "bytes start-end/total"', 400)
+    start, end, total = (int(value) for value in match.groups())
+    if total != session.size or end < start or end >= total:
+        raise UploadError('Content-Range does not match the upload size', 416)
+    if start != session.received:
+        # The client lost track of the offset; it should resume from session.received
+        raise UploadError('Chunk does not start at the current upload offset', 409)
+    length = end - start + 1
+    if length > settings.UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError('Chunk is larger than UPLOAD_MAX_CHUNK_SIZE', 413)
+    return start, length
+
+
+def receive_chunk(session, stream, length):
+    """
+    Stream `length` bytes from the request body into a staging file next to the
+    temporary file, outside any transaction. Returns the staging file's path.
+    """
+    directory = os.path.dirname(temp_path(session))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(prefix=f'{session.id}.', suffix='.chunk', dir=directory)
+    written = 0
+    try:
+        with os.fdopen(descriptor, 'wb') as target:
+            while written < length:
+                data = stream.read(min(COPY_CHUNK_SIZE, length - written))
+                if not data:
+                    break
+                target.write(data)
+                written += len(data)
+        if written != length:
+            raise UploadError('Request body is shorter than the Content-Range', 400)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+@transaction.atomic
+def append_chunk(session, chunk, start, length):
+    """
+    Append a staged chunk to the temporary file if the upload is still at offset
+    `start`. The write lock is only held while the staged bytes are copied.
+    """
+    try:
+        # A concurrent request that appended first has moved the offset on
+        if not UploadSession.objects.filter(pk=session.pk, received=start, completed=False).update(received=start + length):
+            session.refresh_from_db(fields=['received', 'completed'])
+            raise UploadError('Chunk does not start at the current upload offset', 409)
+        with open(temp_path(session), 'ab') as target, open(chunk, 'rb') as source:
+            # Drop any bytes past the acknowledged offset left by an interrupted chunk
+            target.truncate(start)
+            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+        session.received = start + length
+    finally:
+        os.remove(chunk)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for data in iter(lambda: source.read(COPY_CHUNK_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def complete(session):
+    """
+    Verify that all bytes arrived and that the checksum matches.
+    """
+    if session.received != session.size:
+        raise UploadError('Upload is not complete yet', 409)
+    if file_sha256(temp_path(session)) != session.sha256.lower():
+        raise UploadError('Checksum mismatch', 422)
+    session.completed = True
+    session.save(update_fields=['completed'])
+
+
+def attach(session, field_file):
+    """
+    Move a completed upload into the storage of a FileField, then drop the session.
+    """
+    path = temp_path(session)
+    with open(path, 'rb') as source:
+        field_file.save(session.filename, File(source), save=False)
+    os.remove(path)
+    session.delete()
+
+
+def discard(session):
+    path = temp_path(session)
+    if os.path.exists(path):
+        os.remove(path)
+    session.delete()
+
+
+def cleanup_abandoned(hours=None):
+    """
+    Discard the sessions created more than `hours` ago (default UPLOAD_ABANDON_HOURS),
+    and the .part files that no session owns and staged .chunk files that were not
+    written to since.
+    Returns (sessions deleted, orphaned files deleted).
+    """
+    hours = settings.UPLOAD_ABANDON_HOURS if hours is None else hours
+    sessions = 0
+    for session in UploadSession.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours)).iterator():
+        discard(session)
+        sessions += 1
+
+    files = 0
+    directory = os.path.join(settings.MEDIA_ROOT, 'uploads')
+    if os.path.isdir(directory):
+        live = {f'{pk}.part' for pk in UploadSession.objects.values_list('id', flat=True)}
+        cutoff = time.time() - hours * 3600
+        for entry in os.scandir(directory):
+            orphaned = entry.name.endswith('.chunk') or entry.name.endswith('.part') and entry.name not in live
+            if orphaned and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                files += 1
+    return sessions, files
+
+
+def ranged_file_response(request, field_file):
+    """
+    Serve a stored file, honouring a single `Range: bytes=...` request header.
+    """
+    size = field_file.size
+    start, end, status = 0, size - 1, 200
+    header = request.headers.get('Range')
+    if header:
+        match = RANGE_RE.match(header.strip())
+        if not match or match.groups() == ('', ''):
+            return _unsatisfiable(size)
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+        if start > end or start >= size:
+            return _unsatisfiable(size)
+        status = 206
+
+    def chunks():
+        with field_file.open('rb') as source:
+            source.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = source.read(min(COPY_CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    content_type, encoding = mimetypes.guess_type(field_file.name)
+    if content_type is None or encoding is not None:
+        # e.g. report.pdf.gz is served as the gzip file itself, not as a PDF
+        content_type = 'application/octet-stream'
+    response = StreamingHttpResponse(chunks(), status=status, content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(field_file.name)}"'
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def _unsatisfiable(size):
+    response = StreamingHttpResponse([], status=416)
+    response['Content-Range'] = f'bytes */{size}'
+    return response
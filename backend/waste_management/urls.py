@@ -2,6 +2,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from waste_management.views import EwasteViewSet, PaperWasteViewSet, SelledPaperWasteViewSet,CleaningStaffViewSet
+from waste_management.views import UploadViewSet, EventViewSet, EventReportViewSet, DashboardView, SyncView
+from waste_management.async_views import AsyncWasteAnalyticsView
 
 # Create a router and register the viewsets
 router = DefaultRouter()
@@ -9,8 +11,23 @@ router.register(r'ewaste', EwasteViewSet, basename='ewaste')
 router.register(r'paperwaste', PaperWasteViewSet, basename='paperwaste')
 router.register(r'selledpaperwaste', SelledPaperWasteViewSet, basename='selledpaperwaste')
 router.register(r'cleaning-staff', CleaningStaffViewSet, basename='cleaning_staff')
+router.register(r'uploads', UploadViewSet, basename='uploads')
+router.register(r'events', EventViewSet, basename='events')
+router.register(r'event-reports', EventReportViewSet, basename='event_reports')
 
 # The router will automatically create the URL patterns
+# Async (ASGI) versions of the analytics actions, same responses as the router routes
+async_analytics = [
+    ('ewaste', EwasteViewSet),
+    ('paperwaste', PaperWasteViewSet),
+    ('selledpaperwaste', SelledPaperWasteViewSet),
+]
+
 urlpatterns = [
+    path(f'async/{basename}/analytics/', AsyncWasteAnalyticsView.as_view(viewset_class=viewset, basename=basename), name=f'{basename}-async-analytics')
+    for basename, viewset in async_analytics
+] + [
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('sync/', SyncView.as_view(), name='sync'),
     path('', include(router.urls)),  # Include the automatically generated URLs
 ]
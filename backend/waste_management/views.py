@@ -1,108 +1,370 @@
 from django.shortcuts import render
-from waste_management.models import Ewaste,PaperWaste,SelledPaperWaste,CleaningStaff
+from waste_management.models import Ewaste,PaperWaste,SelledPaperWaste,CleaningStaff,DailyWasteRollup,Event,EventReport,UploadSession,PaperInventory
 from waste_management.serializers import EwasteSerializer,PaperWasteSerializer,SelledPaperWasteSerializer,CleaningStaffSerializer
+from waste_management.serializers import EwasteBulkSerializer,PaperWasteBulkSerializer,SelledPaperWasteBulkSerializer
+from waste_management.serializers import EventSerializer,EventReportSerializer,UploadSessionSerializer
+from waste_management import uploads
+from waste_management.derivatives import delete_derivatives
+from waste_management.parsers import InvalidLine, NDJSONParser
+from rest_framework.parsers import JSONParser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+import copy
+import csv
+import heapq
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from post_office.models import PostOffice
+from users.api.permissions import HasOfficeScope
+from users.scope import get_scope
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models.functions import Lower
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from waste_management.analytics import SummaryParamsError, parse_summary_params, summarize, parse_metrics, compute_metrics
+from waste_management.analytics import date_filters, parse_date_range
+from waste_management.archive import archived_rows
+from waste_management.sync import SyncTokenError, SyncTokenExpired, changes, decode_token, record_deletion
+from waste_management.analytics import EWASTE_METRICS, PAPER_WASTE_METRICS, SELLED_PAPER_WASTE_METRICS, dashboard
+from waste_management.rollups import add_to_rollup, remove_from_rollup, rollup_queryset
+from waste_management.inventory import InsufficientStock, add_to_inventory, remove_from_inventory, replace_in_inventory, stock_shortfalls
+from waste_management.response_cache import cache_response
+from backend.database import read_database, read_replica
+from users.api.pagination import KeysetPagination, requested_fields
 # Create your views here.
 
-'''***************** EWaste ************************'''
-class EwasteViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated ]
 
-    @action(detail=False, methods=['post'], url_path='add-data', permission_classes=[IsAuthenticated])
+class WasteAnalyticsMixin:
+    """
+    Shared analytics helpers for the waste viewsets: keyset paginated data pages
+    and an `analytics/summary` action that returns time bucketed totals
+    computed in the database instead of the serialized rows.
+    """
+    pagination_class = KeysetPagination
+    keyset_ordering = ('date', 'id')
+    date_lookup = 'date'
+    rollup_kind = None
+    summary_metrics = {}
+    analytics_metrics = {}
+    default_metrics = ()
+
+    def page_data(self, queryset, archive=None):
+        """
+        Serialize one keyset page of the queryset, and of its archived rows if given,
+        projected to the `fields=` columns. Returns the page data and the cursor of the next page.
+        """
+        if archive is None:
+            page = self.paginate_queryset(queryset)
+        else:
+            page = self.paginator.paginate_querysets([archive, queryset], self.request, view=self)
+        serializer = self.get_serializer_class()(page, many=True, fields=requested_fields(self.request))
+        return serializer.data, self.paginator.next_cursor
+
+    @action(detail=False, methods=['get'], url_path='analytics', permission_classes=[IsAuthenticated, HasOfficeScope])
+    @read_replica
+    @cache_response('analytics')
+    def get(self, request, *args, **kwargs):
+        scope = get_scope(request)
+
+        try:
+            metrics = parse_metrics(request.query_params, self.analytics_metrics, self.default_metrics)
+            date_from, date_to = parse_date_range(request.query_params)
+        except SummaryParamsError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One scoped queryset for the data page, one aggregate query for all metrics;
+        # archived rows are read too only when the range starts before the archive boundary
+        in_range = date_filters(self.date_lookup, date_from, date_to)
+        queryset = self.get_queryset().filter(**in_range)
+        archive = archived_rows(queryset.model, date_from)
+        if archive is not None:
+            archive = archive.filter(pincode__in=scope.pincodes, **in_range)
+        data, next_cursor = self.page_data(queryset, archive)
+        rollups = rollup_queryset(self.rollup_kind, scope.pincodes).filter(**date_filters('date', date_from, date_to))
+        totals = compute_metrics(metrics, self.analytics_metrics, rollups, queryset, archive)
+
+        message = 'Divisional office analytics' if scope.is_divisional else 'Sub-divisional office analytics'
+        return Response({'data': data, 'next_cursor': next_cursor, **totals, 'message': message})
+
+    @action(detail=False, methods=['get'], url_path='analytics/summary', permission_classes=[IsAuthenticated, HasOfficeScope])
+    @read_replica
+    @cache_response('analytics-summary')
+    def summary(self, request, *args, **kwargs):
+        post_offices = get_scope(request).pincodes
+
+        try:
+            params = parse_summary_params(request.query_params)
+        except SummaryParamsError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = rollup_queryset(self.rollup_kind, post_offices)
+        buckets = summarize(queryset, self.summary_metrics, **params)
+        return Response({'granularity': params['granularity'], 'buckets': buckets, 'message': 'Analytics summary'})
+
+
+class BulkIngestMixin:
+    """
+    Adds a `bulk-add` action that takes a JSON array or an NDJSON body of rows,
+    checks every pincode against the user's scope in one pass and inserts the
+    valid rows with bulk_create in a single transaction.
+    """
+    bulk_serializer_class = None
+    bulk_batch_size = 500
+    bulk_max_rows = 10000
+    # Whether rows also move the paper inventory ledger
+    tracks_inventory = False
+
+    def reject_bulk_rows(self, instances):
+        """
+        Hook for viewsets that refuse some valid rows: returns {position in instances: errors}.
+        """
+        return {}
+
+    @action(detail=False, methods=['post'], url_path='bulk-add', permission_classes=[IsAuthenticated, HasOfficeScope],
+            parser_classes=[JSONParser, NDJSONParser])
+    def bulk_add(self, request, *args, **kwargs):
+        scope = get_scope(request)
+
+        # Only sub-divisional officers can add data
+        if not scope.is_sub_divisional:
+            return Response({'message': 'Only sub-divisional officers can add data'}, status=403)
+
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'message': 'Expected a JSON array or NDJSON rows'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.bulk_max_rows:
+            return Response({'message': f'At most {self.bulk_max_rows} rows per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        instances, row_numbers, errors = [], [], []
+        for index, row in enumerate(rows):
+            if isinstance(row, InvalidLine):
+                errors.append({'row': index, 'errors': {'non_field_errors': [str(row)]}})
+                continue
+            if not isinstance(row, dict):
+                errors.append({'row': index, 'errors': {'non_field_errors': ['Expected an object']}})
+                continue
+            serializer = self.bulk_serializer_class(data=row)
+            if not serializer.is_valid():
+                errors.append({'row': index, 'errors': serializer.errors})
+                continue
+            data = dict(serializer.validated_data)
+            pincode = data.pop('pincode')
+            if pincode not in scope.pincodes:
+                errors.append({'row': index, 'errors': {'pincode': ['Invalid pincode for this sub-divisional office']}})
+                continue
+            instances.append(model(pincode_id=pincode, **data))
+            row_numbers.append(index)
+
+        rejected = self.reject_bulk_rows(instances)
+        if rejected:
+            errors.extend({'row': row_numbers[position], 'errors': rejected[position]} for position in rejected)
+            errors.sort(key=lambda error: error['row'])
+            instances = [instance for position, instance in enumerate(instances) if position not in rejected]
+
+        # Insert the valid rows, their rollups and the inventory together
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(instances, batch_size=self.bulk_batch_size)
+                add_to_rollup(*instances)
+                if self.tracks_inventory:
+                    add_to_inventory(*instances)
+        except InsufficientStock as e:
+            # Stock changed since the rows were checked; nothing was written
+            return Response({'message': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        return Response(
+            {'created': len(instances), 'errors': errors, 'message': 'Bulk data added'},
+            status=status.HTTP_201_CREATED if instances else status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class ScopedRecordMixin:
+    """
+    Limits the generic list, retrieve, create, update and destroy routes to the
+    offices of the user's scope and keeps the daily rollup, and the paper ledger
+    when `tracks_inventory` is set, in step with their writes, as add-data and
+    delete-data do. Deletions also leave the tombstone offline clients sync (see
+    waste_management.sync).
+    """
+    tracks_inventory = False
+
+    def handle_exception(self, exc):
+        if isinstance(exc, InsufficientStock):
+            return Response({'message': str(exc), 'available': exc.available}, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+
+    def get_queryset(self):
+        return self.queryset.model.objects.filter(pincode__in=get_scope(self.request).pincodes)
+
+    def check_pincode(self, serializer):
+        scope = get_scope(self.request)
+        if not scope.is_sub_divisional:
+            raise PermissionDenied('Only sub-divisional officers can add data')
+        pincode = serializer.validated_data.get('pincode')
+        if pincode is not None and pincode.pk not in scope.pincodes:
+            raise PermissionDenied('Invalid pincode for this sub-divisional office')
+
+    def perform_create(self, serializer):
+        self.check_pincode(serializer)
+        # A sale beyond the stock raises InsufficientStock and rolls the row back
+        with transaction.atomic():
+            instance = serializer.save()
+            add_to_rollup(instance)
+            if self.tracks_inventory:
+                add_to_inventory(instance)
+
+    def perform_update(self, serializer):
+        self.check_pincode(serializer)
+        # The row as it was, to take out of the rollup and the ledger
+        previous = copy.copy(serializer.instance)
+        with transaction.atomic():
+            instance = serializer.save()
+            remove_from_rollup(previous)
+            add_to_rollup(instance)
+            if self.tracks_inventory:
+                replace_in_inventory(previous, instance)
+
+    def delete_record(self, instance):
+        """
+        Delete a record together with its rollup and ledger entries. Raises
+        InsufficientStock, and deletes nothing, when its paper was already sold.
+        """
+        with transaction.atomic():
+            remove_from_rollup(instance)
+            if self.tracks_inventory:
+                remove_from_inventory(instance)
+            record_deletion(instance)
+            instance.delete()
+
+    def perform_destroy(self, instance):
+        self.delete_record(instance)
+
+
+class Echo:
+    """
+    File-like object for csv.writer that hands back each line instead of buffering it.
+    """
+    def write(self, value):
+        return value
+
+
+class ExportMixin:
+    """
+    Adds an `export` action that streams the scoped records as CSV or NDJSON
+    straight from a values_list() iterator, without building model instances.
+    Archived rows are merged in when the `from` date reaches into the archive.
+    """
+    export_fields = ()
+    date_lookup = 'date'
+    export_chunk_size = 2000
+
+    def export_rows(self, querysets, export_type):
+        positions = [self.export_fields.index(field) for field in self.keyset_ordering]
+        rows = heapq.merge(
+            *(queryset.values_list(*self.export_fields).iterator(chunk_size=self.export_chunk_size) for queryset in querysets),
+            key=lambda row: [row[position] for position in positions],
+        )
+        if export_type == 'ndjson':
+            encoder = DjangoJSONEncoder()
+            for row in rows:
+                yield encoder.encode(dict(zip(self.export_fields, row))) + '\n'
+        else:
+            writer = csv.writer(Echo())
+            yield writer.writerow(self.export_fields)
+            for row in rows:
+                yield writer.writerow(row)
+
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAuthenticated, HasOfficeScope])
+    @read_replica
+    def export(self, request, *args, **kwargs):
+        scope = get_scope(request)
+        export_type = request.query_params.get('type', 'csv')
+        if export_type not in ('csv', 'ndjson'):
+            return Response({'message': 'type must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            date_from, date_to = parse_date_range(request.query_params)
+        except SummaryParamsError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        archive = archived_rows(queryset.model, date_from)
+        # Rows are read while the response streams, after the view returned
+        querysets = [
+            source.filter(**date_filters(self.date_lookup, date_from, date_to)).order_by(*self.keyset_ordering).using(read_database())
+            for source in ([queryset] if archive is None else [archive.filter(pincode__in=scope.pincodes), queryset])
+        ]
+
+        content_type = 'application/x-ndjson' if export_type == 'ndjson' else 'text/csv'
+        response = StreamingHttpResponse(self.export_rows(querysets, export_type), content_type=content_type)
+        filename = f'{self.basename}-{scope.office_pincode}.{export_type}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+'''***************** EWaste ************************'''
+class EwasteViewSet(WasteAnalyticsMixin, BulkIngestMixin, ExportMixin, ScopedRecordMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, HasOfficeScope]
+    serializer_class = EwasteSerializer
+    bulk_serializer_class = EwasteBulkSerializer
+    queryset = Ewaste.objects.all()
+    keyset_ordering = ('date_time', 'id')
+    export_fields = ('id', 'date_time', 'pincode_id', 'name', 'no_of_units')
+    date_lookup = 'date_time__date'
+    rollup_kind = DailyWasteRollup.EWASTE
+    summary_metrics = {'no_of_units': 'units'}
+    analytics_metrics = EWASTE_METRICS
+    default_metrics = ('total_units',)
+
+    @action(detail=False, methods=['post'], url_path='add-data', permission_classes=[IsAuthenticated, HasOfficeScope])
     def post(self, request, *args, **kwargs):
-        user = request.user
+        scope = get_scope(request)
 
         # Check if the user is a sub-divisional officer
-        if user.is_sub_divisional:
-            sub_divisional_office = user.sub_divisional_office
-            post_offices = PostOffice.objects.filter(pincode=sub_divisional_office.pincode)
-
+        if scope.is_sub_divisional:
             # Only allow adding e-waste data for the current post offices under the sub-division
             pincode = request.data.get('pincode')
-            if pincode not in post_offices.values_list('pincode', flat=True):
+            if str(pincode) not in scope.pincodes:
                 return Response({'message': 'Invalid pincode for this sub-divisional office'}, status=400)
 
             # Serialize and save the Ewaste data
             serializer = EwasteSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save()
+                # Save the row and its daily rollup together
+                with transaction.atomic():
+                    add_to_rollup(serializer.save())
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         # If the user is not a sub-divisional officer, deny the request
         return Response({'message': 'Only sub-divisional officers can add data'}, status=403)
     
-    @action(detail=False, methods=['get'], url_path='analytics', permission_classes=[IsAuthenticated])
-    def get(self, request, *args, **kwargs):
-        user = request.user
-
-        # Check if user is a divisional officer
-        if user.is_divisional:
-            divisional_office = user.divisional_office
-            # Get all post offices under this division
-            post_offices = PostOffice.objects.filter(division_pincode=divisional_office.pincode)
-            # Get all Ewaste entries for those post offices
-            ewaste_data = Ewaste.objects.filter(pincode__in=post_offices)
-            serializer = EwasteSerializer(ewaste_data, many=True)
-            # Process the data as needed (e.g., aggregate, count, etc.)
-            # Example: count total number of units
-            total_units = ewaste_data.aggregate(total=Sum('no_of_units'))['total'] or 0
-            return Response({'data':serializer.data,'total_units': total_units, 'message': 'Divisional office analytics'})
-
-        # Check if user is a sub-divisional officer
-        elif user.is_sub_divisional:
-            sub_divisional_office = user.sub_divisional_office
-            # Get the post office for the current sub-division
-            post_offices = PostOffice.objects.filter(pincode=sub_divisional_office.pincode)
-            print(post_offices)
-            # Get Ewaste data for this sub-division's post office
-            ewaste_data = Ewaste.objects.filter(pincode__in=post_offices)
-            serializer = EwasteSerializer(ewaste_data, many=True)
-            # Process the data as needed
-            total_units = ewaste_data.aggregate(total=Sum('no_of_units'))['total'] or 0
-            return Response({'data':serializer.data ,'total_units': total_units, 'message': 'Sub-divisional office analytics'})
-
-        # If the user does not have a valid role
-        return Response({'message': 'User does not have access to this data'}, status=403)
-    
-
-    @action(detail=True, methods=['delete'], url_path='delete-data', permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['delete'], url_path='delete-data', permission_classes=[IsAuthenticated, HasOfficeScope])
     def delete_data(self, request, *args, **kwargs):
-        user = request.user
+        scope = get_scope(request)
         ewaste_entry = self.get_object()  # Fetch the specific Ewaste entry to be deleted
 
         # Check if the user is a sub-divisional officer
-        if user.is_sub_divisional:
-            sub_divisional_office = user.sub_divisional_office
-            post_offices = PostOffice.objects.filter(pincode=sub_divisional_office.pincode)
-
+        if scope.is_sub_divisional:
             # Only allow deleting e-waste data for the current post offices under the sub-division
-            if ewaste_entry.pincode not in post_offices.values_list('pincode', flat=True):
+            if ewaste_entry.pincode_id not in scope.pincodes:
                 return Response({'message': 'Invalid pincode for this sub-divisional office'}, status=400)
 
             # If the user is authorized, delete the Ewaste entry
-            ewaste_entry.delete()
+            self.delete_record(ewaste_entry)
             return Response({'message': 'E-waste data deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
         # Check if the user is a divisional officer (optional, can add more restrictions if necessary)
-        elif user.is_divisional:
-            divisional_office = user.divisional_office
-            post_offices = PostOffice.objects.filter(division_pincode=divisional_office.pincode)
-
+        elif scope.is_divisional:
             # Only allow deleting e-waste data for post offices under the divisional office
-            if ewaste_entry.pincode not in post_offices.values_list('pincode', flat=True):
+            if ewaste_entry.pincode_id not in scope.pincodes:
                 return Response({'message': 'Invalid pincode for this divisional office'}, status=400)
 
             # If the user is authorized, delete the Ewaste entry
-            ewaste_entry.delete()
+            self.delete_record(ewaste_entry)
             return Response({'message': 'E-waste data deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
         # If the user does not have the required permissions
@@ -111,98 +373,90 @@ class EwasteViewSet(viewsets.ModelViewSet):
     
 
 '''***************** PaperWaste ************************'''
-class PaperWasteViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class PaperWasteViewSet(WasteAnalyticsMixin, BulkIngestMixin, ExportMixin, ScopedRecordMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, HasOfficeScope]
     serializer_class = PaperWasteSerializer
+    bulk_serializer_class = PaperWasteBulkSerializer
     queryset = PaperWaste.objects.all()
-
-    @action(detail=False, methods=['post'], url_path='add-data', permission_classes=[IsAuthenticated])
+    export_fields = ('id', 'date', 'pincode_id', 'weight')
+    rollup_kind = DailyWasteRollup.PAPER
+    summary_metrics = {'weight': 'weight'}
+    analytics_metrics = PAPER_WASTE_METRICS
+    default_metrics = ('total_weight',)
+    tracks_inventory = True
+
+    @action(detail=False, methods=['post'], url_path='add-data', permission_classes=[IsAuthenticated, HasOfficeScope])
     def post(self, request, *args, **kwargs):
-        user = request.user
+        scope = get_scope(request)
 
         # Check if the user is a sub-divisional officer
-        if user.is_sub_divisional:
-            sub_divisional_office = user.sub_divisional_office
-            post_offices = PostOffice.objects.filter(pincode=sub_divisional_office.pincode)
-
+        if scope.is_sub_divisional:
             # Only allow adding paper waste data for the current post offices under the sub-division
             pincode = request.data.get('pincode')
-            if pincode not in post_offices.values_list('pincode', flat=True):
+            if str(pincode) not in scope.pincodes:
                 return Response({'message': 'Invalid pincode for this sub-divisional office'}, status=400)
 
             # Serialize and save the PaperWaste data
             serializer = PaperWasteSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save()
+                # Save the row, its daily rollup and the paper stock together
+                with transaction.atomic():
+                    paper_waste = serializer.save()
+                    add_to_rollup(paper_waste)
+                    add_to_inventory(paper_waste)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         # If the user is not a sub-divisional officer, deny the request
         return Response({'message': 'Only sub-divisional officers can add data'}, status=403)
 
-    @action(detail=False, methods=['get'], url_path='analytics', permission_classes=[IsAuthenticated])
-    def get(self, request, *args, **kwargs):
-        user = request.user
-
-        # Check if user is a divisional officer
-        if user.is_divisional:
-            divisional_office = user.divisional_office
-            # Get all post offices under this division
-            post_offices = PostOffice.objects.filter(division_pincode=divisional_office.pincode)
-            # Get all PaperWaste entries for those post offices
-            paper_waste_data = PaperWaste.objects.filter(pincode__in=post_offices)
-            # Process the data as needed (e.g., aggregate, count, etc.)
-            total_weight = paper_waste_data.aggregate(total=Sum('weight'))['total'] or 0
-
-            serializer=PaperWasteSerializer(paper_waste_data, many=True)
-            return Response({'data': serializer.data, 'total_weight': total_weight, 'message': 'Divisional office analytics'})
-
-        # Check if user is a sub-divisional officer
-        elif user.is_sub_divisional:
-            sub_divisional_office = user.sub_divisional_office
-            # Get the post office for the current sub-division
-            post_offices = PostOffice.objects.filter(pincode=sub_divisional_office.pincode)
-            # Get PaperWaste data for this sub-division's post office
-            paper_waste_data = PaperWaste.objects.filter(pincode__in=post_offices)
-            # Process the data as needed
-            total_weight = paper_waste_data.aggregate(total=Sum('weight'))['total'] or 0
-
-            serializer=PaperWasteSerializer(paper_waste_data, many=True)
-
-            return Response({'data': serializer.data, 'total_weight': total_weight, 'message': 'Sub-divisional office analytics'})
-
-        # If the user does not have a valid role
-        return Response({'message': 'User does not have access to this data'}, status=403)
-
-    @action(detail=True, methods=['delete'], url_path='delete-data', permission_classes=[IsAuthenticated])
+    @action(detail=False, methods=['get'], url_path='inventory', permission_classes=[IsAuthenticated, HasOfficeScope])
+    def inventory(self, request, *args, **kwargs):
+        """
+        Paper currently in stock: one ledger row with ?pincode=, else every office in scope.
+        """
+        scope = get_scope(request)
+        fields = ('pincode_id', 'generated_weight', 'sold_weight', 'balance', 'updated_at')
+        pincode = request.query_params.get('pincode')
+        if pincode:
+            if pincode not in scope.pincodes:
+                return Response({'message': 'Invalid pincode for this office'}, status=400)
+            row = PaperInventory.objects.filter(pincode_id=pincode).values(*fields).first()
+            rows = [row] if row else [{'pincode_id': pincode, 'generated_weight': 0, 'sold_weight': 0, 'balance': 0, 'updated_at': None}]
+        else:
+            rows = list(PaperInventory.objects.filter(pincode__in=scope.pincodes).order_by('pincode').values(*fields))
+        data = [{'pincode': row.pop('pincode_id'), **row} for row in rows]
+        return Response({'data': data, 'message': 'Paper inventory'})
+
+    @action(detail=True, methods=['delete'], url_path='delete-data', permission_classes=[IsAuthenticated, HasOfficeScope])
     def delete_data(self, request, *args, **kwargs):
-        user = request.user
+        scope = get_scope(request)
         paper_waste_entry = self.get_object()  # Fetch the specific PaperWaste entry to be deleted
 
         # Check if the user is a sub-divisional officer
-        if user.is_sub_divisional:
-            sub_divisional_office = user.sub_divisional_office
-            post_offices = PostOffice.objects.filter(pincode=sub_divisional_office.pincode)
-
+        if scope.is_sub_divisional:
             # Only allow deleting paper waste data for the current post offices under the sub-division
-            if paper_waste_entry.pincode not in post_offices.values_list('pincode', flat=True):
+            if paper_waste_entry.pincode_id not in scope.pincodes:
                 return Response({'message': 'Invalid pincode for this sub-divisional office'}, status=400)
 
             # If the user is authorized, delete the PaperWaste entry
-            paper_waste_entry.delete()
+            try:
+                self.delete_record(paper_waste_entry)
+            except InsufficientStock as e:
+                return Response({'message': f'Paper from this entry was already sold. {e}'}, status=status.HTTP_409_CONFLICT)
             return Response({'message': 'Paper waste data deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
         # Check if the user is a divisional officer (optional, can add more restrictions if necessary)
-        elif user.is_divisional:
-            divisional_office = user.divisional_office
-            post_offices = PostOffice.objects.filter(division_pincode=divisional_office.pincode)
-
+        elif scope.is_divisional:
             # Only allow deleting paper waste data for post offices under the divisional office
-            if paper_waste_entry.pincode not in post_offices.values_list('pincode', flat=True):
+            if paper_waste_entry.pincode_id not in scope.pincodes:
                 return Response({'message': 'Invalid pincode for this divisional office'}, status=400)
 
             # If the user is authorized, delete the PaperWaste entry
-            paper_waste_entry.delete()
+            try:
+                self.delete_record(paper_waste_entry)
+            except InsufficientStock as e:
+                return Response({'message': f'Paper from this entry was already sold. {e}'}, status=status.HTTP_409_CONFLICT)
             return Response({'message': 'Paper waste data deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
         # If the user does not have the required permissions
@@ -212,29 +466,47 @@ class PaperWasteViewSet(viewsets.ModelViewSet):
 
 
 '''***************** SelledPaperWasteViewSet ************************'''
-class SelledPaperWasteViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class SelledPaperWasteViewSet(WasteAnalyticsMixin, BulkIngestMixin, ExportMixin, ScopedRecordMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, HasOfficeScope]
     serializer_class = SelledPaperWasteSerializer
+    bulk_serializer_class = SelledPaperWasteBulkSerializer
     queryset = SelledPaperWaste.objects.all()
-
-    @action(detail=False, methods=['post'], url_path='add-data', permission_classes=[IsAuthenticated])
+    export_fields = ('id', 'date', 'pincode_id', 'total_weight', 'selling_price_per_unit', 'total_price')
+    rollup_kind = DailyWasteRollup.SOLD_PAPER
+    # Buckets report total_weight, avg_weight, total_price and avg_price
+    summary_metrics = {'weight': 'weight', 'price': 'price'}
+    analytics_metrics = SELLED_PAPER_WASTE_METRICS
+    default_metrics = ('total_price', 'total_weight')
+    tracks_inventory = True
+
+    def reject_bulk_rows(self, instances):
+        return {
+            position: {'total_weight': [f'Only {available:g} kg of paper in stock']}
+            for position, available in stock_shortfalls(instances).items()
+        }
+
+    @action(detail=False, methods=['post'], url_path='add-data', permission_classes=[IsAuthenticated, HasOfficeScope])
     def post(self, request, *args, **kwargs):
-        user = request.user
+        scope = get_scope(request)
 
         # Check if the user is a sub-divisional officer
-        if user.is_sub_divisional:
-            sub_divisional_office = user.sub_divisional_office
-            post_offices = PostOffice.objects.filter(pincode=sub_divisional_office.pincode)
-
+        if scope.is_sub_divisional:
             # Only allow adding selled paper waste data for the current post offices under the sub-division
             pincode = request.data.get('pincode')
-            if pincode not in post_offices.values_list('pincode', flat=True):
+            if str(pincode) not in scope.pincodes:
                 return Response({'message': 'Invalid pincode for this sub-divisional office'}, status=400)
 
             # Serialize and save the SelledPaperWaste data
             serializer = SelledPaperWasteSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save()
+                # Save the row, its daily rollup and the paper stock together; a sale beyond the stock rolls back
+                try:
+                    with transaction.atomic():
+                        sale = serializer.save()
+                        add_to_rollup(sale)
+                        add_to_inventory(sale)
+                except InsufficientStock as e:
+                    return Response({'message': str(e), 'available': e.available}, status=status.HTTP_409_CONFLICT)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -243,58 +515,137 @@ class SelledPaperWasteViewSet(viewsets.ModelViewSet):
 
 
 
-    @action(detail=False, methods=['get'], url_path='analytics', permission_classes=[IsAuthenticated])
-    def get(self, request, *args, **kwargs):
-        user = request.user
-
-        # Check if user is a divisional officer
-        if user.is_divisional:
-            divisional_office = user.divisional_office
-            # Get all post offices under this division
-            post_offices = PostOffice.objects.filter(division_pincode=divisional_office.pincode)
-            # Get all SelledPaperWaste entries for those post offices
-            print(post_offices)
-            selled_paper_waste_data = SelledPaperWaste.objects.filter(pincode__in=post_offices)
-            serializer=SelledPaperWasteSerializer(selled_paper_waste_data, many=True)
-            # Process the data as needed (e.g., aggregate, count, etc.)
-            total_weight = selled_paper_waste_data.aggregate(total=Sum('total_weight'))['total'] or 0
-            total_price = selled_paper_waste_data.aggregate(total=Sum('total_price'))['total'] or 0
-            return Response({'data': serializer.data, 'total_price':total_price,'total_weight': total_weight, 'message': 'Divisional office analytics'})
-
-        # Check if user is a sub-divisional officer
-        elif user.is_sub_divisional:
-            sub_divisional_office = user.sub_divisional_office
-            # Get the post office for the current sub-division
-            post_offices = PostOffice.objects.filter(pincode=sub_divisional_office.pincode)
-            print(post_offices)
-            # Get SelledPaperWaste data for this sub-division's post office
-            selled_paper_waste_data = SelledPaperWaste.objects.filter(pincode__in=post_offices)
-            serializer=SelledPaperWasteSerializer(selled_paper_waste_data, many=True)
-            # Process the data as needed
-            total_weight = selled_paper_waste_data.aggregate(total=Sum('total_weight'))['total'] or 0
-            total_price = selled_paper_waste_data.aggregate(total=Sum('total_price'))['total'] or 0
-            return Response({'data': serializer.data, 'total_price':total_price,'total_weight': total_weight, 'message': 'Sub-divisional office analytics'})
-
-        # If the user does not have a valid role
-        return Response({'message': 'User does not have access to this data'}, status=403)
-
-    @action(detail=True, methods=['delete'], url_path='delete-data', permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['delete'], url_path='delete-data', permission_classes=[IsAuthenticated, HasOfficeScope])
     def delete_data(self, request, *args, **kwargs):
-        user = request.user
-        selled_paper_waste_entry = self.get_object()  # Fetch the specific
+        scope = get_scope(request)
+        selled_paper_waste_entry = self.get_object()  # Fetch the specific SelledPaperWaste entry to be deleted
+
+        # Check if the user is a sub-divisional officer
+        if scope.is_sub_divisional:
+            # Only allow deleting selled paper waste data for the current post offices under the sub-division
+            if selled_paper_waste_entry.pincode_id not in scope.pincodes:
+                return Response({'message': 'Invalid pincode for this sub-divisional office'}, status=400)
+
+            # If the user is authorized, delete the SelledPaperWaste entry
+            self.delete_record(selled_paper_waste_entry)
+            return Response({'message': 'Selled paper waste data deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+        # Check if the user is a divisional officer
+        elif scope.is_divisional:
+            # Only allow deleting selled paper waste data for post offices under the divisional office
+            if selled_paper_waste_entry.pincode_id not in scope.pincodes:
+                return Response({'message': 'Invalid pincode for this divisional office'}, status=400)
+
+            # If the user is authorized, delete the SelledPaperWaste entry
+            self.delete_record(selled_paper_waste_entry)
+            return Response({'message': 'Selled paper waste data deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+        # If the user does not have the required permissions
+        return Response({'message': 'User does not have access to delete this data'}, status=403)
+
+
+'''***************** DashboardView ************************'''
+
+class DashboardView(APIView):
+    """
+    Everything the division dashboard shows in one request: e-waste units, paper
+    generated, paper sold, revenue and unsold backlog per post office and in total.
+    Accepts the same `from`/`to` dates as the analytics summary.
+    """
+    permission_classes = [IsAuthenticated, HasOfficeScope]
+    basename = 'dashboard'
+
+    @read_replica
+    @cache_response('dashboard')
+    def get(self, request, *args, **kwargs):
+        scope = get_scope(request)
+
+        try:
+            params = parse_summary_params(request.query_params)
+        except SummaryParamsError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        figures = dashboard(scope.pincodes, params['date_from'], params['date_to'])
+        return Response({**figures, 'message': 'Dashboard'})
+
+
+'''***************** SyncView ************************'''
+
+class SyncView(APIView):
+    """
+    Offline sync for field clients: the Ewaste, PaperWaste, SelledPaperWaste,
+    CleaningStaff and PostOffice records of the user's scope created, updated or
+    deleted since `token` (omit it for a first, full sync). Call again with
+    `next_token` while `has_more` is true. `limit` caps the rows per model.
+    """
+    permission_classes = [IsAuthenticated, HasOfficeScope]
+
+    @read_replica
+    def get(self, request, *args, **kwargs):
+        scope = get_scope(request)
+
+        since = limit = None
+        try:
+            if request.query_params.get('limit'):
+                limit = int(request.query_params['limit'])
+        except ValueError:
+            return Response({'message': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            if request.query_params.get('token'):
+                since = decode_token(request.query_params['token'])
+        except SyncTokenExpired as e:
+            return Response({'message': str(e)}, status=status.HTTP_410_GONE)
+        except SyncTokenError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({**changes(scope, since, limit), 'message': 'Changes since token' if since else 'Full sync'})
 
 
 '''***************** CleaningStaffViewSet ************************'''
 
+def search_staff(queryset, term):
+    """
+    Cleaning staff whose contact number (for an all-digit term) or name starts with
+    `term`, case-insensitively for names. A range on the indexed column rather than
+    LIKE, which only some backends and collations run through an index.
+    """
+    if term.isdigit():
+        return queryset.filter(contactNo__gte=term, contactNo__lt=term + '\U0010ffff')
+    term = term.lower()
+    return queryset.alias(name_lower=Lower('name')).filter(name_lower__gte=term, name_lower__lt=term + '\U0010ffff')
+
+
 class CleaningStaffViewSet(viewsets.ModelViewSet):
+    """
+    The cleaning staff of the offices in the user's scope, paginated. `?search=`
+    matches the start of the name or of the contact number, `?pincode=` keeps one office.
+    """
     queryset = CleaningStaff.objects.all()
     serializer_class = CleaningStaffSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasOfficeScope]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('id',)
+
+    def get_serializer(self, *args, **kwargs):
+        # Listings can be projected to the requested columns with `fields=`
+        if self.action == 'list':
+            kwargs['fields'] = requested_fields(self.request)
+        return super().get_serializer(*args, **kwargs)
+
+    @read_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def check_pincode(self, serializer):
+        pincode = serializer.validated_data.get('pincode')
+        if pincode is not None and pincode.pk not in get_scope(self.request).pincodes:
+            raise PermissionDenied("You are not authorized to manage cleaning staff for this pincode.")
 
     def perform_create(self, serializer):
         # Ensure that only sub-divisional officers can create cleaning staff
-        if not self.request.user.is_sub_divisional:
+        if not get_scope(self.request).is_sub_divisional:
             raise PermissionDenied("Only sub-divisional officers can add cleaning staff.")
+        self.check_pincode(serializer)
         
         # Proceed with the creation if the user is a sub-divisional officer
         user=serializer.save()
@@ -302,14 +653,190 @@ class CleaningStaffViewSet(viewsets.ModelViewSet):
 
     def perform_destroy(self, instance):
         # Ensure that only sub-divisional officers can delete cleaning staff
-        if not self.request.user.is_sub_divisional:
+        if not get_scope(self.request).is_sub_divisional:
             raise PermissionDenied("Only sub-divisional officers can delete cleaning staff.")
         
         # Proceed with deletion if the user is a sub-divisional officer
-        instance.delete()
+        with transaction.atomic():
+            record_deletion(instance)
+            instance.delete()
         return Response({"message:":"Succesfully Deleted!"},status=status.HTTP_202_ACCEPTED)
 
-    # You can optionally allow all users to perform the read operations (list and retrieve)
+    def perform_update(self, serializer):
+        self.check_pincode(serializer)
+        serializer.save()
+
+    def get_queryset(self):
+        pincodes = get_scope(self.request).pincodes
+        queryset = CleaningStaff.objects.filter(pincode__in=pincodes)
+        if self.action != 'list':
+            return queryset
+        pincode = self.request.query_params.get('pincode')
+        if pincode:
+            if pincode not in pincodes:
+                raise ValidationError({'pincode': 'Invalid pincode for this office'})
+            queryset = CleaningStaff.objects.filter(pincode=pincode)
+        search = self.request.query_params.get('search', '').strip()
+        if search:
+            queryset = search_staff(queryset, search)
+        return queryset
+
+
+'''***************** Resumable uploads ************************'''
+
+class UploadViewSet(viewsets.GenericViewSet):
+    """
+    Chunked, resumable uploads for event attachments and reports.
+
+    POST   uploads/                {filename, size, sha256} -> {id, received}
+    PUT    uploads/<id>/           one chunk, with `Content-Range: bytes start-end/size`
+    HEAD   uploads/<id>/           current offset in the `Upload-Offset` header
+    POST   uploads/<id>/complete/  verify the checksum
+    DELETE uploads/<id>/           abandon the upload
+
+    The completed upload id is then sent as `upload` to the events or event-reports endpoints.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
     def get_queryset(self):
-        # You can customize this to filter based on the sub-divisional office if needed
-        return CleaningStaff.objects.all()
+        queryset = UploadSession.objects.filter(user=self.request.user)
+        if self.action == 'complete':
+            # Held until the view's transaction ends, so the upload cannot be completed twice
+            queryset = queryset.select_for_update()
+        return queryset
+
+    def offset_response(self, session, status_code=status.HTTP_200_OK):
+        response = Response(self.get_serializer(session).data, status=status_code)
+        response['Upload-Offset'] = str(session.received)
+        return response
+
+    def error_response(self, error, session):
+        response = Response({"message": str(error)}, status=error.status)
+        response['Upload-Offset'] = str(session.received)
+        return response
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save(user=request.user)
+        return self.offset_response(session, status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.offset_response(self.get_object())
+
+    def update(self, request, *args, **kwargs):
+        session = self.get_object()
+        if session.completed:
+            return Response({"message": "Upload is already complete."}, status=status.HTTP_409_CONFLICT)
+        try:
+            start, length = uploads.parse_content_range(request.headers.get('Content-Range'), session)
+            # Read the body straight from the socket; request.data would buffer the whole chunk.
+            # A slow client is waited for outside the transaction, so it blocks no other writer
+            chunk = uploads.receive_chunk(session, request.stream, length)
+            uploads.append_chunk(session, chunk, start, length)
+        except uploads.UploadError as error:
+            return self.error_response(error, session)
+        return self.offset_response(session)
+
+    @action(detail=True, methods=['post'])
+    @transaction.atomic
+    def complete(self, request, *args, **kwargs):
+        session = self.get_object()
+        try:
+            uploads.complete(session)
+        except uploads.UploadError as error:
+            return self.error_response(error, session)
+        return self.offset_response(session)
+
+    def destroy(self, request, *args, **kwargs):
+        uploads.discard(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+'''***************** EventViewSet ************************'''
+
+def derivative_file(instance, field_name, request):
+    """
+    The original file, or its thumbnail / compressed copy with `?variant=thumbnail|compressed`.
+    """
+    variant = request.query_params.get('variant')
+    if variant in ('thumbnail', 'compressed'):
+        return getattr(instance, f'{field_name}_{variant}')
+    return getattr(instance, field_name)
+
+
+class EventViewSet(viewsets.ModelViewSet):
+    queryset = Event.objects.all()
+    serializer_class = EventSerializer
+    permission_classes = [IsAuthenticated, HasOfficeScope]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('date_time', 'id')
+
+    def check_divisional(self):
+        if not get_scope(self.request).is_divisional:
+            raise PermissionDenied("Only divisional officers can manage events.")
+
+    def perform_create(self, serializer):
+        self.check_divisional()
+        serializer.save()
+
+    def perform_update(self, serializer):
+        self.check_divisional()
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        self.check_divisional()
+        delete_derivatives(instance, 'attachment')
+        instance.attachment.delete(save=False)
+        instance.delete()
+
+    @action(detail=True, methods=['get'])
+    def attachment(self, request, *args, **kwargs):
+        field_file = derivative_file(self.get_object(), 'attachment', request)
+        if not field_file:
+            return Response({"message": "File not available."}, status=status.HTTP_404_NOT_FOUND)
+        return uploads.ranged_file_response(request, field_file)
+
+
+'''***************** EventReportViewSet ************************'''
+
+class EventReportViewSet(viewsets.ModelViewSet):
+    serializer_class = EventReportSerializer
+    permission_classes = [IsAuthenticated, HasOfficeScope]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('date_time', 'id')
+
+    def get_queryset(self):
+        scope = get_scope(self.request)
+        return EventReport.objects.filter(pincode__in=scope.pincodes)
+
+    def check_pincode(self, serializer):
+        scope = get_scope(self.request)
+        if not scope.is_sub_divisional:
+            raise PermissionDenied("Only sub-divisional officers can submit event reports.")
+        pincode = serializer.validated_data.get('pincode')
+        if pincode is not None and pincode.pk not in scope.pincodes:
+            raise PermissionDenied("You are not authorized to submit reports for this pincode.")
+
+    def perform_create(self, serializer):
+        self.check_pincode(serializer)
+        serializer.save()
+
+    def perform_update(self, serializer):
+        self.check_pincode(serializer)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if not get_scope(self.request).is_sub_divisional:
+            raise PermissionDenied("Only sub-divisional officers can delete event reports.")
+        delete_derivatives(instance, 'attached_report')
+        instance.attached_report.delete(save=False)
+        instance.delete()
+
+    @action(detail=True, methods=['get'])
+    def report(self, request, *args, **kwargs):
+        field_file = derivative_file(self.get_object(), 'attached_report', request)
+        if not field_file:
+            return Response({"message": "File not available."}, status=status.HTTP_404_NOT_FOUND)
+        return uploads.ranged_file_response(request, field_file)